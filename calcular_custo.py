@@ -20,6 +20,9 @@ import random
 from PIL import Image
 import gc
 import io
+from server.signal_gain import apply_signal_gain, load_signal_csv
+from server.scheduler import AdmissionScheduler
+from server.cost_history import CostHistory
 
 file_lock = Lock()       # para logs / csv
 send_lock = Lock()       # para enviar mensagens no socket
@@ -28,6 +31,13 @@ print_lock = Lock()      # opcional: evita prints embaralhados
 
 ACTUAL_DIR = Path(os.path.dirname(os.path.abspath(sys.argv[0])))
 
+# mesmo log de custos que o servidor consulta (server/cache), semeado com o teste.json.
+# Só é aberto pelo main(): importar este módulo não cria nem grava nada
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+COST_HISTORY_PATH = os.path.join(ROOT_DIR, "server", "cache", "historico-custos.jsonl")
+COST_HISTORY_SEED = os.path.join(ROOT_DIR, "teste.json")
+cost_history = None
+
 MIN_ERROR = .0001
 MAX_WORKERS = 8
 
@@ -197,11 +207,6 @@ class ServerData:
         self.reports = reports
         self.models = models
 
-def apply_signal_gain(g_vector: np.ndarray):
-    S = len(g_vector); g_out = g_vector.copy().astype(np.float32)
-    for l in range(S): g_out[l] *= (100.0 + (1.0/20.0)*(l+1)*np.sqrt(l+1))
-    return g_out
-
 def get_dynamic_mem_limit():
     # Limite: 80% da RAM total, mas sempre deixa pelo menos 1GB livre
     mem = psutil.virtual_memory()
@@ -233,51 +238,47 @@ def get_percent_virtual_memory(close_profiler_worker, server_data):
 
         sleep(0.5)
 
-def run_queue_worker(request_queue):
-    while True:
-        # checar limites
-        cpu_limit = get_dynamic_cpu_limit()
-        mem_limit = get_dynamic_mem_limit()
-
-        cpu_percent = psutil.cpu_percent(interval=0.5)
-        mem_percent = psutil.virtual_memory().percent
-
-        data = request_queue.get()   # pega o item da fila
-        if data is None:
-            break  # comando de shutdown
-
-        username = data["username"]
-        idx = data["idx"]
+scheduler = None
 
-        # respeitar tempo mínimo para retry
-        now = time()
-        next_try = data.get("next_try", 0)
-        if now < next_try:
-            request_queue.put(data)
-            sleep(0.5)
-            continue
+def medir_uso():
+    return psutil.cpu_percent(interval=None), psutil.virtual_memory().percent
 
-        print(f"[WORKER] CPU={cpu_percent:.1f}% (lim={cpu_limit}%) | "
-              f"RAM={mem_percent:.1f}% (lim={mem_limit}%)")
+def estimar_custo(data):
+    # mesmo critério do servidor: custo medido no histórico; sem histórico, um custo mínimo
+    stats = cost_history.estimate(data["model"], data["signal"], data["algorithm"]) if cost_history else None
+    if stats is None:
+        return {"cpu": 0.01, "mem": 0.01, "time": 0.1}
+    return {"cpu": stats["cpu_ewma"] / psutil.cpu_count(logical=True),
+            "mem": (stats["rss_peak"] / psutil.virtual_memory().total) * 100,
+            "time": stats["time_ewma"]}
 
-        if cpu_percent > cpu_limit or mem_percent > mem_limit:
-            print(f"[WORKER] Recursos altos — requeue >> {username} idx={idx}")
+def executar_job(data, ticket):
+    # chamado pelo escalonador quando o custo coube no orçamento: roda em thread própria
+    Thread(target=rodar_job, args=(data, ticket), daemon=True).start()
 
-            retry = data.get("retry", 0)
-            retry = min(retry + 1, 5)
-            data["retry"] = retry
-            data["next_try"] = time() + retry  # backoff
+def rodar_job(data, ticket):
+    try:
+        print(f"[WORKER] Processando >> {data['username']} idx={data['idx']}")
+        process_job(data)
+    finally:
+        scheduler.finish(ticket)
 
-            print(f"[WORKER]: tempo de espera ")
+def run_queue_worker(request_queue):
+    global scheduler
 
-            request_queue.put(data)
-            continue
+    # até MAX_WORKERS jobs simultâneos, admitidos pelo custo medido de cada um
+    scheduler = AdmissionScheduler(executar_job, medir_uso, get_dynamic_cpu_limit(),
+                                   get_dynamic_mem_limit(), max_running=MAX_WORKERS)
+    dispatcher = Thread(target=scheduler.run, daemon=True)
+    dispatcher.start()
 
-        print(f"[WORKER] Processando >> {username} idx={idx}")
-        process_job(data)
+    while True:
+        data = request_queue.get()   # pega o item da fila
+        if data is None:
+            scheduler.close()
+            break  # comando de shutdown
 
-        # reset do retry para próximos jobs sucessivos
-        data["retry"] = 0
+        scheduler.submit(data, estimar_custo(data), user=data.get("username"))
 
 def process_job(data):
     username = data["username"]
@@ -362,25 +363,6 @@ def process_job(data):
     print(f"[FINALIZADO] Process → {username}  idx -> {idx}")
 
 
-def salvar_json_em_lista(caminho, novo_item):
-    # Se o arquivo existir, carrega; se não existir, cria uma lista vazia
-    if os.path.exists(caminho):
-        with open(caminho, "r") as f:
-            try:
-                dados = json.load(f)
-            except json.JSONDecodeError:
-                dados = []
-    else:
-        dados = []
-
-    # Adiciona o novo item
-    dados.append(novo_item)
-
-    # Salva de volta no arquivo
-    with open(caminho, "w") as f:
-        json.dump(dados, f, indent=4)
-
-
 def testa(algorithm, model, signal):
 
     process = psutil.Process(os.getpid())
@@ -398,8 +380,7 @@ def testa(algorithm, model, signal):
 
     H_matrix = np.loadtxt(model, delimiter=',', dtype=np.float32)
     signal_path = os.path.join(signal)
-    g_vector = np.loadtxt(signal_path, delimiter=",", dtype=np.float32)
-    g_processed = apply_signal_gain(g_vector)
+    g_processed = load_signal_csv(signal_path)
 
     tol_requisito = 1e-4
 
@@ -460,9 +441,9 @@ def testa(algorithm, model, signal):
         }
     }
 
-    arquivo = r'C:\Users\User\Desktop\Desenvolvimento Integrado\cliente-servidor\teste.json'
-
-    salvar_json_em_lista(arquivo, data_info)
+    # o servidor lê o mesmo log para estimar o custo dos pedidos
+    if cost_history is not None:
+        cost_history.record(data_info)
 
     return mensagem, cpu_used, mem_used
 
@@ -503,6 +484,9 @@ def testa(algorithm, model, signal):
 
 
 def main():
+    global cost_history
+    cost_history = CostHistory(COST_HISTORY_PATH, seed=COST_HISTORY_SEED)
+
     req = {
         "rand_request": 1,
         "time_to_next_request": [2],
@@ -539,6 +523,8 @@ def main():
     # reports = Relatorio()
     # server_data = ServerData(reports, None)
 
+    cost_history.close()
 
-main()
 
+if __name__ == "__main__":
+    main()
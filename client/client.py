@@ -11,6 +11,9 @@ from pathlib import Path
 import random
 import base64
 import json
+import struct
+import itertools
+from concurrent.futures import Future, wait
 from datetime import datetime
 import os
 
@@ -32,6 +35,22 @@ SINAIS60 = ['client/signals/signal-60x60-0','client/signals/signal-60x60-1','cli
 MODELOS30 = ['../server/models/model-30x30.csv']
 MODELOS60 = ['../server/models/model-60x60.csv']
 
+# protocolo binário (ver server/protocol.py):
+# versão B | tipo B | id do pedido I | tamanho do header I | tamanho do payload I
+PROTOCOL_VERSION = 1
+FRAME = struct.Struct("!BBIII")
+MSG_REQUEST = 1
+MSG_RESULT = 2
+MSG_ERROR = 3
+MSG_EXIT = 4
+MSG_PREVIEW = 5
+HELLO_TIMEOUT = 2.0
+MAX_REQUEST_ID = 2**32 - 1   # o id vai num campo de 32 bits do quadro; 0 fica para o EXIT
+
+# envia as amostras do sinal no pedido (float32): o servidor não precisa enxergar o arquivo.
+# Sem o CSV local, o pedido vai só com o nome e o servidor lê "../<sinal>.csv"
+ENVIAR_SINAL = True
+
 
 def imprimir_opcoes():
     print('2 - Recostruir imagems')
@@ -43,7 +62,114 @@ class serverData:
         self.algorithm = None
         self.model = None
 
-def sendMessages(client, username, stop_event, number):
+class Receiver:
+    """Leitura com buffer: linhas (modo texto) ou quantidades exatas de bytes (quadros)."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buffer = bytearray()
+
+    def _fill(self):
+        data = self.sock.recv(65536)
+        if not data:
+            raise ConnectionError("servidor encerrou a conexão")
+        self.buffer += data
+
+    def read_line(self):
+        while (pos := self.buffer.find(b"\n")) < 0:
+            self._fill()
+        line = bytes(self.buffer[:pos])
+        del self.buffer[:pos + 1]
+        return line
+
+    def read_exact(self, n):
+        while len(self.buffer) < n:
+            self._fill()
+        data = bytes(self.buffer[:n])
+        del self.buffer[:n]
+        return data
+
+def encode_frame(msg_type, request_id, header, payload=b""):
+    header_bytes = json.dumps(header, separators=(",", ":")).encode()
+    return FRAME.pack(PROTOCOL_VERSION, msg_type, request_id, len(header_bytes), len(payload)) + header_bytes + payload
+
+def ler_sinal(sinal):
+    # amostras do CSV do sinal (caminho relativo à raiz do projeto) em float32 little-endian
+    caminho = os.path.join(os.path.dirname(base), sinal + ".csv")
+    try:
+        with open(caminho, 'r') as f:
+            valores = [float(v) for linha in f for v in linha.split(',') if v.strip()]
+    except OSError:
+        return None
+    return struct.pack(f"<{len(valores)}f", *valores)
+
+def negotiate(client, receiver, username):
+    # pede o protocolo binário e devolve a janela do servidor; 0 = seguimos no texto
+    # (servidor antigo não responde ao "3_")
+    client.sendall(f'3_|{username}|{json.dumps({"versions": [PROTOCOL_VERSION]})}\n'.encode())
+    client.settimeout(HELLO_TIMEOUT)
+    try:
+        reply = json.loads(receiver.read_line())
+        if reply["type"] == "3_" and reply["payload"].get("protocol") == PROTOCOL_VERSION:
+            return reply["payload"]["window"]
+        return 0
+    except (socket.timeout, ValueError, KeyError):
+        return 0
+    finally:
+        client.settimeout(None)
+
+class Pipeline:
+    """Pedidos em aberto na conexão, cada um com seu id e seu Future.
+
+    submit() bloqueia só quando a janela do servidor está cheia; as respostas
+    chegam fora de ordem e são casadas pelo id. Um id só volta a ser usado
+    depois que o pedido dono dele terminou.
+    """
+
+    def __init__(self, client, window):
+        self.client = client
+        self.slots = threading.Semaphore(window)
+        self.futures = {}
+        self.ids = itertools.count()
+        self.lock = Lock()
+
+    def submit(self, payload, sinal=b""):
+        # sinal: amostras float32 enviadas como payload do quadro
+        self.slots.acquire()
+        future = Future()
+        with self.lock:
+            request_id = next(self.ids) % MAX_REQUEST_ID + 1
+            while request_id in self.futures:
+                request_id = next(self.ids) % MAX_REQUEST_ID + 1
+            self.futures[request_id] = future
+        with send_lock:
+            self.client.sendall(encode_frame(MSG_REQUEST, request_id, payload, sinal))
+        return future
+
+    def complete(self, request_id, result):
+        future = self._pop(request_id)
+        if future is not None:
+            future.set_result(result)
+
+    def fail(self, request_id, error):
+        future = self._pop(request_id)
+        if future is not None:
+            future.set_exception(error)
+
+    def fail_all(self, error):
+        with self.lock:
+            request_ids = list(self.futures)
+        for request_id in request_ids:
+            self.fail(request_id, error)
+
+    def _pop(self, request_id):
+        with self.lock:
+            future = self.futures.pop(request_id, None)
+        if future is not None:
+            self.slots.release()
+        return future
+
+def sendMessages(client, username, stop_event, number, pipeline):
     # connected = True
     while not stop_event.is_set():
         try:
@@ -52,7 +178,10 @@ def sendMessages(client, username, stop_event, number):
 
             if msg == 4:
                 # connected = False
-                client.send(f'EXIT:<{username}> saiu do chat'.encode())
+                if pipeline is not None:
+                    client.sendall(encode_frame(MSG_EXIT, 0, {"username": username}))
+                else:
+                    client.send(f'EXIT:<{username}> saiu do chat'.encode())
                 stop_event.set()
                 break
 
@@ -65,6 +194,7 @@ def sendMessages(client, username, stop_event, number):
 
                 batch = dados[number_int]
                 rand_request = batch["rand_request"]
+                futures = []
 
                 for i in range(rand_request):
                     print(f"executando a {i + 1}° requisição, no total de {rand_request}")
@@ -81,17 +211,34 @@ def sendMessages(client, username, stop_event, number):
                         'idx': i
                     }
 
-                    json_str = json.dumps(payload)
+                    # opcionais no lote: prazo em segundos, erro relativo alvo, prévias a cada k iterações
+                    # e posto do tsvd
+                    for campo in ('deadline', 'tol', 'stream', 'rank'):
+                        if batch.get(campo) is not None:
+                            payload[campo] = batch[campo][i]
+
+                    amostras = ler_sinal(g) if ENVIAR_SINAL else None
 
-                    client.send(f'2_|{username}|{json_str}'.encode())
+                    if pipeline is not None:
+                        # sem pausa entre envios: só a janela do servidor limita
+                        futures.append(pipeline.submit(payload, amostras or b""))
+                    else:
+                        if amostras:
+                            payload['signal_data'] = base64.b64encode(amostras).decode()
+                        json_str = json.dumps(payload)
+
+                        # "\n" delimita a mensagem para o servidor
+                        client.sendall(f'2_|{username}|{json_str}\n'.encode())
 
                     print(
                         f"[{i+1}/{rand_request}] (batch) Usuário: {username} | "
                         f"Modelo: {model} | Sinal: {g} | Algoritmo: {algorithm}"
                     )
 
-                    sleep(random.uniform(0.5, 2.0))
-
+                if futures:
+                    wait(futures)
+                    falhas = sum(1 for future in futures if future.exception() is not None)
+                    print(f"{len(futures) - falhas}/{len(futures)} imagens recebidas")
 
         except Exception as e:
             print('Erro: ', e)
@@ -108,31 +255,48 @@ def create_paste(username):
     if not user_dir.exists():
         os.makedirs(user_dir, exist_ok=True)
 
-def receiveMessages(client, stop_event):
-    while not stop_event.is_set():
-        try:
-            # 1. Recebe 4 bytes com o tamanho do JSON
-            data = client.recv(1000000)
-            if not data:
-                break
+def read_message(receiver, binary):
+    # retorna (tipo, id do pedido, header, bytes da imagem)
+    if binary:
+        version, msg_type, request_id, header_len, payload_len = FRAME.unpack(receiver.read_exact(FRAME.size))
+        if version != PROTOCOL_VERSION:
+            raise ValueError(f"versão de protocolo {version} não suportada")
+        header = json.loads(receiver.read_exact(header_len)) if header_len else {}
+        return msg_type, request_id, header, receiver.read_exact(payload_len)
 
-            decoded_str = data.decode()
-            decoded = json.loads(decoded_str)  # <-- transforma string em dict
+    decoded = json.loads(receiver.read_line())
+    if decoded['type'] != "2_":
+        return decoded['type'], 0, decoded['payload'], b""
 
-            json_str = decoded['payload']  # agora funciona
-            tipo = decoded['type']
+    # converter Base64 para bytes
+    return MSG_RESULT, 0, decoded['payload']['header'], base64.b64decode(decoded['payload']['image'])
 
+def receiveMessages(receiver, stop_event, pipeline):
+    while not stop_event.is_set():
+        try:
+            tipo, request_id, header, img_bytes = read_message(receiver, pipeline is not None)
 
             if tipo == "1_":
-                print("IDs recebidos:", json_str)
-
-            if tipo == "2_":
-                header = decoded['payload']['header']
-                img_b64 = decoded['payload']['image']
-
-                # converter Base64 para bytes
-                img_bytes = base64.b64decode(img_b64)
+                print("IDs recebidos:", header)
+
+            if tipo == MSG_ERROR:
+                print(f"Falha no pedido {request_id}: {header.get('error')}")
+                # id duplicado: a recusa é de um quadro repetido; o pedido original segue
+                # em andamento e ainda recebe a própria resposta
+                if header.get('rejected') != "duplicate":
+                    pipeline.fail(request_id, RuntimeError(header.get('error')))
+
+            if tipo == MSG_PREVIEW:
+                # só a prévia mais recente interessa: sobrescreve a anterior do mesmo pedido
+                path = ACTUAL_DIR / "users" / header['username'] / f"previa_{header['index']}.png"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                temp = path.with_suffix(".tmp")
+                with open(temp, "wb") as f:
+                    f.write(img_bytes)
+                os.replace(temp, path)   # quem estiver exibindo nunca vê o arquivo pela metade
+                print(f"Prévia do pedido {header['index']}: iteração {header['iteration']}, erro {header['error']:.3e}")
 
+            if tipo == MSG_RESULT:
                 # salvar imagem
                 name = f"{header['username']}_{header['algorithm']}_{header['start_dt'].replace(':','-')}_{header['end_dt'].replace(':','-')}_{header['size']}_{header['iters']}.png"
                 # Usa o mesmo ACTUAL_DIR para garantir consistência
@@ -155,7 +319,9 @@ def receiveMessages(client, stop_event):
                     f"Inicio: {header['start_dt']} | "
                     f"Fim: {header['end_dt']} | "
                     f"Tamanho: {header['size']} | "
-                    f"Iteracoes: {header['iters']}\n")
+                    f"Iteracoes: {header['iters']} | "
+                    f"Poupadas: {header.get('iters_saved', 0)} | "
+                    f"Parada: {header.get('stop_reason')}\n")
 
                 # adicionar linha ao CSV em modo append
                 with open(path, 'a', encoding='utf-8') as f:
@@ -163,8 +329,13 @@ def receiveMessages(client, stop_event):
 
                 print("Imagem salva:", path)
 
+                if pipeline is not None:
+                    pipeline.complete(request_id, header)
+
         except Exception as e:
             print("Erro:", e)
+            if pipeline is not None:
+                pipeline.fail_all(e)
             break
 
 def main():
@@ -182,10 +353,15 @@ def main():
     create_paste(username)
     stop_event = threading.Event()
 
-    recv_thread = threading.Thread(target=receiveMessages, args=(client, stop_event))
+    receiver = Receiver(client)
+    window = negotiate(client, receiver, username)
+    pipeline = Pipeline(client, window) if window else None
+    print('Protocolo:', f'binário (janela de {window} pedidos)' if window else 'texto')
+
+    recv_thread = threading.Thread(target=receiveMessages, args=(receiver, stop_event, pipeline))
     recv_thread.start()
 
-    send_thread = threading.Thread(target=sendMessages, args=[client, username, stop_event, number])
+    send_thread = threading.Thread(target=sendMessages, args=[client, username, stop_event, number, pipeline])
     send_thread.start()
 
 
@@ -0,0 +1,55 @@
+import asyncio
+
+from connection import AsyncConnection
+from protocol import MessageBuffer
+
+READ_CHUNK = 64 * 1024
+BACKLOG = 4096
+
+
+async def handle_connection(reader, writer, request_queue, window):
+    conn = AsyncConnection(asyncio.get_running_loop(), writer)
+    buffer = MessageBuffer()
+    print(f"[NOVA CONEXÃO] {conn.addr} conectado")
+
+    try:
+        while not conn.closed:
+            data = await reader.read(READ_CHUNK)
+            if not data:
+                break
+
+            for message in buffer.feed(data):
+                if message.kind == "EXIT":
+                    conn.closed = True
+                    break
+
+                if message.kind == "HELLO":
+                    conn.negotiate(message.payload, window)
+                    continue
+
+                # o cálculo fica com os workers (threads/processos); o loop só faz I/O
+                if conn.admit(message.request_id):
+                    request_queue.put({"payload": message.payload, "client": conn, "request_id": message.request_id,
+                                       "body": message.body})
+
+            # respostas escritas aqui mesmo (hello, recusas): só lê mais depois que saírem
+            await conn.drain()
+
+    except (ConnectionResetError, ValueError) as e:
+        print(f"[DESCONECTADO] {conn.addr} encerrou a conexão: {e}")
+
+    conn.close()
+
+
+async def serve(host, port, request_queue, window):
+    server = await asyncio.start_server(
+        lambda reader, writer: handle_connection(reader, writer, request_queue, window),
+        host, port, backlog=BACKLOG)
+
+    print(f"Servidor (asyncio) iniciado em {host}:{port} e aguardando conexões...")
+    async with server:
+        await server.serve_forever()
+
+
+def run(host, port, request_queue, window):
+    asyncio.run(serve(host, port, request_queue, window))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Compara o CGNR direto em H com o CGNR sobre H^T H pré-calculado (--gram).
+
+Uso:
+    python bench_gram.py                               # modelos sintéticos 30x30 e 60x60
+    python bench_gram.py models/model-30x30.hmdl -i 1 5 10 20
+    python bench_gram.py --escala 0.25                 # sintéticos menores (máquinas com pouca RAM)
+
+Para cada modelo mede o custo de calcular H^T H e o tempo de uma reconstrução
+com k iterações pelos dois caminhos, e informa o ponto de cruzamento:
+  - com quantas iterações uma única reconstrução já paga o pré-cálculo;
+  - com quantas reconstruções de k iterações o pré-cálculo se paga.
+"""
+
+import argparse
+import math
+import sys
+from time import perf_counter
+
+import numpy as np
+
+from model_format import load_model
+from solvers import compute_gram, reconstruct_cgnr
+
+SINTETICOS = {
+    '30x30': (27904, 900),
+    '60x60': (50816, 3600),
+}
+
+
+def cronometrar(fn, repeticoes):
+    melhor = math.inf
+    for _ in range(repeticoes):
+        inicio = perf_counter()
+        fn()
+        melhor = min(melhor, perf_counter() - inicio)
+    return melhor
+
+
+def carregar(nome, escala, rng):
+    if nome in SINTETICOS:
+        linhas, colunas = SINTETICOS[nome]
+        linhas, colunas = max(int(linhas * escala), 1), max(int(colunas * escala), 1)
+        return f"sintético {nome} ({linhas}x{colunas})", rng.random((linhas, colunas), dtype=np.float32)
+
+    H, info = load_model(nome)
+    return f"{nome} {info.shape}", H
+
+
+def medir(nome, H, iteracoes, repeticoes, rng):
+    g = rng.random(H.shape[0], dtype=np.float32)
+
+    inicio = perf_counter()
+    gram = compute_gram(H)
+    t_gram = perf_counter() - inicio
+
+    print(f"\n== {nome}")
+    print(f"H: {H.nbytes / 1024**2:.1f} MB | H^T H: {gram.nbytes / 1024**2:.1f} MB | pré-cálculo: {t_gram:.3f}s")
+    print(f"{'iters':>6} {'H (s)':>10} {'gram (s)':>10} {'ganho/solve':>12} {'solves p/ pagar':>16}")
+
+    cruzamento = None
+    for k in iteracoes:
+        # min_iterations > k: sempre k iterações, sem parada por tolerância
+        t_h = cronometrar(lambda: reconstruct_cgnr(H, g, k, tol=0.0, min_iterations=k + 1), repeticoes)
+        t_g = cronometrar(lambda: reconstruct_cgnr(H, g, k, tol=0.0, min_iterations=k + 1, gram=gram), repeticoes)
+
+        ganho = t_h - t_g
+        pagar = math.ceil(t_gram / ganho) if ganho > 0 else math.inf
+        print(f"{k:>6} {t_h:>10.4f} {t_g:>10.4f} {ganho:>12.4f} {pagar:>16}")
+
+        if cruzamento is None and t_g + t_gram <= t_h:
+            cruzamento = k
+
+    if cruzamento is None:
+        print("Uma reconstrução sozinha não pagou o pré-cálculo nas iterações medidas.")
+    else:
+        print(f"Uma reconstrução com {cruzamento}+ iterações já paga o pré-cálculo.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CGNR: H direto x H^T H pré-calculado")
+    parser.add_argument("modelos", nargs="*", default=list(SINTETICOS),
+                        help="arquivos de modelo (.csv/.hmdl) ou 30x30/60x60 para sintéticos")
+    parser.add_argument("-i", "--iteracoes", type=int, nargs="+", default=[1, 2, 5, 10, 20, 50])
+    parser.add_argument("-r", "--repeticoes", type=int, default=3)
+    parser.add_argument("--escala", type=float, default=1.0, help="fator de tamanho dos modelos sintéticos")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for modelo in args.modelos:
+        nome, H = carregar(modelo, args.escala, rng)
+        medir(nome, H, sorted(args.iteracoes), args.repeticoes, rng)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Compara os kernels sem precondicionador (cgnr, cgne) com os precondicionados
+(pcgnr com Jacobi e com block-Jacobi, pcgne com Jacobi).
+
+Uso:
+    python bench_precond.py models/model-30x30.csv                # sinais ../client/signals/signal-30x30-*.csv
+    python bench_precond.py models/model-60x60.csv --sinais s.csv --tol 1e-3
+    python bench_precond.py                                        # sintéticos com colunas de normas variadas
+
+Para cada modelo informa o custo de montar cada precondicionador e, por
+algoritmo, as iterações até a tolerância, o tempo e o erro final (médias
+dos sinais). Os sinais passam pelo mesmo ganho aplicado pelo servidor.
+O pcgne só vale para H consistente ou subdeterminado: com modelo alto e
+sinal com ruído ele para por "divergence" e devolve o melhor iterado.
+"""
+
+import argparse
+import glob
+import os
+import sys
+from time import perf_counter
+
+import numpy as np
+
+from model_format import load_model
+from signal_gain import load_signal_csv
+from solvers import (PRECOND_BLOCK, StopCriteria, compute_preconditioner, reconstruct_cgne, reconstruct_cgnr,
+                     reconstruct_pcgne, reconstruct_pcgnr)
+
+SIGNALS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "client", "signals")
+
+SINTETICOS = {
+    '30x30': (27904, 900),
+    '60x60': (50816, 3600),
+}
+
+
+def carregar(nome, escala, rng):
+    if nome in SINTETICOS:
+        linhas, colunas = SINTETICOS[nome]
+        linhas, colunas = max(int(linhas * escala), 1), max(int(colunas * escala), 1)
+        # normas de coluna de 0,01 a 10: o caso em que a escala faz diferença
+        H = rng.random((linhas, colunas), dtype=np.float32) * np.logspace(-2, 1, colunas, dtype=np.float32)
+        return f"sintético {nome} ({linhas}x{colunas})", H
+
+    H, info = load_model(nome)
+    return f"{nome} {info.shape}", H
+
+
+def sinais_do_modelo(modelo, sinais, H, rng):
+    if sinais:
+        return [load_signal_csv(s) for s in sinais]
+
+    # sinais distribuídos com o projeto: model-30x30.csv -> signal-30x30-*.csv
+    tamanho = os.path.splitext(os.path.basename(modelo))[0].replace("model-", "")
+    encontrados = sorted(glob.glob(os.path.join(SIGNALS_DIR, f"signal-{tamanho}-*.csv")))
+    if encontrados:
+        return [load_signal_csv(s) for s in encontrados]
+    return [(H @ rng.random(H.shape[1], dtype=np.float32)).astype(np.float32)]
+
+
+def medir(nome, H, sinais, args):
+    print(f"\n== {nome}: {len(sinais)} sinal(is), tol={args.tol:g}, máx. {args.max_iteracoes} iterações")
+
+    precond = {}
+    for tipo, bloco in (("Jacobi", 0), ("block-Jacobi", PRECOND_BLOCK)):
+        inicio = perf_counter()
+        precond[tipo] = compute_preconditioner(H, bloco)
+        print(f"precondicionador {tipo}: {perf_counter() - inicio:.3f}s")
+
+    kernels = [
+        ("cgnr", lambda g, stop: reconstruct_cgnr(H, g, args.max_iteracoes, stop=stop)),
+        ("pcgnr Jacobi", lambda g, stop: reconstruct_pcgnr(H, g, args.max_iteracoes, stop=stop, **precond["Jacobi"])),
+        ("pcgnr bloco", lambda g, stop: reconstruct_pcgnr(H, g, args.max_iteracoes, stop=stop, **precond["block-Jacobi"])),
+        ("cgne", lambda g, stop: reconstruct_cgne(H, g, args.max_iteracoes, stop=stop)),
+        ("pcgne Jacobi", lambda g, stop: reconstruct_pcgne(H, g, args.max_iteracoes, stop=stop, **precond["Jacobi"])),
+    ]
+
+    print(f"{'algoritmo':>14} {'iters':>7} {'tempo (s)':>10} {'erro final':>11} {'convergiu':>10}")
+    for nome_kernel, resolver in kernels:
+        iters, tempos, erros, convergiu = [], [], [], 0
+        for g in sinais:
+            stop = StopCriteria(args.max_iteracoes, args.tol)
+            inicio = perf_counter()
+            _, k, erro = resolver(g, stop)
+            tempos.append(perf_counter() - inicio)
+            iters.append(k)
+            erros.append(erro)
+            convergiu += stop.reason == "tolerance"
+
+        print(f"{nome_kernel:>14} {np.mean(iters):>7.1f} {np.mean(tempos):>10.3f} {np.mean(erros):>11.3e} "
+              f"{f'{convergiu}/{len(sinais)}':>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark: CGNR/CGNE com e sem precondicionador")
+    parser.add_argument("modelos", nargs="*", default=list(SINTETICOS),
+                        help="arquivos de modelo (.csv/.hmdl) ou 30x30/60x60 para sintéticos")
+    parser.add_argument("--sinais", nargs="+", help="arquivos de sinal (padrão: os do projeto para o tamanho do modelo)")
+    parser.add_argument("--tol", type=float, default=1e-4, help="erro relativo alvo")
+    parser.add_argument("--max-iteracoes", type=int, default=200)
+    parser.add_argument("--escala", type=float, default=1.0, help="fator de tamanho dos modelos sintéticos")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for modelo in args.modelos:
+        nome, H = carregar(modelo, args.escala, rng)
+        medir(nome, H, sinais_do_modelo(modelo, args.sinais, H, rng), args)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Compara a reconstrução por SVD truncada (tsvd) com o CGNR.
+
+Uso:
+    python bench_tsvd.py models/model-30x30.csv                  # sinais ../client/signals/signal-30x30-*.csv
+    python bench_tsvd.py models/model-60x60.csv -k 16 64 256 --tol 1e-3
+    python bench_tsvd.py --escala 0.25                            # sintéticos de espectro decrescente
+
+Para cada modelo mede o cálculo dos fatores (uma vez por modelo) e, para
+cada posto k, o tempo de uma reconstrução, o erro relativo do resíduo
+||g - Hf|| / ||g|| e a distância à solução do CGNR, ||f - f_cgnr|| / ||f_cgnr||.
+"""
+
+import argparse
+import sys
+from time import perf_counter
+
+import numpy as np
+
+from bench_precond import sinais_do_modelo
+from model_format import load_model
+from solvers import TSVD_RANK, StopCriteria, compute_tsvd, reconstruct_cgnr, reconstruct_tsvd
+
+SINTETICOS = {
+    '30x30': (27904, 900),
+    '60x60': (50816, 3600),
+}
+
+
+def carregar(nome, escala, rng):
+    if nome in SINTETICOS:
+        linhas, colunas = SINTETICOS[nome]
+        linhas, colunas = max(int(linhas * escala), 1), max(int(colunas * escala), 1)
+        # posto efetivo baixo + ruído: valores singulares caem rápido, como num modelo físico
+        posto = max(colunas // 16, 1)
+        H = (rng.standard_normal((linhas, posto), dtype=np.float32) @ rng.standard_normal((posto, colunas), dtype=np.float32)
+             + 0.01 * rng.standard_normal((linhas, colunas), dtype=np.float32))
+        return f"sintético {nome} ({linhas}x{colunas}, posto efetivo {posto})", H
+
+    H, info = load_model(nome)
+    return f"{nome} {info.shape}", H
+
+
+def residuo(H, g, f):
+    return np.linalg.norm(g - H @ f.astype(H.dtype)) / np.linalg.norm(g)
+
+
+def medir(nome, H, sinais, args):
+    print(f"\n== {nome}: {len(sinais)} sinal(is)")
+
+    inicio = perf_counter()
+    fatores = compute_tsvd(H, max(args.postos))
+    t_fatores = perf_counter() - inicio
+    tamanho = sum(fatores[k].nbytes for k in fatores) / 1024**2
+    print(f"H: {H.nbytes / 1024**2:.1f} MB | fatores: {tamanho:.1f} MB | cálculo: {t_fatores:.3f}s")
+
+    referencias = []
+    tempos, erros = [], []
+    for g in sinais:
+        inicio = perf_counter()
+        f, _, _ = reconstruct_cgnr(H, g, args.max_iteracoes, stop=StopCriteria(args.max_iteracoes, args.tol))
+        tempos.append(perf_counter() - inicio)
+        erros.append(residuo(H, g, f))
+        referencias.append(f)
+
+    print(f"{'algoritmo':>12} {'tempo (s)':>10} {'resíduo':>10} {'dist. CGNR':>11}")
+    print(f"{'cgnr':>12} {np.mean(tempos):>10.4f} {np.mean(erros):>10.3e} {'-':>11}")
+
+    for k in args.postos:
+        tempos, erros, distancias = [], [], []
+        for g, referencia in zip(sinais, referencias):
+            inicio = perf_counter()
+            f, _, _ = reconstruct_tsvd(H, g, 1, rank=k, **fatores)
+            tempos.append(perf_counter() - inicio)
+            erros.append(residuo(H, g, f))
+            distancias.append(np.linalg.norm(f - referencia) / (np.linalg.norm(referencia) + 1e-12))
+
+        print(f"{f'tsvd k={k}':>12} {np.mean(tempos):>10.4f} {np.mean(erros):>10.3e} {np.mean(distancias):>11.3e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark: SVD truncada x CGNR")
+    parser.add_argument("modelos", nargs="*", default=list(SINTETICOS),
+                        help="arquivos de modelo (.csv/.hmdl) ou 30x30/60x60 para sintéticos")
+    parser.add_argument("--sinais", nargs="+", help="arquivos de sinal (padrão: os do projeto para o tamanho do modelo)")
+    parser.add_argument("-k", "--postos", type=int, nargs="+", default=[16, 64, TSVD_RANK])
+    parser.add_argument("--tol", type=float, default=1e-4, help="erro relativo alvo do CGNR")
+    parser.add_argument("--max-iteracoes", type=int, default=50)
+    parser.add_argument("--escala", type=float, default=1.0, help="fator de tamanho dos modelos sintéticos")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for modelo in args.modelos:
+        nome, H = carregar(modelo, args.escala, rng)
+        medir(nome, H, sinais_do_modelo(modelo, args.sinais, H, rng), args)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+import asyncio
+from concurrent.futures import CancelledError
+from threading import Lock, get_ident
+
+from protocol import (MSG_ERROR, MSG_PREVIEW, MSG_RESULT, encode_frame, encode_hello_reply,
+                      encode_legacy_result)
+
+
+def sendmsg_all(sock, buffers):
+    # sendmsg só existe em Unix: no Windows (server.exe) os buffers são juntados numa cópia
+    if not hasattr(sock, "sendmsg"):
+        sock.sendall(b"".join(buffers))
+        return
+
+    # sendmsg pode enviar só parte dos buffers: avança e repete até acabar
+    views = [memoryview(b) for b in buffers if len(b)]
+    while views:
+        sent = sock.sendmsg(views)
+        while views and sent >= len(views[0]):
+            sent -= len(views[0])
+            views.pop(0)
+        if views and sent:
+            views[0] = views[0][sent:]
+
+
+class _Connection:
+    """Parte comum às conexões: protocolo negociado e janela de pedidos em aberto.
+
+    No protocolo binário cada pedido tem um id escolhido pelo cliente e as
+    respostas saem fora de ordem. O cliente pode manter até `window` pedidos
+    sem resposta; o que passar disso é recusado com um quadro de erro.
+    """
+
+    def __init__(self):
+        # protocol: None = texto legado ("2_" com imagem em base64), 1 = quadros binários
+        self.protocol = None
+        self.window = 0
+        self.__pending = set()   # ids de pedidos aceitos e ainda sem resposta
+        self.__pending_lock = Lock()
+
+    def negotiate(self, reply, window):
+        # a resposta do "3_" sai ainda em texto; os próximos envios já usam o protocolo escolhido
+        if reply["protocol"]:
+            reply = dict(reply, window=window)
+            self.window = window
+        self.send_buffers([encode_hello_reply(reply)])
+        self.protocol = reply["protocol"]
+
+    def admit(self, request_id):
+        # texto legado não tem ids nem janela: tudo entra na fila
+        if not self.protocol:
+            return True
+
+        # "rejected" diz ao cliente por que o quadro foi recusado: com "duplicate" o id
+        # ainda é do pedido original, que segue valendo e vai receber a própria resposta
+        with self.__pending_lock:
+            if request_id in self.__pending:
+                reason, rejected = f"id {request_id} já está em andamento", "duplicate"
+            elif len(self.__pending) >= self.window:
+                reason, rejected = f"janela de {self.window} pedidos em aberto excedida", "window"
+            else:
+                self.__pending.add(request_id)
+                return True
+
+        self.send_buffers(encode_frame(MSG_ERROR, request_id, {"error": reason, "rejected": rejected}))
+        return False
+
+    def send_result(self, header, image, request_id=0):
+        if self.protocol:
+            # libera antes de enviar: o cliente pode reusar o id assim que receber a resposta
+            self.__release(request_id)
+            self.send_buffers(encode_frame(MSG_RESULT, request_id, dict(header, size=len(image)), image))
+        else:
+            self.send_buffers([encode_legacy_result(header, image)])
+
+    def send_preview(self, header, image, request_id=0):
+        # prévia não encerra o pedido (o id continua na janela); o texto legado não tem prévias
+        if self.protocol:
+            self.send_buffers(encode_frame(MSG_PREVIEW, request_id, dict(header, size=len(image)), image))
+
+    def send_error(self, header, request_id=0):
+        # o formato texto não tem mensagem de erro: o cliente legado só não recebe a imagem
+        if self.protocol:
+            self.__release(request_id)
+            self.send_buffers(encode_frame(MSG_ERROR, request_id, header))
+
+    def __release(self, request_id):
+        with self.__pending_lock:
+            self.__pending.discard(request_id)
+
+    def sendall(self, data):
+        self.send_buffers([data])
+
+
+class SocketConnection(_Connection):
+    """Conexão de um cliente no modo thread.
+
+    Várias threads de worker podem responder ao mesmo cliente; o lock evita
+    que duas respostas se misturem no socket.
+    """
+
+    def __init__(self, sock, addr):
+        super().__init__()
+        self.sock = sock
+        self.addr = addr
+        self.closed = False
+        self.__lock = Lock()
+
+    def send_buffers(self, buffers):
+        with self.__lock:
+            if self.closed:
+                return
+            try:
+                sendmsg_all(self.sock, buffers)
+            except OSError as e:
+                print(f"[DESCONECTADO] {self.addr}: resposta descartada ({e})")
+                self.closed = True
+
+    def close(self):
+        with self.__lock:
+            self.closed = True
+        self.sock.close()
+
+
+class AsyncConnection(_Connection):
+    """Conexão de um cliente no modo asyncio.
+
+    As respostas saem das threads de worker; a escrita em si é agendada no
+    event loop, que é o dono do transporte. O worker espera o drain: um
+    cliente que não lê segura quem responde a ele, como o sendmsg bloqueante
+    do modo thread, em vez de acumular respostas no buffer do transporte.
+    Envios feitos no próprio loop (hello, recusas da janela) não podem
+    esperar ali: handle_connection faz o drain depois de cada leitura.
+    """
+
+    def __init__(self, loop, writer):
+        super().__init__()
+        self.loop = loop
+        self.writer = writer
+        self.addr = writer.get_extra_info("peername")
+        self.closed = False
+        self.__loop_thread = get_ident()   # criada dentro do loop
+
+    def send_buffers(self, buffers):
+        if self.closed:
+            return
+        if get_ident() == self.__loop_thread:
+            self.__write(buffers)
+            return
+        try:
+            future = asyncio.run_coroutine_threadsafe(self.__write_and_drain(buffers), self.loop)
+        except RuntimeError:
+            # event loop já encerrado
+            self.closed = True
+            return
+        try:
+            future.result()
+        except (OSError, CancelledError) as e:
+            print(f"[DESCONECTADO] {self.addr}: resposta descartada ({e!r})")
+            self.closed = True
+
+    def __write(self, buffers):
+        if not self.closed and not self.writer.is_closing():
+            self.writer.writelines(buffers)
+
+    async def __write_and_drain(self, buffers):
+        self.__write(buffers)
+        await self.drain()
+
+    async def drain(self):
+        if not self.writer.is_closing():
+            await self.writer.drain()
+
+    def close(self):
+        self.closed = True
+        self.writer.close()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Converte os modelos CSV (model-NxN.csv) para o formato binário mapeável (.hmdl).
+
+Uso:
+    python converter_modelos.py                 # todos os CSV em server/models/
+    python converter_modelos.py models/model-30x30.csv
+"""
+
+import argparse
+import os
+import sys
+from glob import glob
+from time import time
+
+from model_format import binary_path, load_csv_model, open_binary_model, write_model
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+
+
+def converter(csv_path, force=False):
+    destino = binary_path(csv_path)
+
+    if not force and os.path.exists(destino) and os.stat(destino).st_mtime_ns >= os.stat(csv_path).st_mtime_ns:
+        print(f"[OK] {destino} já está atualizado")
+        return
+
+    inicio = time()
+    H, info = load_csv_model(csv_path)
+    write_model(destino, H, side=info.side)
+
+    # relê o arquivo gerado e confere o checksum
+    _, lido = open_binary_model(destino, verify=True)
+
+    print(f"[CONVERTIDO] {csv_path} -> {destino} | {lido} | {time() - inicio:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Converte modelos CSV para o formato binário (.hmdl)")
+    parser.add_argument("modelos", nargs="*", help="arquivos CSV (padrão: server/models/*.csv)")
+    parser.add_argument("-f", "--force", action="store_true", help="reconverte mesmo se o binário estiver atualizado")
+    args = parser.parse_args()
+
+    modelos = args.modelos or sorted(glob(os.path.join(MODELS_DIR, "model-*.csv")))
+    if not modelos:
+        print(f"Nenhum modelo encontrado em {MODELS_DIR}")
+        return 1
+
+    for csv_path in modelos:
+        converter(csv_path, force=args.force)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+from collections import deque
+from threading import Lock
+import json
+import math
+import os
+
+HISTORY_WINDOW = 64   # últimos tempos guardados por chave para o p95
+SMOOTHING = 0.2       # peso da medição nova nas médias móveis
+
+
+def history_key(model, signal, algorithm=None):
+    # só o nome do arquivo, sem pasta nem extensão: "model-30x30", "signal-30x30-0"
+    def stem(path):
+        return os.path.splitext(os.path.basename(path.replace("\\", "/")))[0]
+    return (stem(model), stem(signal), algorithm.lower() if algorithm else None)
+
+
+class CostHistory:
+    """Histórico de custo das reconstruções: log JSONL só de acréscimo + índice em memória.
+
+    Cada registro tem o formato do teste.json (algorithm, model, signal, time,
+    cpu_used, mem_used_bytes, ...). O índice guarda agregados por
+    (modelo, sinal, algoritmo) e por (modelo, sinal), atualizados a cada
+    registro, então estimate() é uma consulta a dicionário.
+    """
+
+    def __init__(self, path, seed=None):
+        self.path = path
+        self.__index = {}
+        self.__lock = Lock()
+
+        if os.path.exists(path):
+            line = "\n"
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self.__update(json.loads(line))
+                    except ValueError:
+                        pass   # linha cortada por uma queda no meio da escrita
+            self.__log = open(path, "a", encoding="utf-8")
+            if not line.endswith("\n"):
+                self.__log.write("\n")   # o próximo registro não pode colar na linha cortada
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self.__log = open(path, "a", encoding="utf-8")
+            # primeira execução: importa as medições antigas (lista JSON, ex.: teste.json)
+            for record in self.__read_seed(seed):
+                self.record(record)
+
+    def record(self, record):
+        line = json.dumps(record) + "\n"
+        with self.__lock:
+            self.__update(record)
+            self.__log.write(line)
+            self.__log.flush()
+
+    def estimate(self, model, signal, algorithm=None):
+        # agregados do mesmo modelo/sinal/algoritmo; sem histórico dele, do mesmo modelo/sinal
+        key = history_key(model, signal, algorithm)
+        stats = self.__index.get(key) or self.__index.get(key[:2] + (None,))
+        if stats is None:
+            return None
+        return {name: value for name, value in stats.items() if name != "times"}
+
+    def close(self):
+        with self.__lock:
+            self.__log.close()
+
+    def __update(self, record):
+        key = history_key(record["model"], record["signal"], record.get("algorithm"))
+        for k in {key, key[:2] + (None,)}:
+            stats = self.__index.get(k)
+            if stats is None:
+                stats = self.__index[k] = {
+                    "count": 0, "time_ewma": record["time"], "time_p95": record["time"],
+                    "cpu_ewma": record["cpu_used"], "cpu_peak": 0.0, "rss_peak": 0,
+                    "times": deque(maxlen=HISTORY_WINDOW),
+                }
+
+            stats["count"] += 1
+            stats["time_ewma"] += SMOOTHING * (record["time"] - stats["time_ewma"])
+            stats["cpu_ewma"] += SMOOTHING * (record["cpu_used"] - stats["cpu_ewma"])
+            stats["cpu_peak"] = max(stats["cpu_peak"], record["cpu_used"])
+            stats["rss_peak"] = max(stats["rss_peak"], record["mem_used_bytes"])
+
+            stats["times"].append(record["time"])
+            ordered = sorted(stats["times"])
+            stats["time_p95"] = ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)]
+
+    @staticmethod
+    def __read_seed(seed):
+        if seed is None:
+            return []
+        try:
+            with open(seed, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
@@ -0,0 +1,43 @@
+from concurrent.futures import Future
+from threading import Lock
+
+
+class InFlightJobs:
+    """Pedidos idênticos em andamento compartilham uma única reconstrução.
+
+    O primeiro pedido de uma chave vira o líder e calcula; os seguintes
+    recebem o mesmo Future e são respondidos quando ele terminar.
+    """
+
+    def __init__(self):
+        self.__futures = {}   # chave do pedido -> Future
+        self.__lock = Lock()
+
+    def join(self, key):
+        # retorna (future, True) para o líder e (future, False) para quem chega depois
+        with self.__lock:
+            future = self.__futures.get(key)
+            if future is not None:
+                return future, False
+
+            future = self.__futures[key] = Future()
+            future.set_running_or_notify_cancel()
+            return future, True
+
+    def finish(self, key, result):
+        future = self.__pop(key)
+        if future is not None:
+            future.set_result(result)
+
+    def fail(self, key, error):
+        future = self.__pop(key)
+        if future is not None:
+            future.set_exception(error)
+
+    def __pop(self, key):
+        with self.__lock:
+            return self.__futures.pop(key, None)
+
+    def __len__(self):
+        with self.__lock:
+            return len(self.__futures)
@@ -0,0 +1,164 @@
+import os
+import re
+import struct
+import zlib
+import numpy as np
+
+# Formato binário do modelo (.hmdl):
+#   cabeçalho fixo de HEADER_SIZE bytes (little-endian)
+#     magic  4s   b'HMDL'
+#     versão H
+#     dtype  8s   ex.: b'<f4'
+#     linhas Q
+#     colunas Q
+#     lado   I    lado da imagem reconstruída (30 para 30x30)
+#     crc32  I    checksum dos dados
+#   dados da matriz H em ordem C, logo após o cabeçalho
+MAGIC = b'HMDL'
+VERSION = 1
+HEADER_SIZE = 64
+BINARY_SUFFIX = '.hmdl'
+
+_HEADER = struct.Struct('<4sH8sQQII')
+
+_CHECKSUM_CHUNK = 64 * 1024**2
+
+
+class ModelInfo:
+    def __init__(self, rows, cols, side, dtype, checksum):
+        self.rows = rows
+        self.cols = cols
+        self.side = side
+        self.dtype = np.dtype(dtype)
+        self.checksum = checksum
+
+    @property
+    def shape(self):
+        return (self.rows, self.cols)
+
+    @property
+    def image_shape(self):
+        return (self.cols, 1)
+
+    @property
+    def final_image_shape(self):
+        return (self.side, self.side)
+
+    def __repr__(self):
+        return f"ModelInfo(shape={self.shape}, side={self.side}, dtype={self.dtype}, checksum={self.checksum:08x})"
+
+
+def checksum(H):
+    # crc32 em blocos para não duplicar a matriz na memória
+    data = memoryview(np.ascontiguousarray(H)).cast('B')
+    crc = 0
+    for start in range(0, len(data), _CHECKSUM_CHUNK):
+        crc = zlib.crc32(data[start:start + _CHECKSUM_CHUNK], crc)
+    return crc
+
+
+def infer_side(path, cols):
+    # "model-30x30.csv" -> 30; sem padrão no nome, assume imagem quadrada
+    match = re.search(r'(\d+)x(\d+)', os.path.basename(path))
+    if match and int(match.group(1)) == int(match.group(2)):
+        return int(match.group(1))
+    return int(np.sqrt(cols))
+
+
+def binary_path(path):
+    root, ext = os.path.splitext(path)
+    return path if ext == BINARY_SUFFIX else root + BINARY_SUFFIX
+
+
+def resolve_model_path(path):
+    # prefere o binário quando ele existe e não é mais antigo que o CSV
+    binary = binary_path(path)
+    if binary == path or not os.path.exists(binary):
+        return path
+    if os.path.exists(path) and os.stat(path).st_mtime_ns > os.stat(binary).st_mtime_ns:
+        return path
+    return binary
+
+
+def read_header(path):
+    with open(path, 'rb') as f:
+        raw = f.read(HEADER_SIZE)
+
+    if len(raw) < HEADER_SIZE:
+        raise ValueError(f"{path}: cabeçalho incompleto")
+
+    magic, version, dtype, rows, cols, side, crc = _HEADER.unpack_from(raw)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: não é um modelo binário")
+    if version != VERSION:
+        raise ValueError(f"{path}: versão {version} não suportada")
+
+    return ModelInfo(rows, cols, side, dtype.rstrip(b'\0').decode(), crc)
+
+
+def write_model(path, H, side=None):
+    H = np.ascontiguousarray(H)
+    if side is None:
+        side = infer_side(path, H.shape[1])
+    dtype = H.dtype.newbyteorder('<')
+    H = H.astype(dtype, copy=False)
+    crc = checksum(H)
+
+    header = _HEADER.pack(MAGIC, VERSION, dtype.str.encode(), H.shape[0], H.shape[1], side, crc)
+
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(header.ljust(HEADER_SIZE, b'\0'))
+        f.write(memoryview(H).cast('B'))
+    os.replace(tmp, path)
+
+    return ModelInfo(H.shape[0], H.shape[1], side, dtype, crc)
+
+
+def open_binary_model(path, verify=False):
+    info = read_header(path)
+    H = np.memmap(path, dtype=info.dtype, mode='r', offset=HEADER_SIZE, shape=info.shape)
+    if verify and checksum(H) != info.checksum:
+        raise ValueError(f"{path}: checksum não confere")
+    return H, info
+
+
+def load_csv_model(path):
+    H = np.loadtxt(path, delimiter=',', dtype=np.float32)
+    return H, ModelInfo(H.shape[0], H.shape[1], infer_side(path, H.shape[1]), H.dtype, checksum(H))
+
+
+def load_model(path):
+    if os.path.splitext(path)[1] == BINARY_SUFFIX:
+        return open_binary_model(path)
+    return load_csv_model(path)
+
+
+def sidecar_path(path, kind):
+    # "models/model-30x30.hmdl", "gram" -> "models/model-30x30.gram.npz"
+    return os.path.splitext(path)[0] + f'.{kind}.npz'
+
+
+def save_sidecar(path, kind, checksum, value):
+    # dados derivados do modelo ficam ao lado dele, marcados com o checksum de H
+    arrays = value if isinstance(value, dict) else {'value': value}
+    destino = sidecar_path(path, kind)
+    try:
+        with open(destino + '.tmp', 'wb') as f:
+            np.savez(f, _checksum=np.uint32(checksum), **arrays)
+        os.replace(destino + '.tmp', destino)
+    except OSError as e:
+        print(f"[MODELO] Não foi possível salvar {destino}: {e}")
+
+
+def load_sidecar(path, kind, checksum):
+    origem = sidecar_path(path, kind)
+    if not os.path.exists(origem):
+        return None
+
+    with np.load(origem) as data:
+        if int(data['_checksum']) != checksum:
+            return None   # gerado para outra versão do modelo
+        arrays = {name: data[name] for name in data.files if name != '_checksum'}
+
+    return arrays['value'] if list(arrays) == ['value'] else arrays
@@ -0,0 +1,182 @@
+from threading import Lock, Event
+from collections import OrderedDict
+import os
+import numpy as np
+from model_format import BINARY_SUFFIX, load_model, load_sidecar, read_header, resolve_model_path, save_sidecar
+
+# Orçamento padrão de memória para modelos residentes (bytes)
+DEFAULT_MAX_BYTES = 2 * 1024**3
+
+
+class ModelEntry:
+    """Modelo carregado e compartilhado (somente leitura) entre as threads."""
+
+    def __init__(self, path, mtime, H, info):
+        self.path = path
+        self.mtime = mtime
+        self.H = H
+        self.H.flags.writeable = False
+        self.info = info
+        self.__derived = {}   # dados calculados a partir de H (ex.: gram = H^T H)
+        self.__lock = Lock()
+
+    def derived(self, name, factory, persist=False):
+        # calcula uma vez por modelo; com persist, também guarda ao lado do arquivo
+        with self.__lock:
+            value = self.__derived.get(name)
+            if value is None:
+                if persist:
+                    value = load_sidecar(self.path, name, self.info.checksum)
+                if value is None:
+                    value = factory(self)
+                    if persist:
+                        save_sidecar(self.path, name, self.info.checksum, value)
+                self.__derived[name] = value
+            return value
+
+    def peek(self, name):
+        return self.__derived.get(name)
+
+    @property
+    def nbytes(self):
+        total = self.H.nbytes
+        for value in list(self.__derived.values()):
+            arrays = value.values() if isinstance(value, dict) else [value]
+            total += sum(a.nbytes for a in arrays if isinstance(a, np.ndarray))
+        return total
+
+
+class _PendingLoad:
+    # carga em andamento: quem chegou depois espera o resultado do primeiro
+    def __init__(self):
+        self.__done = Event()
+        self.__entry = None
+        self.__error = None
+
+    def set(self, entry):
+        self.__entry = entry
+        self.__done.set()
+
+    def fail(self, error):
+        self.__error = error
+        self.__done.set()
+
+    def wait(self):
+        self.__done.wait()
+        if self.__error is not None:
+            raise self.__error
+        return self.__entry
+
+
+class ModelRegistry:
+    """Cache LRU de modelos, chaveado por (caminho, mtime) e limitado em bytes.
+
+    Cargas são single-flight: N pedidos simultâneos pelo mesmo modelo ainda
+    não carregado disparam um único parse. O caminho pedido passa antes pelo
+    resolver, que troca o CSV pelo binário mapeável quando ele existe.
+
+    on_evict, se dado, é chamado (fora do lock) com cada ModelEntry que sai do
+    cache, descartado pelo orçamento ou trocado por uma versão nova do arquivo:
+    é onde quem publicou cópias do modelo (ex.: memória compartilhada) as libera.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, loader=load_model, resolver=resolve_model_path, on_evict=None):
+        self.max_bytes = max_bytes
+        self.__loader = loader
+        self.__resolver = resolver
+        self.__on_evict = on_evict
+        self.__entries = OrderedDict()   # (path, mtime) -> ModelEntry, do menos ao mais recente
+        self.__loading = {}              # (path, mtime) -> _PendingLoad
+        self.__lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, path):
+        path = os.path.abspath(self.__resolver(path))
+        key = (path, os.stat(path).st_mtime_ns)
+
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                self.__entries.move_to_end(key)
+                self.hits += 1
+                evicted = self.__evict()
+            else:
+                pending = self.__loading.get(key)
+                leader = pending is None
+                if leader:
+                    pending = _PendingLoad()
+                    self.__loading[key] = pending
+                    self.misses += 1
+
+        if entry is not None:
+            self.__notify(evicted)
+            return entry
+
+        if not leader:
+            return pending.wait()
+
+        try:
+            entry = ModelEntry(path, key[1], *self.__loader(path))
+        except BaseException as e:
+            with self.__lock:
+                del self.__loading[key]
+            pending.fail(e)
+            raise
+
+        with self.__lock:
+            del self.__loading[key]
+            evicted = self.__discard_stale(path)
+            self.__entries[key] = entry
+            evicted += self.__evict()
+
+        pending.set(entry)
+        self.__notify(evicted)
+        return entry
+
+    def load_bytes(self, path):
+        # memória que get(path) ainda alocaria: 0 com o modelo carregado (ou carregando);
+        # senão o tamanho de H pelo cabeçalho do binário ou, no CSV, o do arquivo
+        path = os.path.abspath(self.__resolver(path))
+        key = (path, os.stat(path).st_mtime_ns)
+        with self.__lock:
+            if key in self.__entries or key in self.__loading:
+                return 0
+        if os.path.splitext(path)[1] == BINARY_SUFFIX:
+            info = read_header(path)
+            return info.rows * info.cols * info.dtype.itemsize
+        return os.path.getsize(path)
+
+    def __discard_stale(self, path):
+        # versões antigas do mesmo arquivo (mtime diferente) não serão mais usadas
+        return [self.__entries.pop(key) for key in [k for k in self.__entries if k[0] == path]]
+
+    def __total_bytes(self):
+        # recalculado: dados derivados crescem depois que o modelo entrou no cache
+        return sum(entry.nbytes for entry in self.__entries.values())
+
+    def __evict(self):
+        # o mais recente sempre fica, mesmo que sozinho ultrapasse o orçamento
+        evicted = []
+        while self.__total_bytes() > self.max_bytes and len(self.__entries) > 1:
+            evicted.append(self.__entries.popitem(last=False)[1])
+            self.evictions += 1
+        return evicted
+
+    def __notify(self, evicted):
+        if self.__on_evict is not None:
+            for entry in evicted:
+                self.__on_evict(entry)
+
+    def stats(self):
+        with self.__lock:
+            return {
+                "models": len(self.__entries),
+                "bytes": self.__total_bytes(),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
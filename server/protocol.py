@@ -0,0 +1,181 @@
+from collections import namedtuple
+import base64
+import json
+import struct
+
+# Mensagens do cliente, modo texto (legado):
+#   2_|<username>|<json do pedido>\n
+#   3_|<username>|{"versions": [1]}\n      pede o protocolo binário
+#   EXIT:<username> saiu do chat
+# O "\n" final delimita a mensagem. Clientes antigos não o enviam, então o
+# fim do pedido também é reconhecido pelo fim do objeto JSON.
+#
+# Depois do "3_" aceito, os dois lados passam a trocar quadros binários:
+#   versão B | tipo B | id do pedido I | tamanho do header I | tamanho do payload I
+# seguidos do header (JSON compacto) e do payload em bytes crus (ex.: o PNG).
+# O id do pedido é escolhido pelo cliente e volta na resposta, que pode chegar
+# fora de ordem. A resposta do "3_" informa a janela: quantos pedidos sem
+# resposta o cliente pode manter na conexão.
+# Quadro recusado na chegada volta como MSG_ERROR com "rejected" no header:
+# "window" (janela cheia; o pedido não entrou) ou "duplicate" (o id ainda é
+# de um pedido em andamento, que não é afetado e recebe a própria resposta).
+# Pedidos com "stream": k recebem, antes do resultado, quadros MSG_PREVIEW
+# com a solução parcial a cada k iterações (PNG reduzido; header com
+# iteration e error). Só existem no protocolo binário.
+# O sinal pode ir no próprio pedido, sem o servidor ler "../<signal>.csv":
+# amostras float32 little-endian, sem o ganho (os valores do CSV), no payload
+# do quadro binário ou, em texto, em base64 no campo "signal_data". O campo
+# "signal" continua nomeando o sinal (histórico de custos e resposta).
+
+MAX_MESSAGE_BYTES = 16 * 1024**2
+
+PROTOCOL_VERSION = 1
+FRAME = struct.Struct("!BBIII")
+
+MSG_REQUEST = 1
+MSG_RESULT = 2
+MSG_ERROR = 3
+MSG_EXIT = 4
+MSG_PREVIEW = 5
+
+Message = namedtuple("Message", "kind username payload request_id body", defaults=(0, b""))
+
+_decoder = json.JSONDecoder()
+
+
+class MessageBuffer:
+    """Remonta as mensagens do cliente a partir do fluxo TCP.
+
+    Um recv pode trazer meia mensagem ou várias mensagens juntas; feed()
+    devolve só as completas e guarda o resto para o próximo recv. Depois de
+    um "3_" com versão suportada, o resto do fluxo é lido como quadros binários.
+    """
+
+    def __init__(self):
+        self.__buffer = bytearray()
+        self.binary = False
+
+    def feed(self, data):
+        self.__buffer += data
+        messages = []
+
+        while self.__buffer:
+            if self.binary:
+                message, consumed = self.__parse_frame()
+            else:
+                message, consumed = self.__parse_text()
+
+            if consumed == 0:
+                break   # mensagem incompleta: espera mais bytes
+
+            del self.__buffer[:consumed]
+            if message is not None:
+                messages.append(message)
+            if message is not None and message.kind == "EXIT":
+                # EXIT encerra a conexão: nada depois dele interessa
+                self.__buffer.clear()
+                break
+
+        if len(self.__buffer) > MAX_MESSAGE_BYTES:
+            raise ValueError("mensagem do cliente excede o tamanho máximo")
+
+        return messages
+
+    def __parse_frame(self):
+        if len(self.__buffer) < FRAME.size:
+            return None, 0
+
+        version, msg_type, request_id, header_len, payload_len = FRAME.unpack_from(self.__buffer)
+        if version != PROTOCOL_VERSION:
+            raise ValueError(f"versão de protocolo {version} não suportada")
+        if header_len + payload_len > MAX_MESSAGE_BYTES:
+            raise ValueError("mensagem do cliente excede o tamanho máximo")
+
+        end = FRAME.size + header_len + payload_len
+        if len(self.__buffer) < end:
+            return None, 0
+
+        header = json.loads(self.__buffer[FRAME.size:FRAME.size + header_len]) if header_len else {}
+        if not isinstance(header, dict):
+            raise ValueError("header do quadro precisa ser um objeto JSON")
+        body = bytes(self.__buffer[FRAME.size + header_len:end])
+
+        if msg_type == MSG_REQUEST:
+            return Message("2_", header.get("username"), header, request_id, body), end
+        if msg_type == MSG_EXIT:
+            return Message("EXIT", header.get("username"), header, request_id), end
+        return None, end   # tipo desconhecido: ignora o quadro
+
+    def __parse_text(self):
+        # retorna (mensagem, bytes consumidos); (None, n) descarta lixo; (None, 0) = incompleta
+        leading = len(self.__buffer) - len(self.__buffer.lstrip())
+        if leading:
+            return None, leading
+
+        if self.__buffer.startswith(b"EXIT"):
+            return Message("EXIT", None, None), len(self.__buffer)
+
+        newline = self.__buffer.find(b"\n")
+        skip_line = newline + 1 if newline >= 0 else 0
+
+        kind = bytes(self.__buffer[:3])
+        if kind not in (b"2_|", b"3_|"):
+            return None, skip_line
+
+        separator = self.__buffer.find(b"|", 3)
+        if separator < 0:
+            return None, skip_line
+
+        username = self.__buffer[3:separator].decode(errors="replace")
+        # surrogateescape: um caractere cortado no fim do buffer não impede ler o JSON anterior
+        text = self.__buffer[separator + 1:].decode(errors="surrogateescape")
+        try:
+            payload, end = _decoder.raw_decode(text)
+        except ValueError:
+            # sem "\n" ainda pode faltar o resto do JSON; com "\n", está malformada
+            return None, skip_line
+
+        consumed = separator + 1 + len(text[:end].encode(errors="surrogateescape"))
+        if not isinstance(payload, dict):
+            return None, consumed   # JSON que não é objeto: descarta
+
+        if kind == b"3_|":
+            # o "\n" do pedido precisa sair do buffer antes de trocar para o modo binário
+            rest = text[end:].encode(errors="surrogateescape")
+            newline = rest.find(b"\n")
+            if newline < 0:
+                return None, 0
+            consumed += newline + 1
+            accepted = PROTOCOL_VERSION in payload.get("versions", [])
+            self.binary = accepted
+            return Message("HELLO", username, {"protocol": PROTOCOL_VERSION if accepted else None}), consumed
+
+        return Message("2_", username, payload), consumed
+
+
+def encode_request(username, payload):
+    return f"2_|{username}|{json.dumps(payload)}\n".encode()
+
+
+def encode_hello_reply(payload):
+    return (json.dumps({"type": "3_", "payload": payload}) + "\n").encode()
+
+
+def encode_frame(msg_type, request_id, header, payload=b""):
+    # lista de buffers para envio scatter-gather (sendmsg / writelines), sem concatenar
+    header_bytes = json.dumps(header, separators=(",", ":")).encode()
+    fixed = FRAME.pack(PROTOCOL_VERSION, msg_type, request_id, len(header_bytes), len(payload))
+    return [fixed, header_bytes, payload]
+
+
+def encode_legacy_result(header, image):
+    img_b64 = base64.b64encode(image).decode()
+    mensagem = {
+        "type": "2_",
+        "payload": {
+            "header": dict(header, size=f"{len(img_b64)}"),
+            "image": img_b64
+        }
+    }
+    # enviar mensagem *com quebra de linha*
+    return (json.dumps(mensagem) + "\n").encode()
@@ -0,0 +1,145 @@
+import numpy as np
+
+from model_format import load_model, load_sidecar, save_sidecar
+
+QUANT_BLOCK_ROWS = 256   # linhas convertidas por vez: o bloco em float32 cabe no cache
+QUANT_MODES = ("int8", "float16")
+
+
+class QuantizedMatrix:
+    """H guardado em int8 (escala por coluna) ou float16, usado como operador.
+
+    Valor = codes[i, j] * scale[j] (sem scale no float16). Suporta H @ x,
+    H.T @ y, fatias de linhas (H[a:b], já em float32) e shape/dtype/nbytes,
+    que é o que os solvers usam. Os produtos convertem QUANT_BLOCK_ROWS
+    linhas por vez, sem montar H em float32: cada iteração lê 1 ou 2 bytes
+    por elemento em vez de 4.
+    """
+
+    ndim = 2
+    dtype = np.dtype(np.float32)   # dtype dos valores de H (o dos códigos fica em codes.dtype)
+
+    def __init__(self, codes, scale=None):
+        self.codes = codes
+        self.scale = scale
+
+    @classmethod
+    def quantize(cls, H, mode):
+        # percorre H por blocos de linhas: serve para memmap sem carregar tudo em float
+        m, n = H.shape
+        if mode == "float16":
+            codes = np.empty((m, n), dtype=np.float16)
+            for start in range(0, m, QUANT_BLOCK_ROWS):
+                codes[start:start + QUANT_BLOCK_ROWS] = H[start:start + QUANT_BLOCK_ROWS]
+            return cls(codes)
+        if mode != "int8":
+            raise ValueError(f"quantização desconhecida: {mode}")
+
+        peak = np.zeros(n, dtype=np.float32)
+        for start in range(0, m, QUANT_BLOCK_ROWS):
+            np.maximum(peak, np.abs(H[start:start + QUANT_BLOCK_ROWS]).max(axis=0), out=peak)
+        scale = np.where(peak > 0, peak / 127, 1).astype(np.float32)
+
+        codes = np.empty((m, n), dtype=np.int8)
+        for start in range(0, m, QUANT_BLOCK_ROWS):
+            codes[start:start + QUANT_BLOCK_ROWS] = np.rint(H[start:start + QUANT_BLOCK_ROWS] / scale)
+        return cls(codes, scale)
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+    @property
+    def flags(self):
+        return self.codes.flags
+
+    @property
+    def T(self):
+        return _Transposed(self)
+
+    def __getitem__(self, rows):
+        # só fatias de linhas (H[a:b]), devolvidas em float32
+        block = self.codes[rows].astype(np.float32)
+        if self.scale is not None:
+            block *= self.scale
+        return block
+
+    def __array__(self, dtype=None, copy=None):
+        return self[:].astype(dtype or np.float32, copy=False)
+
+    def __matmul__(self, x):
+        return self.matmul(x)
+
+    def matmul(self, x, out=None):
+        # H @ x = codes @ (scale * x): a escala vai para x, não para H
+        x = np.asarray(x)
+        dtype = np.result_type(np.float32, x.dtype)
+        if self.scale is not None:
+            x = x * (self.scale if x.ndim == 1 else self.scale.reshape(-1, 1))
+        if out is None:
+            out = np.empty((self.shape[0],) + x.shape[1:], dtype=dtype)
+
+        for start in range(0, self.shape[0], QUANT_BLOCK_ROWS):
+            block = self.codes[start:start + QUANT_BLOCK_ROWS].astype(dtype)
+            np.matmul(block, x, out=out[start:start + QUANT_BLOCK_ROWS])
+        return out
+
+    def rmatmul(self, y, out=None):
+        # H^T @ y = scale * (codes^T @ y), acumulado bloco a bloco de linhas
+        y = np.asarray(y)
+        dtype = np.result_type(np.float32, y.dtype)
+        total = np.zeros((self.shape[1],) + y.shape[1:], dtype=dtype)
+        for start in range(0, self.shape[0], QUANT_BLOCK_ROWS):
+            block = self.codes[start:start + QUANT_BLOCK_ROWS].astype(dtype)
+            total += block.T @ y[start:start + QUANT_BLOCK_ROWS]
+
+        if self.scale is not None:
+            total *= self.scale if y.ndim == 1 else self.scale.reshape(-1, 1)
+        if out is None:
+            return total
+        out[...] = total
+        return out
+
+
+class _Transposed:
+    # H.T de um QuantizedMatrix: só o produto H.T @ y
+    ndim = 2
+    dtype = QuantizedMatrix.dtype
+
+    def __init__(self, matrix):
+        self.matrix = matrix
+
+    @property
+    def shape(self):
+        return self.matrix.shape[::-1]
+
+    @property
+    def T(self):
+        return self.matrix
+
+    def __matmul__(self, y):
+        return self.matrix.rmatmul(y)
+
+    def matmul(self, y, out=None):
+        return self.matrix.rmatmul(y, out=out)
+
+
+def quantized_loader(mode):
+    # loader do ModelRegistry: carrega H e o troca pela versão quantizada,
+    # guardada ao lado do modelo (marcada com o checksum de H) para as próximas cargas
+    kind = f"q{mode}"
+
+    def load(path):
+        H, info = load_model(path)
+        stored = load_sidecar(path, kind, info.checksum)
+        if stored is None:
+            Q = QuantizedMatrix.quantize(H, mode)
+            stored = {"codes": Q.codes} if Q.scale is None else {"codes": Q.codes, "scale": Q.scale}
+            save_sidecar(path, kind, info.checksum, stored)
+        return QuantizedMatrix(stored["codes"], stored.get("scale")), info
+
+    return load
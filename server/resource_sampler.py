@@ -0,0 +1,82 @@
+from collections import namedtuple
+from threading import Condition, Thread
+from time import perf_counter, process_time, thread_time, time
+
+import psutil
+
+SAMPLE_INTERVAL = 0.5
+SMOOTHING = 0.3   # peso da amostra nova na média móvel exponencial
+
+# cpu/mem em %, load = média de carga de 1 min por núcleo lógico
+Snapshot = namedtuple("Snapshot", "at cpu cpu_avg mem mem_avg load")
+
+# custo de uma reconstrução: CPU (s), tempo de parede (s) e aumento do RSS (bytes)
+JobUsage = namedtuple("JobUsage", "cpu wall rss")
+
+
+def measure_job(solve, per_thread=False):
+    # mede onde a reconstrução roda. No processo do pool ela é a única tarefa: vale a CPU
+    # do processo (inclui as threads do BLAS). No modo thread os outros jobs dividem o
+    # processo, então per_thread=True conta só a thread que chamou; o RSS é sempre o do processo
+    cpu_clock = thread_time if per_thread else process_time
+    process = psutil.Process()
+    start_rss = process.memory_info().rss
+    start_cpu, start_wall = cpu_clock(), perf_counter()
+    result = solve()
+    return result, JobUsage(cpu_clock() - start_cpu, perf_counter() - start_wall,
+                            max(process.memory_info().rss - start_rss, 0))
+
+
+class ResourceSampler(Thread):
+    """Mede CPU, memória e carga numa thread só e publica um Snapshot imutável.
+
+    Quem só precisa do valor atual lê `sampler.snapshot` (troca de referência,
+    sem lock). Quem quer cada amostra (o relatório de desempenho) usa
+    wait_next().
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL, smoothing=SMOOTHING):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.smoothing = smoothing
+        self.__cond = Condition()
+        self.__stopped = False
+
+        psutil.cpu_percent(interval=None)   # a primeira leitura sem intervalo sempre dá 0
+        mem = psutil.virtual_memory().percent
+        self.snapshot = Snapshot(time(), 0.0, 0.0, mem, mem, self.__load())
+
+    def run(self):
+        while True:
+            with self.__cond:
+                if self.__cond.wait_for(lambda: self.__stopped, self.interval):
+                    return
+
+            # cpu_percent sem intervalo = média desde a leitura anterior, ou seja, do último período
+            cpu = psutil.cpu_percent(interval=None)
+            mem = psutil.virtual_memory().percent
+            previous = self.snapshot
+            snapshot = Snapshot(time(), cpu,
+                                previous.cpu_avg + self.smoothing * (cpu - previous.cpu_avg),
+                                mem,
+                                previous.mem_avg + self.smoothing * (mem - previous.mem_avg),
+                                self.__load())
+
+            with self.__cond:
+                self.snapshot = snapshot
+                self.__cond.notify_all()
+
+    def wait_next(self, previous, timeout=None):
+        # bloqueia até sair uma amostra mais nova que `previous`
+        with self.__cond:
+            self.__cond.wait_for(lambda: self.snapshot.at > previous.at or self.__stopped, timeout)
+            return self.snapshot
+
+    def stop(self):
+        with self.__cond:
+            self.__stopped = True
+            self.__cond.notify_all()
+
+    @staticmethod
+    def __load():
+        return psutil.getloadavg()[0] / psutil.cpu_count(logical=True) * 100
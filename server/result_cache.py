@@ -0,0 +1,170 @@
+from collections import OrderedDict
+from threading import Lock
+import hashlib
+import json
+import os
+import numpy as np
+
+
+class ResultCache:
+    """Cache de reconstruções prontas (PNG + campos do header).
+
+    A chave é o conteúdo do pedido: checksum do modelo, hash do sinal,
+    algoritmo e critérios de parada (tolerância, limite de iterações,
+    estagnação). Duas camadas: LRU em
+    memória e arquivos em disco, que sobrevivem a reinícios do servidor.
+
+    O disco é limitado a max_disk_bytes: ao passar do limite, as entradas
+    usadas há mais tempo (mtime do header, renovado a cada acerto) são
+    apagadas até sobrar PRUNE_TARGET do limite.
+    """
+
+    PRUNE_TARGET = 0.9   # fração do limite que sobra depois de uma limpeza
+
+    def __init__(self, directory, max_items=256, max_disk_bytes=512 * 1024**2):
+        self.directory = directory
+        self.max_items = max_items
+        self.max_disk_bytes = max_disk_bytes
+        self.__memory = OrderedDict()   # chave -> (header, png)
+        self.__lock = Lock()
+        self.__prune_lock = Lock()
+        self.__disk_bytes = sum(size for _, size, _ in self.__disk_entries())
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.pruned = 0
+
+    @staticmethod
+    def make_key(model_checksum, signal, algorithm, tol, max_iterations, stagnation=None):
+        signal_hash = hashlib.sha1(np.ascontiguousarray(signal).tobytes()).hexdigest()
+        raw = f"{model_checksum:08x}|{signal_hash}|{algorithm}|{tol!r}|{max_iterations}"
+        if stagnation is not None:
+            raw += f"|{stagnation!r}"
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def __paths(self, key):
+        base = os.path.join(self.directory, key[:2], key)
+        return base + ".png", base + ".json"
+
+    def get(self, key):
+        with self.__lock:
+            hit = self.__memory.get(key)
+            if hit is not None:
+                self.__memory.move_to_end(key)
+                self.memory_hits += 1
+                return hit
+
+        png_path, header_path = self.__paths(key)
+        try:
+            with open(header_path, "r") as f:
+                header = json.load(f)
+            with open(png_path, "rb") as f:
+                png = f.read()
+        except (OSError, ValueError):
+            with self.__lock:
+                self.misses += 1
+            return None
+
+        try:
+            os.utime(header_path)   # mtime é a idade no LRU do disco
+        except OSError:
+            pass
+
+        with self.__lock:
+            self.disk_hits += 1
+            self.__remember(key, (header, png))
+        return header, png
+
+    def put(self, key, header, png):
+        with self.__lock:
+            self.__remember(key, (header, png))
+
+        png_path, header_path = self.__paths(key)
+        try:
+            os.makedirs(os.path.dirname(png_path), exist_ok=True)
+            # o header é gravado por último: sem ele a entrada não conta como gravada
+            self.__write(png_path, png, "wb")
+            self.__write(header_path, json.dumps(header), "w")
+            written = os.path.getsize(png_path) + os.path.getsize(header_path)
+        except OSError as e:
+            print(f"[CACHE] Não foi possível gravar {key}: {e}")
+            return
+
+        with self.__lock:
+            self.__disk_bytes += written
+            over = self.__disk_bytes > self.max_disk_bytes
+        if over:
+            self.__prune()
+
+    def __disk_entries(self):
+        # (caminho do header, bytes da entrada, mtime) de cada entrada gravada
+        entries = []
+        try:
+            shards = [d.path for d in os.scandir(self.directory) if d.is_dir()]
+        except OSError:
+            return entries
+        for shard in shards:
+            try:
+                files = list(os.scandir(shard))
+            except OSError:
+                continue
+            for f in files:
+                if not f.name.endswith(".json"):
+                    continue
+                try:
+                    stat = f.stat()
+                    png_size = os.path.getsize(f.path[:-len(".json")] + ".png")
+                except OSError:
+                    continue
+                entries.append((f.path, stat.st_size + png_size, stat.st_mtime))
+        return entries
+
+    def __prune(self):
+        # uma limpeza por vez; quem chega durante uma limpeza não espera
+        if not self.__prune_lock.acquire(blocking=False):
+            return
+        try:
+            entries = self.__disk_entries()
+            total = sum(size for _, size, _ in entries)
+            target = self.max_disk_bytes * self.PRUNE_TARGET
+            removed = 0
+            for header_path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+                if total <= target:
+                    break
+                try:
+                    # o header sai primeiro: sem ele a entrada já não conta como gravada
+                    os.remove(header_path)
+                    os.remove(header_path[:-len(".json")] + ".png")
+                except OSError:
+                    pass
+                total -= size
+                removed += 1
+            with self.__lock:
+                self.__disk_bytes = total
+                self.pruned += removed
+        finally:
+            self.__prune_lock.release()
+
+    @staticmethod
+    def __write(path, content, mode):
+        with open(path + ".tmp", mode) as f:
+            f.write(content)
+        os.replace(path + ".tmp", path)
+
+    def __remember(self, key, value):
+        self.__memory[key] = value
+        self.__memory.move_to_end(key)
+        while len(self.__memory) > self.max_items:
+            self.__memory.popitem(last=False)
+
+    def stats(self):
+        with self.__lock:
+            return {
+                "items": len(self.__memory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "disk_bytes": self.__disk_bytes,
+                "pruned": self.pruned,
+            }
@@ -0,0 +1,157 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import os
+import threading
+
+import numpy as np
+
+from model_format import BINARY_SUFFIX, HEADER_SIZE, load_model, read_header
+
+BLOCK_BUDGET = 64 * 1024**2   # bytes de H em memória por produto em andamento (dois blocos)
+
+
+class RowBlockedOperator:
+    """H de um modelo binário (.hmdl) lido do disco em blocos de linhas a cada produto.
+
+    H @ x e H.T @ y percorrem o arquivo bloco a bloco em dois buffers de
+    block_budget / 2 bytes: enquanto um bloco é multiplicado, a thread de
+    leitura já preenche o outro com o próximo. A memória usada é a dos
+    buffers (por thread que está calculando), não a do modelo.
+
+    Os arquivos são lidos com readinto, não mapeados: as páginas ficam no
+    cache do sistema, fora do RSS do servidor.
+    """
+
+    ndim = 2
+
+    def __init__(self, path, info, block_budget=BLOCK_BUDGET):
+        self.path = path
+        self.info = info
+        self.dtype = info.dtype
+        self.block_budget = block_budget
+        self.row_bytes = info.cols * info.dtype.itemsize
+        self.block_rows = max(block_budget // 2 // self.row_bytes, 1)
+        self.flags = SimpleNamespace(writeable=False)   # ModelEntry marca H como somente leitura
+
+        self.__file = open(path, 'rb', buffering=0)
+        self.__reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="leitura-H")
+        self.__buffers = threading.local()   # dois blocos por thread que calcula
+
+    @property
+    def shape(self):
+        return self.info.shape
+
+    @property
+    def nbytes(self):
+        # o que fica em memória por produto em andamento, não o tamanho do modelo
+        return 2 * self.block_rows * self.row_bytes
+
+    @property
+    def T(self):
+        return _Transposed(self)
+
+    def __getitem__(self, rows):
+        # só fatias de linhas (H[a:b]), lidas do arquivo
+        start, stop, step = rows.indices(self.shape[0])
+        if step != 1:
+            raise IndexError("RowBlockedOperator só aceita fatias contíguas de linhas")
+        block = np.empty((max(stop - start, 0), self.shape[1]), dtype=self.dtype)
+        return self.__reader.submit(self.__read, start, block).result()
+
+    def __array__(self, dtype=None, copy=None):
+        return self[:].astype(dtype or self.dtype, copy=False)
+
+    def __matmul__(self, x):
+        return self.matmul(x)
+
+    def matmul(self, x, out=None):
+        x = np.asarray(x)
+        if out is None:
+            out = np.empty((self.shape[0],) + x.shape[1:], dtype=np.result_type(self.dtype, x.dtype))
+        for start, block in self.__blocks():
+            np.matmul(block, x, out=out[start:start + len(block)])
+        return out
+
+    def rmatmul(self, y, out=None):
+        y = np.asarray(y)
+        total = np.zeros((self.shape[1],) + y.shape[1:], dtype=np.result_type(self.dtype, y.dtype))
+        for start, block in self.__blocks():
+            total += block.T @ y[start:start + len(block)]
+        if out is None:
+            return total
+        out[...] = total
+        return out
+
+    def close(self):
+        self.__reader.shutdown(wait=True)
+        self.__file.close()
+
+    def __blocks(self):
+        # gera (primeira linha, bloco) com o próximo bloco já sendo lido em paralelo
+        current, ahead = self.__thread_buffers()
+        rows = self.shape[0]
+
+        pending = self.__reader.submit(self.__read, 0, current[:min(self.block_rows, rows)])
+        for start in range(0, rows, self.block_rows):
+            block = pending.result()
+            following = start + self.block_rows
+            if following < rows:
+                pending = self.__reader.submit(self.__read, following,
+                                               ahead[:min(self.block_rows, rows - following)])
+            yield start, block
+            current, ahead = ahead, current
+
+    def __thread_buffers(self):
+        buffers = getattr(self.__buffers, 'pair', None)
+        if buffers is None:
+            buffers = self.__buffers.pair = (np.empty((self.block_rows, self.shape[1]), dtype=self.dtype),
+                                             np.empty((self.block_rows, self.shape[1]), dtype=self.dtype))
+        return buffers
+
+    def __read(self, start, block):
+        # roda só na thread de leitura, então seek + readinto no mesmo arquivo é seguro
+        view = memoryview(block).cast('B')
+        self.__file.seek(HEADER_SIZE + start * self.row_bytes)
+        done = 0
+        while done < len(view):
+            chunk = self.__file.readinto(view[done:])
+            if not chunk:
+                raise ValueError(f"{self.path}: arquivo menor que o cabeçalho indica")
+            done += chunk
+        return block
+
+
+class _Transposed:
+    # H.T de um RowBlockedOperator: só o produto H.T @ y
+    ndim = 2
+
+    def __init__(self, matrix):
+        self.matrix = matrix
+        self.dtype = matrix.dtype
+
+    @property
+    def shape(self):
+        return self.matrix.shape[::-1]
+
+    @property
+    def T(self):
+        return self.matrix
+
+    def __matmul__(self, y):
+        return self.matrix.rmatmul(y)
+
+    def matmul(self, y, out=None):
+        return self.matrix.rmatmul(y, out=out)
+
+
+def streaming_loader(block_budget=BLOCK_BUDGET, min_bytes=0):
+    # loader do ModelRegistry: modelos binários com min_bytes ou mais são lidos do disco
+    # a cada produto; CSV e modelos menores carregam como antes
+    def load(path):
+        if os.path.splitext(path)[1] == BINARY_SUFFIX:
+            info = read_header(path)
+            if info.rows * info.cols * info.dtype.itemsize >= min_bytes:
+                return RowBlockedOperator(path, info, block_budget), info
+        return load_model(path)
+
+    return load
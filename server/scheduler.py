@@ -0,0 +1,222 @@
+from collections import Counter, deque
+from itertools import count
+from threading import Condition
+from time import time
+import heapq
+import math
+
+DRR_QUANTUM = 1.0   # segundos de trabalho estimado creditados por visita (x peso do usuário)
+WAIT_WINDOW = 256   # últimas esperas guardadas por usuário para o p99
+AGING_RATE = 0.5    # sef: cada segundo de espera desconta meio segundo do tempo estimado
+
+
+# Políticas de ordem dentro da fila de cada usuário: chave menor sai primeiro
+# (empate = ordem de chegada). A chave é calculada uma vez, na chegada.
+
+def fifo(cost, arrived, deadline):
+    return 0.0
+
+def shortest_expected_first(cost, arrived, deadline):
+    # tempo estimado - AGING_RATE * espera: a espera cresce igual para todos os jobs,
+    # então a ordem não muda com o tempo e basta somar AGING_RATE * chegada
+    return cost["time"] + AGING_RATE * arrived
+
+def earliest_deadline_first(cost, arrived, deadline):
+    # prazo absoluto; quem não tem prazo vai para o fim
+    return deadline if deadline is not None else math.inf
+
+POLICIES = {"fifo": fifo, "sef": shortest_expected_first, "edf": earliest_deadline_first}
+
+_NOBODY = object()   # "nenhum usuário pronto" (None é um usuário válido: jobs sem username)
+
+
+class AdmissionScheduler:
+    """Admite jobs quando o custo estimado cabe no orçamento de CPU e memória.
+
+    Cada usuário tem sua fila, ordenada pela política (POLICIES), e as
+    filas são atendidas por deficit round robin: a cada visita o usuário
+    ganha quantum x peso segundos de crédito e o job da frente sai quando o
+    tempo estimado dele cabe no crédito. Um usuário com muitos jobs pesados
+    não atrasa quem manda jobs leves. Usuários no limite de jobs simultâneos
+    (caps) são pulados sem ganhar crédito.
+
+    O job escolhido entra quando max(uso medido, custo reservado pelos que
+    estão rodando) + o próprio custo cabe nos limites; sem nenhum job rodando
+    ele entra sempre, para um job maior que o orçamento não ficar parado.
+    Enquanto isso ninguém passa à frente dele.
+
+    Não há polling: run() espera numa Condition avisada por submit() e finish().
+    Sem a thread de run(), poll() admite o que couber agora (usado na simulação
+    com relógio próprio, clock).
+    """
+
+    def __init__(self, start, usage, cpu_limit, mem_limit, max_running,
+                 weights=None, caps=None, quantum=DRR_QUANTUM, policy=fifo, clock=time):
+        # com peso ou quantum <= 0 o crédito nunca cobre o job e __pick gira para sempre;
+        # com cap ou max_running < 1 os jobs nunca saem
+        if not quantum > 0 or max_running < 1:
+            raise ValueError("quantum precisa ser positivo e max_running pelo menos 1")
+        for user, weight in (weights or {}).items():
+            if not weight > 0:
+                raise ValueError(f"peso do usuário {user!r} precisa ser positivo: {weight}")
+        for user, cap in (caps or {}).items():
+            if cap < 1:
+                raise ValueError(f"cap do usuário {user!r} precisa ser pelo menos 1: {cap}")
+
+        self.__start = start   # start(job, ticket): roda o job e depois chama finish(ticket)
+        self.__usage = usage   # usage() -> (cpu %, memória %) medidos agora
+        self.cpu_limit = cpu_limit
+        self.mem_limit = mem_limit
+        self.max_running = max_running
+        self.weights = weights or {}   # usuário -> peso (padrão 1)
+        self.caps = caps or {}         # usuário -> máximo de jobs simultâneos (padrão max_running)
+        self.quantum = quantum
+        self.policy = policy
+        self.clock = clock
+
+        self.__queues = {}        # usuário -> heap de (chave da política, ordem, job, custo, chegada)
+        self.__active = deque()   # usuários com jobs esperando, na ordem da rodada
+        self.__deficit = Counter()
+        self.__credited = False   # o usuário da frente já ganhou o quantum desta visita
+        self.__order = count()
+        self.__running = {}       # ticket -> (usuário, custo reservado)
+        self.__running_by_user = Counter()
+        self.__reserved_cpu = 0.0
+        self.__reserved_mem = 0.0
+        self.__closed = False
+        self.__cond = Condition()
+
+        self.admitted = 0
+        self.__waits = {}   # usuário -> {"admitted", "total", "max", "recent"}
+
+    def submit(self, job, cost, user=None, deadline=None):
+        # cost: {"cpu": %, "mem": %, "time": s}; deadline: instante absoluto no relógio do escalonador
+        arrived = self.clock()
+        priority = self.policy(cost, arrived, deadline)
+        with self.__cond:
+            queue = self.__queues.get(user)
+            if queue is None:
+                queue = self.__queues[user] = []
+            if not queue:
+                self.__active.append(user)
+            heapq.heappush(queue, (priority, next(self.__order), job, cost, arrived))
+            self.__cond.notify()
+
+    def finish(self, ticket):
+        with self.__cond:
+            user, cost = self.__running.pop(ticket)
+            self.__running_by_user[user] -= 1
+            self.__reserved_cpu -= cost["cpu"]
+            self.__reserved_mem -= cost["mem"]
+            self.__cond.notify()
+
+    def close(self):
+        with self.__cond:
+            self.__closed = True
+            self.__cond.notify()
+
+    def run(self):
+        while True:
+            with self.__cond:
+                self.__cond.wait_for(lambda: self.__closed or self.__next() is not _NOBODY)
+                if self.__closed:
+                    return
+            self.poll()
+
+    def poll(self):
+        # admite tudo o que cabe agora; devolve quantos jobs saíram
+        admitted = []
+        with self.__cond:
+            while not self.__closed:
+                user = self.__next()
+                if user is _NOBODY:
+                    break
+                admitted.append(self.__admit(user))
+
+        # fora do lock: start pode demorar (ou até rodar o job ali mesmo)
+        for ticket, job, cost in admitted:
+            self.__start(job, ticket)
+        return len(admitted)
+
+    def __next(self):
+        # usuário cujo job é o próximo, se ele já couber no orçamento
+        user = self.__pick()
+        if user is not _NOBODY and self.__fits(self.__queues[user][0][3]):
+            return user
+        return _NOBODY
+
+    def __pick(self):
+        # deficit round robin sobre os usuários com job esperando e abaixo do cap
+        if not any(self.__running_by_user[user] < self.__cap(user) for user in self.__active):
+            return _NOBODY
+
+        while True:
+            user = self.__active[0]
+            if self.__running_by_user[user] < self.__cap(user):
+                if not self.__credited:
+                    self.__deficit[user] += self.quantum * self.weights.get(user, 1)
+                    self.__credited = True
+                if self.__deficit[user] >= self.__queues[user][0][3]["time"]:
+                    return user
+
+            self.__active.rotate(-1)
+            self.__credited = False
+
+    def __admit(self, user):
+        queue = self.__queues[user]
+        _, ticket, job, cost, arrived = heapq.heappop(queue)
+        self.__deficit[user] -= cost["time"]
+        if not queue:
+            # fila vazia sai da rodada e não acumula crédito
+            self.__active.popleft()
+            self.__credited = False
+            del self.__deficit[user]
+
+        self.__running[ticket] = (user, cost)
+        self.__running_by_user[user] += 1
+        self.__reserved_cpu += cost["cpu"]
+        self.__reserved_mem += cost["mem"]
+        self.admitted += 1
+
+        wait = self.clock() - arrived
+        waits = self.__waits.get(user)
+        if waits is None:
+            waits = self.__waits[user] = {"admitted": 0, "total": 0.0, "max": 0.0,
+                                          "recent": deque(maxlen=WAIT_WINDOW)}
+        waits["admitted"] += 1
+        waits["total"] += wait
+        waits["max"] = max(waits["max"], wait)
+        waits["recent"].append(wait)
+
+        return ticket, job, cost
+
+    def __cap(self, user):
+        return self.caps.get(user, self.max_running)
+
+    def __fits(self, cost):
+        if not self.__running:
+            return True
+        if len(self.__running) >= self.max_running:
+            return False
+
+        # o uso medido já inclui parte dos jobs rodando; a reserva cobre os que ainda não pesaram
+        cpu, mem = self.__usage()
+        return (max(cpu, self.__reserved_cpu) + cost["cpu"] <= self.cpu_limit and
+                max(mem, self.__reserved_mem) + cost["mem"] <= self.mem_limit)
+
+    def stats(self):
+        with self.__cond:
+            users = {}
+            for user in set(self.__queues) | set(self.__waits):
+                waits = self.__waits.get(user, {"admitted": 0, "total": 0.0, "max": 0.0, "recent": ()})
+                recent = sorted(waits["recent"])
+                users[user] = {
+                    "waiting": len(self.__queues.get(user, ())),
+                    "running": self.__running_by_user[user],
+                    "admitted": waits["admitted"],
+                    "wait_avg": waits["total"] / waits["admitted"] if waits["admitted"] else 0.0,
+                    "wait_p99": recent[min(len(recent) - 1, math.ceil(0.99 * len(recent)) - 1)] if recent else 0.0,
+                    "wait_max": waits["max"],
+                }
+            return {"waiting": sum(len(q) for q in self.__queues.values()), "running": len(self.__running),
+                    "admitted": self.admitted, "users": users}
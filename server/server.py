@@ -1,4 +1,4 @@
-from threading import Thread, Lock, BoundedSemaphore
+from threading import Thread, Lock
 import socket
 import os
 import csv
@@ -8,25 +8,40 @@ from numpy.typing import NDArray
 from pathlib import Path
 import sys
 import base64
-from multiprocessing import Queue, Value
+from multiprocessing import Value
+from queue import Queue, Empty
 from ctypes import c_bool
+from functools import partial
 from datetime import datetime, timezone
-from time import time, sleep
+from time import time
 import psutil
 import base64
 import matplotlib.pyplot as plt
-import json
 import random
-from PIL import Image
 import gc
-import io
+import argparse
+import traceback
+from model_registry import ModelRegistry
+from quantized import QUANT_MODES, quantized_loader
+from row_blocked import BLOCK_BUDGET, streaming_loader
+from warm_start import WarmStartStore, warm_start_family
+from result_cache import ResultCache
+from inflight import InFlightJobs
+from scheduler import POLICIES, AdmissionScheduler
+from resource_sampler import ResourceSampler, measure_job
+from cost_history import CostHistory
+from connection import SocketConnection
+from protocol import MessageBuffer
+from signal_cache import SignalCache
+from signal_gain import decode_signal
+from solvers import (ALGORITHM, BLOCK_ALGORITHM, PRECOND_BLOCK, StopCriteria, compute_gram, compute_preconditioner,
+                     compute_tsvd, encode_image, encode_preview, tsvd_rank)
 
 file_lock = Lock()       # para logs / csv
 send_lock = Lock()       # para enviar mensagens no socket
 print_lock = Lock()      # opcional: evita prints embaralhados
 
 MAX_THREADS = 4   # escolha seu limite
-thread_limiter = BoundedSemaphore(MAX_THREADS)
 
 ACTUAL_DIR = Path(os.path.dirname(os.path.abspath(sys.argv[0])))
 
@@ -43,138 +58,68 @@ TESTE_JSON_PATH = os.path.join(ROOT_DIR, "teste.json")
 MIN_ERROR = .0001
 MAX_WORKERS = 8
 
-MODEL_SHAPES = {
-    '30x30': (27904, 900),
-    '60x60': (50816, 3600)
-}
-
-IMAGE_SHAPES = {
-    '30x30': (900, 1),
-    '60x60': (3600, 1)
-}
-
-FINAL_IMAGE_SHAPE = {
-    '30x30': (30, 30),
-    '60x60': (60, 60)
-}
-def reconstruct_cgnr(H: np.ndarray, g: np.ndarray, max_iterations: int, tol=5e-3, min_iterations=10, lambda_reg: float = 0.0, logger=None) -> tuple:
-    m, n = H.shape
-    f = np.zeros((n, 1))
-    g = g.reshape(-1, 1)
-    r = g - H @ f
-    z = H.T @ r
-    p = z.copy()
-    initial_residual_norm = np.linalg.norm(r)
-    min_div = 1e-12
-    number_iterations = 0
-
-    if logger is not None:
-        logger.info(f"CGNR: tol={tol:.3e}")
-
-    for i in range(max_iterations):
-        w = H @ p
-
-        # >>> Correção dos warnings
-        z_dot = (z.T @ z).item()
-        w_dot = (w.T @ w).item() + min_div
-        # <<<
-
-        alpha = z_dot / w_dot
-
-        f_new = f + alpha * p
-        r_new = r - alpha * w
-        z_new = H.T @ r_new
-
-        # >>> Correção dos warnings
-        z_new_dot = (z_new.T @ z_new).item()
-        # <<<
-
-        beta = z_new_dot / (z_dot + min_div)
-        p_new = z_new + beta * p
-
-        current_residual_norm = np.linalg.norm(r_new)
-        relative_error = current_residual_norm / (initial_residual_norm + min_div)
-
-        if logger is not None:
-            logger.info(
-                f"Iteracao {i + 1}: erro relativo = {relative_error:.6e}, residuo = {current_residual_norm:.3e}"
-            )
-
-        f, r, z, p = f_new, r_new, z_new, p_new
-        number_iterations = i + 1
-
-        if number_iterations >= min_iterations and relative_error < tol:
-            if logger is not None:
-                logger.info(f"Convergiu com erro relativo {relative_error:.2e} < {tol:.2e}")
-            break
+# Parada das reconstruções: a primeira que acontecer entre tolerância ("tol" do pedido ou
+# TOL_REQUISITO), estagnação, prazo ("deadline" do pedido) e o teto de iterações
+MAX_ITERATIONS = 50
+MIN_ITERATIONS = 3
+TOL_REQUISITO = 1e-4
+STAGNATION = 0.005      # para quando o erro relativo melhora menos de 0,5% ...
+STAGNATION_WINDOW = 5   # ... em STAGNATION_WINDOW iterações (não vale para a família CGNE)
+RESPONSE_MARGIN = 0.05  # segundos reservados do prazo para gerar o PNG e enviar
 
-    final_residual = g - H @ f
-    final_error = np.linalg.norm(final_residual) / (np.linalg.norm(g) + min_div)
-    return f.flatten(), number_iterations, final_error
+# Máximo de jobs do mesmo modelo/algoritmo resolvidos juntos (CG em bloco)
+MAX_BATCH = 8
 
-def reconstruct_cgne(H: np.ndarray, g: np.ndarray, max_iterations: int, tol=1e-6, min_iterations=10, reg_factor: float = 0.0, logger=None) -> tuple[np.ndarray, int, float]:
-    N = H.shape[1]
-    f = np.zeros((N, 1))
-    g = g.reshape(-1, 1)
-    r = g - H @ f
-    p = H.T @ r
-    initial_residual_norm = np.linalg.norm(r)
-    min_div = 1e-12
-    final_iterations = 0
+# Memória máxima ocupada pelos modelos residentes (H) antes de descartar o menos usado
+MODEL_CACHE_BYTES = 2 * 1024**3
+models = ModelRegistry(MODEL_CACHE_BYTES)
 
-    if logger is not None:
-        logger.info(f"CGNE: tol={tol:.3e}")
+# H residente em int8 ou float16 (--quantize); None = como está no arquivo
+model_quantization = None
 
-    for i in range(max_iterations):
-        Hp = H @ p
+# Reconstruções já calculadas, em memória e em disco (sobrevivem a reinícios)
+RESULT_CACHE_DIR = os.path.join(BASE_DIR, "cache", "resultados")
+RESULT_CACHE_ITEMS = 256
+RESULT_CACHE_DISK_BYTES = 512 * 1024**2   # acima disso os resultados usados há mais tempo saem do disco
+results = ResultCache(RESULT_CACHE_DIR, RESULT_CACHE_ITEMS, RESULT_CACHE_DISK_BYTES)
 
-        # >>> Correções dos warnings
-        alpha_num = (r.T @ r).item()
-        alpha_den = (Hp.T @ Hp).item() + min_div
-        # <<<
+# Sinais lidos do disco (../<sinal>.csv), já com ganho, enquanto o arquivo não muda
+signals = SignalCache()
 
-        if alpha_den < min_div:
-            break
+# Pedidos idênticos em andamento: só o primeiro calcula, os demais aguardam o resultado
+inflight = InFlightJobs()
 
-        alpha = alpha_num / alpha_den
-        f_new = f + alpha * p
-        r_new = r - alpha * (H @ p)
+# Soluções recentes por modelo, chute inicial de sinais parecidos (None com --no-warm-start)
+warm_starts = WarmStartStore()
 
-        # >>> Correções dos warnings
-        beta_num = (r_new.T @ r_new).item()
-        beta_den = (r.T @ r).item() + min_div
-        # <<<
+# Pool de processos para as reconstruções (--executor process); None = threads
+solver_pool = None
 
-        beta = beta_num / beta_den
-        p_new = H.T @ r_new + beta * p
+# Admissão dos jobs pelo custo estimado (criado em main)
+scheduler = None
 
-        current_residual_norm = np.linalg.norm(r_new)
-        relative_error = current_residual_norm / (initial_residual_norm + min_div)
+# Custo medido de cada reconstrução: log só de acréscimo, semeado com o teste.json
+COST_HISTORY_PATH = os.path.join(BASE_DIR, "cache", "historico-custos.jsonl")
+cost_history = None
 
-        if logger is not None:
-            logger.info(f"Iteracao {i + 1}: erro relativo = {relative_error:.6e}")
+# Uma única thread mede CPU/memória/carga; admissão e relatório leem o mesmo snapshot
+sampler = None
 
-        f, r, p = f_new, r_new, p_new
-        final_iterations = i + 1
+# Pedidos em aberto que cada cliente do protocolo binário pode manter (--window)
+CLIENT_WINDOW = 32
+client_window = CLIENT_WINDOW
 
-        if final_iterations >= min_iterations and relative_error < tol:
-            if logger is not None:
-                logger.info(f"Convergiu com erro relativo {relative_error:.2e} < {tol:.2e}")
-            break
+# CGNR pelas equações normais (--gram): H^T H calculado uma vez por modelo
+use_gram = False
 
-    final_error = np.linalg.norm(g - H @ f) / (np.linalg.norm(g) + min_div)
-    return f.flatten(), final_iterations, final_error
+# pcgnr/pcgne: escala das colunas (Jacobi) ou, com --precond bloco, block-Jacobi no pcgnr
+precond_block = 0
 
 def create_pasta(username):
     path = ACTUAL_DIR / "images" / username    
     if not path.exists():
         os.mkdir(path)
 
-ALGORITHM = {
-    'cgne': reconstruct_cgne,
-    'cgnr': reconstruct_cgnr
-}
-
 class CSV:
     def __init__(self, filename):
         self.__file = open(filename, 'w', encoding='UTF-8')
@@ -209,11 +154,6 @@ class ServerData:
         self.reports = reports
         self.models = models
 
-def apply_signal_gain(g_vector: np.ndarray):
-    S = len(g_vector); g_out = g_vector.copy().astype(np.float32)
-    for l in range(S): g_out[l] *= (100.0 + (1.0/20.0)*(l+1)*np.sqrt(l+1))
-    return g_out
-
 def get_dynamic_mem_limit():
     # Limite: 80% da RAM total, mas sempre deixa pelo menos 1GB livre
     mem = psutil.virtual_memory()
@@ -232,19 +172,15 @@ def get_dynamic_cpu_limit():
     # return max(50.0, min(90.0, n_cores * 80.0 / n_cores))  # 80% (ajustável)
     return 85
 def get_percent_virtual_memory(close_profiler_worker, server_data):
+    # uma linha por amostra do sampler: o relatório e a admissão veem os mesmos números
+    snapshot = sampler.snapshot
     while not close_profiler_worker.value:
-        start_dt = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        snapshot = sampler.wait_next(snapshot)
+        start_dt = datetime.fromtimestamp(snapshot.at).strftime('%Y-%m-%d %H:%M:%S')
 
-        cpu_percent = psutil.cpu_percent(interval=0.5)
-
-        mem = psutil.virtual_memory()
-        mem_percent = mem.percent
-       
-        server_data.reports.performance.write([start_dt, f"    {cpu_percent}%", f"    {mem_percent} %", "Python"])
+        server_data.reports.performance.write([start_dt, f"    {snapshot.cpu}%", f"    {snapshot.mem} %", "Python"])
         server_data.reports.performance.flush()
 
-        sleep(0.5)
-
 def run_queue_worker(request_queue):
     print("[SUPERVISOR] Iniciado")
 
@@ -254,215 +190,594 @@ def run_queue_worker(request_queue):
         if data is None:
             break
 
-        # Extração
-        payload = data["payload"]
-        client = data["client"]
-
-        # Cria thread filha para esse item
-        t = Thread(target=worker_process_item, args=(payload, client))
-        t.daemon = True
-        t.start()
-
-        print(f"[SUPERVISOR] - Job enviado para thread dedicada")
-
-def worker_process_item(payload, client):
-    # limite de threads simultâneas
-    with thread_limiter:
-
-        # (1) medir CPU/MEM
-        cpu_limit = get_dynamic_cpu_limit()
-        mem_limit = get_dynamic_mem_limit()
+        # junta os jobs que já estão esperando na fila: os do mesmo modelo e
+        # algoritmo são resolvidos juntos, numa única passada por H
+        batch = [data]
+        while len(batch) < MAX_BATCH:
+            try:
+                extra = request_queue.get_nowait()
+            except Empty:
+                break
+            if extra is None:
+                request_queue.put(None)
+                break
+            batch.append(extra)
+
+        # pedido malformado é respondido com erro aqui: não pode chegar ao agrupamento
+        batch = [item for item in batch if try_check_request(item)]
+        for group in group_batch(batch):
+            try:
+                intake(group)
+            except Exception as e:
+                # falha inesperada afeta só este grupo; o supervisor continua atendendo
+                traceback.print_exc()
+                for item in group:
+                    send_error(item, e)
+
+def check_request(payload):
+    # campos que o supervisor e os workers usam sem checar: algoritmo, modelo, sinal e opcionais numéricos
+    algorithm = payload.get("algorithm")
+    if not isinstance(algorithm, str) or algorithm.lower() not in ALGORITHM:
+        raise ValueError(f"algoritmo inválido: {algorithm!r} (disponíveis: {', '.join(sorted(ALGORITHM))})")
+    for field in ("model", "signal"):
+        if not isinstance(payload.get(field), str) or not payload[field]:
+            raise ValueError(f"campo {field!r} ausente ou inválido")
+    for field in ("tol", "deadline", "stream", "rank"):
+        value = payload.get(field)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+            raise ValueError(f"campo {field!r} precisa ser numérico: {value!r}")
+    if payload.get("signal_data") is not None and not isinstance(payload["signal_data"], str):
+        raise ValueError("campo 'signal_data' precisa ser base64")
+
+def try_check_request(item):
+    try:
+        check_request(item["payload"])
+        return True
+    except ValueError as e:
+        print(f"[ERRO] Pedido inválido -> {item['payload'].get('username')} idx={item['payload'].get('idx')}: {e}")
+        send_error(item, e)
+        return False
+
+def group_batch(batch):
+    groups = {}
+    for item in batch:
+        payload = item["payload"]
+        algorithm = payload["algorithm"].lower()
+        # algoritmos sem variante em bloco (e pedidos com prévias) seguem um por thread;
+        # o lote divide os critérios de parada e é de um usuário só: ele entra inteiro na
+        # fila DRR, no cap e nas esperas de quem o enviou
+        key = ((payload.get("username"), payload["model"], algorithm, payload.get("tol"), payload.get("deadline"))
+               if algorithm in BLOCK_ALGORITHM and not payload.get("stream") else id(item))
+        groups.setdefault(key, []).append(item)
+    return list(groups.values())
+
+def model_load_bytes(model):
+    # modelo inexistente: o erro sai quando o job admitido tentar carregá-lo
+    try:
+        return models.load_bytes(model)
+    except (OSError, ValueError):
+        return 0
+
+def estimate_cost(payload):
+    # custo do pedido pelo histórico (consulta O(1) no índice); sem histórico, um custo mínimo.
+    # Modelo ainda não carregado: a memória de H entra no custo, a carga é feita pelo job admitido
+    load_mem = (model_load_bytes(payload["model"]) / psutil.virtual_memory().total) * 100
+    stats = cost_history.estimate(payload["model"], payload["signal"], payload["algorithm"])
+    if stats is None:
+        return {"cpu": 0.01, "mem": 0.01 + load_mem, "time": 0.1, "p95": 0.1}
+
+    return {"cpu": stats["cpu_ewma"] / psutil.cpu_count(logical=True),
+            "mem": (stats["rss_peak"] / psutil.virtual_memory().total) * 100 + load_mem,
+            "time": stats["time_ewma"],
+            "p95": stats["time_p95"]}
+
+def record_cost(items, start_time, usage):
+    # usage (JobUsage) vem de onde o kernel rodou: processo do pool ou a thread do job.
+    # A CPU é relativa ao tempo do próprio kernel, limitada aos núcleos da máquina
+    # (relógios de CPU grossos, como o do Windows, passariam disso em jobs curtos)
+    elapsed = time() - start_time
+    cpu_used = min(usage.cpu / usage.wall, psutil.cpu_count(logical=True)) * 100 if usage.wall > 0 else 0.0
+    end_dt = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-        cpu_percent = psutil.cpu_percent(interval=0.5)
-        mem_percent = psutil.virtual_memory().percent
+    for item in items:
+        payload = item["payload"]
+        cost_history.record({
+            "username": payload.get("username"),
+            "algorithm": payload["algorithm"].lower(),
+            "model": payload["model"],
+            "signal": payload["signal"],
+            "start_dt": item["start_dt"],
+            "end_dt": end_dt,
+            "batch": len(items),
+            "time": elapsed,
+            "cpu_used": cpu_used,
+            "mem_used_bytes": usage.rss,
+            "H_matrix_bytes": item["model_entry"].H.nbytes,
+        })
+
+def measure_usage():
+    # leitura do último snapshot, sem lock e sem esperar medição
+    snapshot = sampler.snapshot
+    return snapshot.cpu_avg, snapshot.mem
+
+def intake(items):
+    # só estimativa e fila: modelo e sinal são carregados pelo job admitido, para um
+    # modelo frio não parar a chegada de pedidos dos outros usuários
+    for item in items:
+        item["start_time"] = time()
+        item["start_dt"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    # o lote lê H uma vez só: o custo estimado é o de um job; group_batch só junta
+    # pedidos do mesmo usuário
+    cost = estimate_cost(items[0]["payload"])
+    user = items[0]["payload"].get("username")
+    # "deadline" opcional no pedido: segundos a partir da chegada (usado pela política edf)
+    deadlines = [item["payload"]["deadline"] for item in items if item["payload"].get("deadline") is not None]
+    deadline = time() + min(deadlines) if deadlines else None
+    scheduler.submit(items, cost, user=user, deadline=deadline)
+    print(f"[ESCALONADOR] {len(items)} job(s) de {user} na fila | custo CPU={cost['cpu']:.1f}% RAM={cost['mem']:.1f}% "
+          f"tempo={cost['time']:.2f}s")
+
+def start_job(items, ticket):
+    # chamado pelo escalonador quando o custo coube no orçamento
+    t = Thread(target=run_job, args=(items, ticket))
+    t.daemon = True
+    t.start()
+
+def run_job(items, ticket):
+    user = items[0]["payload"].get("username")
+    waits = scheduler.stats()["users"][user]
+    print(f"[ESCALONADOR] espera de {user}: média={waits['wait_avg']:.3f}s p99={waits['wait_p99']:.3f}s "
+          f"máx={waits['wait_max']:.3f}s | {waits['waiting']} esperando, {waits['running']} rodando")
 
-        model = payload["model"]
-        signal = payload["signal"]
+    try:
+        # o que já está em cache (ou em cálculo) é respondido sem reconstruir
+        items = [item for item in items if try_prepare_job(item)]
+        items = [item for item in items if not (send_cached(item) or follow_inflight(item))]
+        if not items:
+            return
 
-        historico = []
-        try:
-            with open(TESTE_JSON_PATH, "r") as f:
-                historico = json.load(f)
-        except:
-            pass
-
-        model_norm  = model.split("models/")[-1]
-        signal_norm = signal.split("signals/")[-1]
-
-        registros = [
-            item for item in historico
-            if os.path.basename(item["model"]) == model_norm
-            and os.path.basename(item["signal"]) == signal_norm + '.csv'
-        ]
-
-        username = payload.get("username", "?")
-        idx = payload.get("idx", -1)
-
-        if registros:
-            reg = max(registros, key=lambda x: x["time"])
-            cpu_requerida_pct = reg["cpu_used"] / psutil.cpu_count(logical=True)
-            mem_requerida_pct = (reg["mem_used_bytes"] / psutil.virtual_memory().total) * 100
-            tempo_estimado = reg["time"]
+        start_time = time()
+        if len(items) == 1:
+            payload = items[0]["payload"]
+            print(f"[WORKER] Processando -> {payload.get('username', '?')} idx={payload.get('idx', -1)}")
+            usage = process_job(items[0])
         else:
-            cpu_requerida_pct = 0.01
-            mem_requerida_pct = 0.01
-            tempo_estimado = 0.1
-
-        print( f"[WORKER] CPU_atual={cpu_percent:.1f}% | RAM_atual={mem_percent:.1f}% " 
-              f"| Nec -> CPU={cpu_requerida_pct:.1f}% RAM={mem_requerida_pct:.1f}% " 
-              f"| Lim -> CPU={cpu_limit}% RAM={mem_limit}%" )
-
-        if (cpu_percent + cpu_requerida_pct > cpu_limit or
-            mem_percent + mem_requerida_pct > mem_limit):
-
-            print(f"[WORKER] Recursos insuficientes — Requeue -> {username} idx={idx}")
-
-            # reenqueue
-            request_queue.put({"payload": payload, "client": client})
-            sleep(min(tempo_estimado, 1))
-            return  # encerra esta thread
-
-        # (4) executa
-        print(f"[WORKER] Processando -> {username} idx={idx}")
-        process_job(payload, client)
+            print(f"[WORKER] Processando lote -> {len(items)} jobs de {items[0]['payload']['model']}")
+            usage = process_batch(items)
+        record_cost(items, start_time, usage)
+    finally:
+        scheduler.finish(ticket)
+
+def derived_name(name):
+    # derivados de um H quantizado não se misturam com os do H original no disco
+    return f"{name}-q{model_quantization}" if model_quantization else name
+
+def solver_extras(algorithm, model_entry):
+    # dados pré-calculados por modelo que o algoritmo aproveita
+    extras = {}
+    if use_gram and algorithm.lower() == 'cgnr':
+        extras["gram"] = model_entry.derived(derived_name("gram"), lambda entry: compute_gram(entry.H), persist=True)
+    if algorithm.lower() in ('pcgnr', 'pcgne'):
+        # "scale" e, no block-Jacobi, "blocks"; um arquivo ao lado do modelo para cada tipo
+        block = precond_block
+        name = derived_name(f"precond-b{block}" if block else "precond")
+        extras.update(model_entry.derived(name, lambda entry: compute_preconditioner(entry.H, block), persist=True))
+    if algorithm.lower() == 'tsvd':
+        # SVD truncada: Ut (k x m), Vs (n x k) e s, calculados uma vez e guardados ao lado do modelo
+        extras.update(model_entry.derived(derived_name("tsvd"), lambda entry: compute_tsvd(entry.H), persist=True))
+    return extras
+
+def load_signal(payload, body=b""):
+    # sinal enviado no pedido (corpo do quadro binário ou "signal_data" em base64 no texto);
+    # sem ele, o arquivo "../<signal>.csv" do servidor, pelo cache de sinais
+    if body:
+        return decode_signal(body)
+    if payload.get("signal_data"):
+        return decode_signal(base64.b64decode(payload["signal_data"], validate=True))
+    return signals.get(os.path.join("..", payload["signal"] + ".csv"))
+
+def prepare_job(item):
+    # carrega modelo e sinal e calcula a chave do pedido no cache de resultados
+    payload = item["payload"]
+
+    item["model_entry"] = models.get(payload["model"])
+    item["g"] = load_signal(payload, item.get("body"))
+    if len(item["g"]) != item["model_entry"].info.shape[0]:
+        raise ValueError(f"sinal com {len(item['g'])} amostras; o modelo espera {item['model_entry'].info.shape[0]}")
+
+    # "tol": erro relativo alvo; "deadline": segundos desde a chegada até a resposta
+    item["tol"] = float(payload.get("tol") or TOL_REQUISITO)
+    budget = payload.get("deadline")
+    item["deadline"] = item["start_time"] + float(budget) - RESPONSE_MARGIN if budget is not None else None
+    if not item["tol"] > 0:
+        raise ValueError(f"tol inválida: {payload.get('tol')}")
+    # "stream": k -> prévia da solução parcial a cada k iterações
+    item["stream"] = int(payload.get("stream") or 0)
+    # "rank": posto usado pelo tsvd (padrão: todos os fatores guardados do modelo).
+    # Vai para a chave já limitado ao que o modelo tem: rank 0, 300 e 256 num modelo
+    # com 256 fatores são a mesma reconstrução. Os outros algoritmos ignoram o campo.
+    rank = int(payload.get("rank") or 0)
+    if rank < 0:
+        raise ValueError(f"rank inválido: {payload.get('rank')}")
+    algorithm = payload["algorithm"].lower()
+    item["rank"] = tsvd_rank(item["model_entry"].info.shape, rank) if algorithm == 'tsvd' else 0
+
+    # o prazo não entra na chave: resultados cortados por ele não vão para o cache
+    variant = f"{algorithm}:{item['rank']}" if algorithm == 'tsvd' else algorithm
+    if model_quantization:
+        variant += f"@{model_quantization}"
+    item["key"] = ResultCache.make_key(item["model_entry"].info.checksum, item["g"], variant,
+                                       item["tol"], MAX_ITERATIONS, (STAGNATION, STAGNATION_WINDOW))
+    # pedidos com prazo só se juntam a outros com prazo: o resultado cortado de um líder
+    # com prazo não pode chegar a quem pediu a reconstrução completa
+    item["inflight_key"] = item["key"] + ("|prazo" if item["deadline"] is not None else "")
+
+def stop_criteria(items):
+    # um lote para junto: mesma tolerância (group_batch) e o prazo mais apertado
+    deadlines = [item["deadline"] for item in items if item["deadline"] is not None]
+    return StopCriteria(MAX_ITERATIONS, items[0]["tol"], MIN_ITERATIONS, STAGNATION,
+                        min(deadlines) if deadlines else None, STAGNATION_WINDOW)
+
+def preview_sender(item):
+    # no modo processo a solução parcial fica no processo do pool: sem prévias
+    every = item["stream"]
+    if every <= 0 or solver_pool is not None:
+        return None
+
+    data = item["payload"]
+    side = item["model_entry"].info.side
+
+    def progress(iteration, f, relative_error):
+        if iteration % every == 0:
+            header = {"username": data["username"], "index": data["idx"],
+                      "iteration": iteration, "error": float(relative_error)}
+            item["client"].send_preview(header, encode_preview(f, side), item["request_id"])
+
+    return progress
+
+def warm_start_guess(item):
+    # só algoritmos com família de chute (não tsvd, que é direto, nem a família CGNE)
+    family = warm_start_family(item["payload"]["algorithm"])
+    if warm_starts is None or family is None:
+        return None
+    return warm_starts.guess(item["model_entry"].info.checksum, family, item["g"])
+
+def record_solution(item, f, iters, stop_reason, warm):
+    # guarda a solução para os próximos pedidos e devolve as iterações poupadas pelo chute
+    algorithm = item["payload"]["algorithm"].lower()
+    family = warm_start_family(algorithm)
+    if warm_starts is None or family is None or stop_reason in ("deadline", "divergence"):
+        return 0
+    checksum = item["model_entry"].info.checksum
+    if stop_reason != "breakdown":
+        warm_starts.record(checksum, family, item["g"], f)
+    if warm:
+        return warm_starts.iterations_saved(checksum, family, algorithm, item["tol"], iters)
+    warm_starts.record_cold(checksum, family, algorithm, item["tol"], iters)
+    return 0
+
+def try_prepare_job(item):
+    # modelo ou sinal inexistente: o cliente é avisado e o pedido descartado
+    try:
+        prepare_job(item)
+        return True
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"[ERRO] Pedido inválido -> {item['payload'].get('username')} idx={item['payload'].get('idx')}: {e}")
+        send_error(item, e)
+        return False
+
+def send_cached(item):
+    hit = results.get(item["key"])
+    if hit is None:
+        return False
+
+    header, bytes_img = hit
+    send_result(item, bytes_img, header["iters"], header["error"], header.get("stop_reason"), cached=True)
+    print(f"[CACHE] {results.stats()}")
+    return True
+
+def follow_inflight(item):
+    # o mesmo pedido já está sendo calculado: espera o líder em vez de recalcular
+    future, leader = inflight.join(item["inflight_key"])
+    if leader:
+        return False
+
+    print(f"[WORKER] Pedido idêntico em andamento -> {item['payload'].get('username')} idx={item['payload'].get('idx')} aguarda")
+    future.add_done_callback(lambda done: send_shared(item, done))
+    return True
+
+def send_shared(item, done):
+    error = done.exception()
+    if error is not None:
+        print(f"[ERRO] Reconstrução compartilhada falhou -> {item['payload'].get('username')} idx={item['payload'].get('idx')}: {error}")
+        send_error(item, error)
+    else:
+        send_result(item, *done.result())
 
+def process_job(item):
+    algorithm = item["payload"]["algorithm"]
 
-def process_job(data, client):
-    username = data["username"]
-    algorithm = data["algorithm"]
-    model = data["model"]
-    signal = data["signal"]
-    idx = data["idx"]
+    #carrega os dados
+    model_entry = item["model_entry"]
+    H_matrix = model_entry.H
+    g_processed = item["g"]
 
-    start_time = time()
-    start_dt = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    stop = stop_criteria([item])
+    # opções do pedido para o solver (os extras são do modelo)
+    options = {"rank": item["rank"]} if item["rank"] else {}
+    f0 = warm_start_guess(item)
+    if f0 is not None:
+        options["f0"] = f0
 
-    #carrega os dados
-    H_matrix = np.loadtxt(model, delimiter=',', dtype=np.float32)
-    signal_path = os.path.join("..", signal + ".csv")
-    g_vector = np.loadtxt(signal_path, delimiter=",", dtype=np.float32)
+    try:
+        extras = solver_extras(algorithm, model_entry)
 
-    g_processed = apply_signal_gain(g_vector)
+        if solver_pool is not None:
+            # modo processo: H já está em memória compartilhada, só o sinal é enviado
+            bytes_img, iters, final_error, stop_reason, f, usage = solver_pool.solve(model_entry, algorithm, g_processed,
+                                                                                     stop, extras, options)
+        else:
+            stop.start()
+            (f, iters, final_error), usage = measure_job(
+                partial(ALGORITHM[algorithm.lower()], H_matrix, g_processed, MAX_ITERATIONS, stop=stop,
+                        progress=preview_sender(item), **options, **extras),
+                per_thread=True)
+            bytes_img = encode_image(f, model_entry.info.side)
+            stop_reason = stop.reason
+    except BaseException as e:
+        inflight.fail(item["inflight_key"], e)
+        send_error(item, e)
+        raise
+
+    iters_saved = record_solution(item, f, iters, stop_reason, f0 is not None)
+    del H_matrix, g_processed, f
+    # gc.collect()
 
-    tol_requisito = 1e-4
+    finish_job(item, bytes_img, iters, final_error, stop_reason, iters_saved)
+    return usage
 
-    if algorithm.upper() == 'CGNR':
-        f, iters, final_error = reconstruct_cgnr(H_matrix, g_processed, 5, tol=tol_requisito)
-    elif algorithm.upper() == 'CGNE':
-        f, iters, final_error = reconstruct_cgne(H_matrix, g_processed, 5, tol=tol_requisito)
+def process_batch(items):
+    algorithm = items[0]["payload"]["algorithm"]
 
-    f = f.flatten()
-    f_min, f_max = f.min(), f.max()
+    # uma coluna de G por sinal
+    model_entry = items[0]["model_entry"]
+    G = np.column_stack([item["g"] for item in items])
+    stop = stop_criteria(items)
 
-    #se forem iguais converte tudo para cinza
-    if f_max != f_min:
-        f_norm = (f - f_min) / (f_max - f_min) * 255
-    else:
-        f_norm = np.full_like(f, 128)
+    # chutes iniciais por coluna; sinal sem chute parte do zero
+    guesses = [warm_start_guess(item) for item in items]
+    F0 = None
+    if any(guess is not None for guess in guesses):
+        n = model_entry.info.shape[1]
+        F0 = np.column_stack([guess if guess is not None else np.zeros(n) for guess in guesses])
 
-    #converte o vetor para imagem quadrada
-    lado = int(np.sqrt(len(f_norm)))
-    imagem_array = f_norm[:lado*lado].reshape((lado, lado), order='F')
-    imagem_array = np.clip(imagem_array, 0, 255)
-    imagem = Image.fromarray(imagem_array.astype('uint8'))
+    try:
+        extras = solver_extras(algorithm, model_entry)
 
-    #converte para bytes (PNG)
-    img_bytes = io.BytesIO()
-    imagem.save(img_bytes, format='PNG')
-    img_bytes.seek(0)
-    bytes_img = img_bytes.getvalue()
+        if solver_pool is not None:
+            solved, usage = solver_pool.solve_batch(model_entry, algorithm, G, stop, extras, F0)
+        else:
+            stop.start()
+            (F, iters, final_error), usage = measure_job(
+                partial(BLOCK_ALGORITHM[algorithm.lower()], model_entry.H, G, MAX_ITERATIONS, stop=stop,
+                        F0=F0, **extras),
+                per_thread=True)
+            solved = [(encode_image(F[:, j], model_entry.info.side), iters[j], final_error[j], stop.reason_of(j),
+                       F[:, j]) for j in range(len(items))]
+            del F
+    except BaseException as e:
+        for item in items:
+            inflight.fail(item["inflight_key"], e)
+            send_error(item, e)
+        raise
+
+    del G
+
+    for item, guess, (bytes_img, iters, final_error, stop_reason, f) in zip(items, guesses, solved):
+        iters_saved = record_solution(item, f, iters, stop_reason, guess is not None)
+        finish_job(item, bytes_img, iters, final_error, stop_reason, iters_saved)
+    return usage
+
+def finish_job(item, bytes_img, iters, final_error, stop_reason, iters_saved=0):
+    # parada por prazo é resultado parcial: não vai para o cache, só para quem esperava com prazo;
+    # divergência (pcgne num sistema inconsistente) também não fica guardada
+    if stop_reason not in ("deadline", "divergence"):
+        results.put(item["key"], {"iters": int(iters), "error": float(final_error), "stop_reason": stop_reason}, bytes_img)
+    inflight.finish(item["inflight_key"], (bytes_img, iters, final_error, stop_reason, iters_saved))
+    send_result(item, bytes_img, iters, final_error, stop_reason, iters_saved)
+
+def send_result(item, bytes_img, iters, final_error, stop_reason, iters_saved=0, cached=False):
+    data = item["payload"]
+    username = data.get("username")
+    idx = data.get("idx")
 
     end_time = time()
     end_dt = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-    del H_matrix, g_vector, g_processed, f, f_norm, imagem_array, imagem
-    # gc.collect()
-
-    # CORREÇÃO: usar bytes_img
-    img_b64 = base64.b64encode(bytes_img).decode()
-
-
     data_info = {
         "username": username,
         "index": idx,
-        "algorithm": algorithm,
-        "model": model,
-        "signal": signal,
-        "start_dt": start_dt,
+        "algorithm": data["algorithm"],
+        "model": data["model"],
+        "signal": data["signal"],
+        "start_dt": item["start_dt"],
         "end_dt": end_dt,
-        "size": f"{len(img_b64)}",
-        "iters": iters,
-        "time": end_time - start_time,
+        "iters": int(iters),
+        "error": float(final_error),
+        "stop_reason": stop_reason,
+        # iterações a menos que a média das partidas do zero, graças ao chute inicial
+        "iters_saved": int(iters_saved),
+        "cached": cached,
+        "time": end_time - item["start_time"],
     }
 
-    
-    mensagem = {
-        "type": "2_",
-        "payload": {
-            "header": data_info,   # CORREÇÃO: enviar o header certo
-            "image": img_b64
-        }
-    }
+    # a conexão escolhe o formato: quadro binário com o PNG cru ou "2_" em texto com base64
+    item["client"].send_result(data_info, bytes_img, item["request_id"])
+    print(f"[FINALIZADO] Process -> {username}  idx -> {idx}" + (" (cache)" if cached else ""))
 
-    # enviar mensagem *com quebra de linha*
-    client.send((json.dumps(mensagem) + "\n").encode())
-    print(f"[FINALIZADO] Process -> {username}  idx -> {idx}")
+def send_error(item, error):
+    data = item["payload"]
+    item["client"].send_error({"username": data.get("username"), "index": data.get("idx"),
+                               "error": str(error)}, item["request_id"])
 
 def handle_client(client, addr, request_queue):
     print(f"[NOVA CONEXÃO] {addr} conectado")
 
+    conn = SocketConnection(client, addr)
+    buffer = MessageBuffer()   # um recv pode trazer meia mensagem ou várias
     connected = True
-    username = None
 
     while connected:
         try:
-            data = client.recv(1000000)
+            data = client.recv(65536)
             if not data:
                 break
 
-            if data.startswith(b'EXIT'):
-                connected = False
+            for message in buffer.feed(data):
+                if message.kind == 'EXIT':
+                    connected = False
+                    break
+
+                if message.kind == 'HELLO':
+                    conn.negotiate(message.payload, client_window)
+                    continue
 
-            elif data.startswith(b'2_'):
-                parts = data.decode().split('|', 2)
-                username = parts[1]
-                json_str = parts[2]     
-                
-                payload = json.loads(json_str)  # <-- agora funciona
+                if conn.admit(message.request_id):
+                    request_queue.put({"payload": message.payload, "client": conn, "request_id": message.request_id,
+                                       "body": message.body})
 
-                request_queue.put({"payload": payload, "client": client})
-                
-        except ConnectionResetError:
-            print(f"[DESCONECTADO] {addr} encerrou a conexão.")
+        except (ConnectionResetError, ValueError) as e:
+            print(f"[DESCONECTADO] {addr} encerrou a conexão: {e}")
             break
 
-    client.close()
+    conn.close()
 
+# fila entre quem recebe os pedidos e o supervisor (threads do mesmo processo)
 request_queue = Queue()
 
-def main():
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    try:
-        server.bind(('localhost', 7776))
-        server.listen(5)
-        print('Servidor iniciado e aguardando conexões...')
-    except Exception as e:
-        print(f'\nErro ao iniciar o servidor: {e}\n')
-        return
+def user_setting(convert):
+    # "alice=2" -> ("alice", 2); peso ou cap zero/negativo deixaria o usuário parado para sempre
+    def parse(text):
+        user, sep, value = text.rpartition("=")
+        if not sep or not user:
+            raise argparse.ArgumentTypeError(f"esperado USUARIO=VALOR, recebido {text!r}")
+        value = convert(value)
+        if not value > 0:
+            raise argparse.ArgumentTypeError(f"o valor precisa ser positivo, recebido {text!r}")
+        return user, value
+    return parse
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Servidor de reconstrução de imagens")
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread",
+                        help="onde rodam as reconstruções: threads (padrão) ou pool de processos")
+    parser.add_argument("--workers", type=int, default=MAX_THREADS,
+                        help="quantidade de reconstruções simultâneas")
+    parser.add_argument("--frontend", choices=["thread", "asyncio"], default="thread",
+                        help="atendimento das conexões: uma thread por cliente (padrão) ou event loop asyncio")
+    parser.add_argument("--gram", action="store_true",
+                        help="CGNR com H^T H pré-calculado por modelo (compensa em modelos altos)")
+    parser.add_argument("--precond", choices=["jacobi", "bloco"], default="jacobi",
+                        help="precondicionador do pcgnr: escala das colunas (padrão) ou block-Jacobi "
+                             f"com blocos de {PRECOND_BLOCK} colunas")
+    parser.add_argument("--quantize", choices=QUANT_MODES,
+                        help="guarda H em int8 (escala por coluna) ou float16: menos memória por modelo "
+                             "e menos bytes lidos por iteração, com algum erro a mais")
+    parser.add_argument("--out-of-core", action="store_true",
+                        help="lê H de todo modelo binário (.hmdl) do disco em blocos de linhas a cada produto; "
+                             "sem a opção, só os maiores que o cache de modelos")
+    parser.add_argument("--block-budget", type=float, default=BLOCK_BUDGET / 1024**2, metavar="MB",
+                        help="memória de H por reconstrução em andamento nos modelos lidos do disco "
+                             f"(padrão {BLOCK_BUDGET // 1024**2} MB)")
+    parser.add_argument("--no-warm-start", action="store_true",
+                        help="sempre parte de f = 0, sem usar soluções de sinais parecidos como chute inicial")
+    parser.add_argument("--window", type=int, default=CLIENT_WINDOW,
+                        help="pedidos sem resposta que cada cliente pode manter (protocolo binário)")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="fifo",
+                        help="ordem dos jobs de cada usuário: chegada (fifo), menor tempo estimado "
+                             "com envelhecimento (sef) ou menor prazo (edf)")
+    parser.add_argument("--weight", action="append", default=[], metavar="USUARIO=PESO", type=user_setting(float),
+                        help="peso do usuário na divisão do servidor (padrão 1); pode repetir")
+    parser.add_argument("--cap", action="append", default=[], metavar="USUARIO=N", type=user_setting(int),
+                        help="máximo de jobs simultâneos do usuário (padrão --workers); pode repetir")
+    args = parser.parse_args()
+    if args.quantize and args.out_of_core:
+        parser.error("--quantize e --out-of-core não podem ser usados juntos")
+    return args
 
+def main():
+    global solver_pool, scheduler, sampler, cost_history, use_gram, precond_block, client_window
+    global models, model_quantization, warm_starts
+
+    args = parse_args()
+    sampler = ResourceSampler()
+    sampler.start()
+    use_gram = args.gram
+    precond_block = PRECOND_BLOCK if args.precond == "bloco" else 0
+    client_window = args.window
+    if args.no_warm_start:
+        warm_starts = None
+
+    if args.executor == "process":
+        from solver_pool import SolverPool
+        solver_pool = SolverPool(args.workers)
+        print(f"[SERVIDOR] Reconstruções em pool de {args.workers} processos")
+
+    # modelo descartado do cache também sai da memória compartilhada do pool
+    on_evict = solver_pool.release if solver_pool is not None else None
+    if args.quantize:
+        model_quantization = args.quantize
+        models = ModelRegistry(MODEL_CACHE_BYTES, loader=quantized_loader(args.quantize), on_evict=on_evict)
+        print(f"[SERVIDOR] Modelos residentes em {args.quantize}")
+    else:
+        # modelos binários que não cabem no cache de modelos são sempre lidos do disco
+        block_budget = int(args.block_budget * 1024**2)
+        models = ModelRegistry(MODEL_CACHE_BYTES,
+                               loader=streaming_loader(block_budget, 0 if args.out_of_core else MODEL_CACHE_BYTES),
+                               on_evict=on_evict)
+        if args.out_of_core:
+            print(f"[SERVIDOR] Modelos binários lidos do disco em blocos ({args.block_budget:g} MB por reconstrução)")
 
     close_profiler_worker = Value(c_bool)
 
     reports = Relatorio()
-    server_data = ServerData(reports, None)
+    server_data = ServerData(reports, models)
 
     profiler_worker = Thread(target=get_percent_virtual_memory, args=[close_profiler_worker, server_data])
     profiler_worker.start()
     
+    cost_history = CostHistory(COST_HISTORY_PATH, seed=TESTE_JSON_PATH)
+    scheduler = AdmissionScheduler(start_job, measure_usage, get_dynamic_cpu_limit(),
+                                   get_dynamic_mem_limit(), args.workers,
+                                   weights=dict(args.weight), caps=dict(args.cap),
+                                   policy=POLICIES[args.policy])
+    dispatcher = Thread(target=scheduler.run)
+    dispatcher.daemon = True
+    dispatcher.start()
+
     supervisor = Thread(target=run_queue_worker, args=(request_queue,))
     supervisor.daemon = True
     supervisor.start()
 
+    if args.frontend == "asyncio":
+        # milhares de conexões ociosas num único event loop
+        import async_server
+        try:
+            async_server.run('localhost', 7776, request_queue, client_window)
+        except OSError as e:
+            print(f'\nErro ao iniciar o servidor: {e}\n')
+        return
+
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        server.bind(('localhost', 7776))
+        server.listen(5)
+        print('Servidor iniciado e aguardando conexões...')
+    except Exception as e:
+        print(f'\nErro ao iniciar o servidor: {e}\n')
+        return
+
     while True:
         client, addr = server.accept()
         thread = Thread(target=handle_client, args=[client, addr, request_queue])
@@ -0,0 +1,51 @@
+from collections import OrderedDict
+from threading import Lock
+import os
+
+from signal_gain import load_signal_csv
+
+SIGNAL_CACHE_ITEMS = 64   # sinais lidos mantidos em memória (o menos usado sai)
+
+
+class SignalCache:
+    """Sinais já lidos do CSV e com o ganho aplicado, por caminho.
+
+    A entrada vale enquanto o arquivo não muda (mtime e tamanho iguais); o
+    mesmo array é entregue a todos os pedidos, por isso fica somente leitura.
+    """
+
+    def __init__(self, max_items=SIGNAL_CACHE_ITEMS):
+        self.max_items = max_items
+        self.__signals = OrderedDict()   # caminho -> ((mtime, tamanho), array)
+        self.__lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path):
+        stat = os.stat(path)   # o erro de arquivo inexistente mostra o caminho do pedido
+        version = (stat.st_mtime_ns, stat.st_size)
+        path = os.path.abspath(path)
+
+        with self.__lock:
+            cached = self.__signals.get(path)
+            if cached is not None and cached[0] == version:
+                self.__signals.move_to_end(path)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        # leitura fora do lock: dois pedidos do mesmo sinal novo podem ler em dobro, sem problema
+        g = load_signal_csv(path)
+        g.flags.writeable = False
+
+        with self.__lock:
+            self.__signals[path] = (version, g)
+            self.__signals.move_to_end(path)
+            while len(self.__signals) > self.max_items:
+                self.__signals.popitem(last=False)
+        return g
+
+    def stats(self):
+        with self.__lock:
+            return {"items": len(self.__signals), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,36 @@
+from functools import lru_cache
+import numpy as np
+
+
+@lru_cache(maxsize=16)
+def signal_gain(length: int) -> np.ndarray:
+    # ganho da amostra l (1..S): 100 + (1/20) * l * sqrt(l); depende só do tamanho do sinal
+    l = np.arange(1, length + 1, dtype=np.float64)
+    gain = (100.0 + (1.0 / 20.0) * l * np.sqrt(l)).astype(np.float32)
+    gain.flags.writeable = False
+    return gain
+
+
+def apply_signal_gain(g_vector: np.ndarray, inplace: bool = False) -> np.ndarray:
+    # inplace=True reaproveita o buffer do sinal quando ele já é float32
+    if inplace and g_vector.dtype == np.float32:
+        g_out = g_vector
+    else:
+        g_out = g_vector.astype(np.float32)
+
+    np.multiply(g_out, signal_gain(len(g_out)), out=g_out)
+    return g_out
+
+
+def load_signal_csv(path) -> np.ndarray:
+    # lê o CSV e aplica o ganho no próprio array lido, sem cópia extra
+    g_vector = np.loadtxt(path, delimiter=",", dtype=np.float32)
+    return apply_signal_gain(g_vector, inplace=True)
+
+
+def decode_signal(data) -> np.ndarray:
+    # sinal enviado no pedido: amostras float32 little-endian, sem ganho (como no CSV)
+    if len(data) % 4:
+        raise ValueError(f"sinal enviado com {len(data)} bytes: esperado múltiplo de 4 (float32)")
+    g_vector = np.frombuffer(data, dtype="<f4").astype(np.float32)
+    return apply_signal_gain(g_vector, inplace=True)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Reexecuta uma carga registrada no escalonador de admissão com cada política
+de ordem (fifo, sef, edf) e compara a latência dos jobs (espera + execução).
+
+Uso:
+    python simular_escalonamento.py                         # cache/historico-custos.jsonl ou ../teste.json
+    python simular_escalonamento.py ../teste.json --acelerar 20 --workers 2
+    python simular_escalonamento.py --taxa 0.5 --jobs 2000 --usuarios 4 --prazo 3
+
+A simulação roda o próprio AdmissionScheduler com um relógio virtual. Os jobs
+chegam nos instantes registrados (start_dt, comprimidos por --acelerar) ou
+num processo de Poisson (--taxa jobs/s, sorteando registros), duram o tempo
+medido e são estimados pela média do histórico do mesmo modelo/sinal/algoritmo.
+O orçamento vem só das reservas de CPU e memória: não há uso medido numa simulação.
+"""
+
+import argparse
+import heapq
+import json
+import math
+import os
+import random
+from datetime import datetime
+
+import psutil
+
+from cost_history import history_key
+from scheduler import POLICIES, AdmissionScheduler
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORICOS = [os.path.join(BASE_DIR, "cache", "historico-custos.jsonl"),
+              os.path.join(os.path.dirname(BASE_DIR), "teste.json")]
+
+
+def carregar_registros(caminho):
+    # lista JSON (teste.json) ou um registro por linha (historico-custos.jsonl)
+    with open(caminho, "r", encoding="utf-8") as f:
+        texto = f.read()
+    try:
+        return json.loads(texto)
+    except ValueError:
+        registros = []
+        for linha in texto.splitlines():
+            try:
+                registros.append(json.loads(linha))
+            except ValueError:
+                pass
+        return registros
+
+
+def montar_carga(registros, args, rng):
+    cpus = os.cpu_count() or 1
+    memoria = psutil.virtual_memory().total
+
+    # estimativa de cada job = média dos tempos registrados para o mesmo modelo/sinal/algoritmo
+    tempos = {}
+    for r in registros:
+        tempos.setdefault(history_key(r["model"], r["signal"], r.get("algorithm")), []).append(r["time"])
+    estimativas = {chave: sum(v) / len(v) for chave, v in tempos.items()}
+
+    if args.taxa:
+        instante, chegadas = 0.0, []
+        for _ in range(args.jobs):
+            instante += rng.expovariate(args.taxa)
+            chegadas.append((instante, rng.choice(registros)))
+    else:
+        datas = [datetime.strptime(r["start_dt"], '%Y-%m-%d %H:%M:%S').timestamp() if "start_dt" in r else i
+                 for i, r in enumerate(registros)]
+        inicio = min(datas)
+        chegadas = [((d - inicio) / args.acelerar, r) for d, r in zip(datas, registros)]
+
+    jobs = []
+    for i, (chegada, r) in enumerate(sorted(chegadas, key=lambda c: c[0])):
+        estimado = estimativas[history_key(r["model"], r["signal"], r.get("algorithm"))]
+        prazo = r.get("deadline")
+        if prazo is None and args.prazo:
+            prazo = args.prazo * estimado
+        jobs.append({
+            "id": i,
+            "chegada": chegada,
+            "duracao": r["time"],
+            "usuario": r.get("username") or f"u{i % args.usuarios}",
+            "prazo": chegada + prazo if prazo is not None else None,
+            "custo": {"cpu": r.get("cpu_used", 0.0) / cpus,
+                      "mem": r.get("mem_used_bytes", 0) / memoria * 100,
+                      "time": estimado},
+        })
+    return jobs
+
+
+def simular(jobs, politica, args):
+    relogio = [0.0]
+    eventos = []   # (instante, ordem, tipo, dados)
+    ordem = 0
+
+    def iniciar(job, ticket):
+        nonlocal ordem
+        job["inicio"] = relogio[0]
+        heapq.heappush(eventos, (relogio[0] + job["duracao"], ordem, "fim", (job, ticket)))
+        ordem += 1
+
+    escalonador = AdmissionScheduler(iniciar, lambda: (0.0, 0.0), args.cpu_limite, args.mem_limite,
+                                     args.workers, policy=POLICIES[politica], clock=lambda: relogio[0])
+
+    for job in jobs:
+        heapq.heappush(eventos, (job["chegada"], ordem, "chegada", dict(job)))
+        ordem += 1
+
+    concluidos = []
+    while eventos:
+        relogio[0], _, tipo, dados = heapq.heappop(eventos)
+        if tipo == "chegada":
+            escalonador.submit(dados, dados["custo"], user=dados["usuario"], deadline=dados["prazo"])
+        else:
+            job, ticket = dados
+            job["fim"] = relogio[0]
+            concluidos.append(job)
+            escalonador.finish(ticket)
+        escalonador.poll()
+
+    return concluidos
+
+
+def percentil(ordenados, q):
+    return ordenados[min(len(ordenados) - 1, max(math.ceil(q * len(ordenados)) - 1, 0))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara as políticas do escalonador numa carga registrada")
+    parser.add_argument("historico", nargs="?", help="teste.json ou historico-custos.jsonl")
+    parser.add_argument("--politicas", nargs="+", choices=sorted(POLICIES), default=sorted(POLICIES))
+    parser.add_argument("--workers", type=int, default=4, help="jobs simultâneos (como --workers do servidor)")
+    parser.add_argument("--acelerar", type=float, default=1.0, help="divide os intervalos entre chegadas registradas")
+    parser.add_argument("--taxa", type=float, help="chegadas de Poisson com esta taxa (jobs/s) em vez das registradas")
+    parser.add_argument("--jobs", type=int, default=1000, help="quantidade de jobs com --taxa")
+    parser.add_argument("--usuarios", type=int, default=1, help="usuários fictícios para registros sem username")
+    parser.add_argument("--prazo", type=float, help="prazo = este fator x tempo estimado (para registros sem deadline)")
+    parser.add_argument("--cpu-limite", type=float, default=85.0)
+    parser.add_argument("--mem-limite", type=float, default=85.0)
+    parser.add_argument("--semente", type=int, default=0)
+    args = parser.parse_args()
+
+    caminho = args.historico or next((h for h in HISTORICOS if os.path.exists(h)), None)
+    if caminho is None:
+        parser.error("nenhum histórico encontrado; informe o arquivo")
+
+    registros = [r for r in carregar_registros(caminho) if "time" in r]
+    if not registros:
+        parser.error(f"{caminho} não tem registros com tempo medido")
+
+    jobs = montar_carga(registros, args, random.Random(args.semente))
+    print(f"{caminho}: {len(jobs)} jobs, {args.workers} workers")
+    print(f"{'política':>8} {'média (s)':>10} {'p50':>8} {'p95':>8} {'p99':>8} {'máx':>8} {'prazos perdidos':>16}")
+
+    for politica in args.politicas:
+        concluidos = simular(jobs, politica, args)
+        latencias = sorted(job["fim"] - job["chegada"] for job in concluidos)
+        com_prazo = [job for job in concluidos if job["prazo"] is not None]
+        perdidos = sum(1 for job in com_prazo if job["fim"] > job["prazo"])
+
+        print(f"{politica:>8} {sum(latencias) / len(latencias):>10.2f} {percentil(latencias, 0.5):>8.2f} "
+              f"{percentil(latencias, 0.95):>8.2f} {percentil(latencias, 0.99):>8.2f} {latencias[-1]:>8.2f} "
+              f"{f'{perdidos}/{len(com_prazo)}' if com_prazo else '-':>16}")
+
+
+if __name__ == "__main__":
+    main()
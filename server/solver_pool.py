@@ -0,0 +1,230 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from threading import Lock
+import numpy as np
+
+from model_format import read_header
+from quantized import QuantizedMatrix
+from resource_sampler import measure_job
+from row_blocked import RowBlockedOperator
+from solvers import ALGORITHM, BLOCK_ALGORITHM, encode_image
+
+RELEASED_SEGMENTS = 64   # segmentos liberados que ainda são avisados aos processos filhos
+
+
+class SharedModelStore:
+    """Publica cada modelo uma única vez em memória compartilhada.
+
+    Os processos do pool recebem só os descritores (nome do segmento, forma,
+    dtype) de H e dos dados derivados (ex.: gram) e mapeiam a mesma memória,
+    sem copiar nada.
+
+    Um modelo que sai do cache de modelos é liberado com release(), adiado
+    até a última tarefa que recebeu os descritores dele chamar done(). Unlink
+    só apaga o nome: cada filho ainda precisa fechar o seu mapeamento, então
+    os nomes liberados vão junto com as próximas tarefas (released()).
+    """
+
+    def __init__(self):
+        self.__segments = {}   # caminho do modelo -> (mtime, {nome: (SharedMemory, descritor)})
+        self.__users = {}      # caminho do modelo -> tarefas em andamento com os descritores
+        self.__pending = {}    # caminho do modelo -> mtime a liberar quando a última tarefa acabar
+        self.__released = deque(maxlen=RELEASED_SEGMENTS)   # nomes já removidos
+        self.__lock = Lock()
+
+    def publish(self, entry, extras=None):
+        # H quantizado vai como códigos (+ escala); o filho remonta o QuantizedMatrix.
+        # H lido do disco (RowBlockedOperator) não é copiado: o filho abre o mesmo arquivo
+        streamed = None
+        if isinstance(entry.H, RowBlockedOperator):
+            arrays = {}
+            streamed = (entry.H.path, entry.H.block_budget)
+        elif isinstance(entry.H, QuantizedMatrix):
+            arrays = {"H": entry.H.codes}
+            if entry.H.scale is not None:
+                arrays["H_scale"] = entry.H.scale
+        else:
+            arrays = {"H": entry.H}
+        arrays.update(extras or {})
+
+        with self.__lock:
+            current = self.__segments.get(entry.path)
+
+            # o arquivo do modelo mudou: a versão antiga deixa de ser publicada
+            if current is not None and current[0] != entry.mtime:
+                for shm, _ in current[1].values():
+                    self.__release(shm)
+                current = None
+
+            if current is None:
+                current = self.__segments[entry.path] = (entry.mtime, {})
+
+            published = current[1]
+            for name, array in arrays.items():
+                if name not in published:
+                    published[name] = self.__copy_to_shared(array)
+
+            descriptors = {name: published[name][1] for name in arrays}
+            if streamed:
+                descriptors["H_file"] = streamed
+            self.__users[entry.path] = self.__users.get(entry.path, 0) + 1
+            return descriptors
+
+    def done(self, entry):
+        # a tarefa que recebeu os descritores de publish() terminou
+        with self.__lock:
+            users = self.__users.pop(entry.path) - 1
+            if users:
+                self.__users[entry.path] = users
+            elif entry.path in self.__pending:
+                self.__release_model(entry.path, self.__pending.pop(entry.path))
+
+    def release(self, path, mtime):
+        with self.__lock:
+            if self.__users.get(path):
+                self.__pending[path] = mtime
+            else:
+                self.__release_model(path, mtime)
+
+    def released(self):
+        with self.__lock:
+            return tuple(self.__released)
+
+    def close(self):
+        with self.__lock:
+            for _, published in self.__segments.values():
+                for shm, _ in published.values():
+                    self.__release(shm)
+            self.__segments.clear()
+
+    @staticmethod
+    def __copy_to_shared(array):
+        shm = SharedMemory(create=True, size=max(array.nbytes, 1))
+        shared = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+        shared[:] = array
+        return shm, (shm.name, array.shape, array.dtype.str)
+
+    def __release_model(self, path, mtime):
+        # chamado com o lock; só a versão desse mtime: uma versão mais nova do arquivo continua
+        current = self.__segments.get(path)
+        if current is None or current[0] != mtime:
+            return
+        del self.__segments[path]
+        for shm, _ in current[1].values():
+            self.__release(shm)
+
+    def __release(self, shm):
+        self.__released.append(shm.name)
+        shm.close()
+        shm.unlink()
+
+
+# ---- lado do processo filho ----
+
+_attached = {}   # nome do segmento -> (SharedMemory, ndarray somente leitura)
+_streamed = {}   # (caminho, orçamento) -> RowBlockedOperator aberto neste processo
+
+
+def _attach(descriptor):
+    name, shape, dtype = descriptor
+    attached = _attached.get(name)
+    if attached is None:
+        # quem cria e remove o segmento é o servidor; o filho só mapeia
+        shm = SharedMemory(name=name)
+        array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        array.flags.writeable = False
+        attached = _attached[name] = (shm, array)
+    return attached[1]
+
+
+def _open_streamed(path, block_budget):
+    H = _streamed.get((path, block_budget))
+    if H is None:
+        H = _streamed[(path, block_budget)] = RowBlockedOperator(path, read_header(path), block_budget)
+    return H
+
+
+def _detach(names):
+    # segmentos que o servidor já removeu: fecha o mapeamento deste processo
+    for name in names:
+        attached = _attached.pop(name, None)
+        if attached is not None:
+            shm, array = attached
+            del attached, array
+            try:
+                shm.close()
+            except BufferError:
+                pass   # ainda há uma view viva; o mapeamento cai quando ela for coletada
+
+
+def _attach_all(descriptors, released):
+    _detach(released)
+    descriptors = dict(descriptors)
+    streamed = descriptors.pop("H_file", None)
+    arrays = {name: _attach(descriptor) for name, descriptor in descriptors.items()}
+    if streamed:
+        return _open_streamed(*streamed), arrays
+    H = arrays.pop("H")
+    if "H_scale" in arrays or H.dtype == np.float16:
+        H = QuantizedMatrix(H, arrays.pop("H_scale", None))
+    return H, arrays
+
+
+# stop chega como cópia (pickle): o motivo da parada volta junto com o resultado.
+# A solução também volta (float32), para servir de chute inicial a pedidos seguintes.
+
+def _solve(descriptors, released, algorithm, g, stop, lado, options):
+    # devolve também o JobUsage medido aqui: a CPU do filho não aparece no servidor
+    H, extras = _attach_all(descriptors, released)
+    stop.start()   # a espera na fila do pool não conta como duração de iteração
+    (f, iters, final_error), usage = measure_job(
+        partial(ALGORITHM[algorithm.lower()], H, g, stop.max_iterations, stop=stop, **options, **extras))
+    return encode_image(f, lado), iters, final_error, stop.reason, np.asarray(f, dtype=np.float32).reshape(-1), usage
+
+
+def _solve_batch(descriptors, released, algorithm, G, stop, lado, F0):
+    H, extras = _attach_all(descriptors, released)
+    stop.start()
+    (F, iters, final_error), usage = measure_job(
+        partial(BLOCK_ALGORITHM[algorithm.lower()], H, G, stop.max_iterations, stop=stop, F0=F0, **extras))
+    return [(encode_image(F[:, j], lado), int(iters[j]), float(final_error[j]), stop.reason_of(j),
+             F[:, j].astype(np.float32)) for j in range(F.shape[1])], usage
+
+
+class SolverPool:
+    """Executa reconstruções num pool de processos; só sinal e resultado (PNG) trafegam."""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.__store = SharedModelStore()
+        self.__executor = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+
+    def solve(self, entry, algorithm, g, stop, extras=None, options=None):
+        # extras: arrays do modelo (memória compartilhada); options: parâmetros do pedido (ex.: rank, f0)
+        descriptors = self.__store.publish(entry, extras)
+        try:
+            future = self.__executor.submit(_solve, descriptors, self.__store.released(), algorithm, g, stop,
+                                            entry.info.side, options or {})
+            return future.result()
+        finally:
+            self.__store.done(entry)
+
+    def solve_batch(self, entry, algorithm, G, stop, extras=None, F0=None):
+        descriptors = self.__store.publish(entry, extras)
+        try:
+            future = self.__executor.submit(_solve_batch, descriptors, self.__store.released(), algorithm, G, stop,
+                                            entry.info.side, F0)
+            return future.result()
+        finally:
+            self.__store.done(entry)
+
+    def release(self, entry):
+        # ligado ao on_evict do ModelRegistry
+        self.__store.release(entry.path, entry.mtime)
+
+    def close(self):
+        self.__executor.shutdown(wait=True)
+        self.__store.close()
@@ -0,0 +1,915 @@
+import io
+from time import time
+import numpy as np
+from PIL import Image
+
+GRAM_BLOCK_ROWS = 4096
+
+class StopCriteria:
+    """Quando parar uma reconstrução: vale o primeiro critério atingido.
+
+    - tol: erro relativo do resíduo alvo (só conta depois de min_iterations);
+    - stagnation: para quando o menor erro relativo até aqui melhorou menos que
+      essa fração nas últimas `window` iterações (convergência estagnada). Olha
+      uma janela, não a última iteração: platôs curtos do CG não param a
+      reconstrução. Kernels de resíduo não monótono (família CGNE) chamam
+      done(..., monotone=False) e não usam esse critério;
+    - deadline: instante (time()) em que a resposta precisa sair; para antes
+      de uma iteração que, pela duração da anterior, passaria dele;
+    - max_iterations: teto de segurança.
+
+    O motivo fica em reason ("tolerance", "stagnation", "deadline",
+    "max_iterations", "breakdown" ou, no pcgne, "divergence"); nas variantes
+    em bloco, por coluna em reason_of(j). Guarda estado da execução: um objeto por reconstrução.
+
+    A duração da primeira iteração é medida a partir de start(), chamado logo
+    antes do kernel: pré-cálculos (gram, precondicionador, fatores) e a
+    espera no pool não entram na estimativa do prazo.
+    """
+
+    def __init__(self, max_iterations, tol=None, min_iterations=0, stagnation=None, deadline=None, window=5):
+        self.max_iterations = max_iterations
+        self.tol = tol
+        self.min_iterations = min_iterations
+        self.stagnation = stagnation
+        self.deadline = deadline
+        self.window = window
+        self.reason = "max_iterations"
+        self.reasons = {}   # coluna -> motivo (variantes em bloco)
+        self.__last = time()
+        self.__best = {}   # coluna -> menor erro relativo até cada uma das últimas window + 1 iterações
+
+    def start(self):
+        self.__last = time()
+
+    def done(self, iteration, relative_error, monotone=True):
+        reason = self.__check(iteration, relative_error, 0, monotone, self.__next_iteration_end())
+        if reason is not None:
+            self.reason = reason
+            return True
+        return False
+
+    def done_block(self, iteration, columns, relative_errors, monotone=True):
+        # devolve a máscara das colunas ativas que param nesta iteração
+        next_end = self.__next_iteration_end()
+        stopped = np.zeros(len(columns), dtype=bool)
+        for j, (column, relative_error) in enumerate(zip(columns.tolist(), relative_errors.tolist())):
+            reason = self.__check(iteration, relative_error, column, monotone, next_end)
+            if reason is not None:
+                self.reasons[column] = reason
+                stopped[j] = True
+        return stopped
+
+    def reason_of(self, column):
+        return self.reasons.get(column, "max_iterations")
+
+    def __next_iteration_end(self):
+        # estimativa de quando terminaria a próxima iteração, pela duração da última
+        now = time()
+        elapsed, self.__last = now - self.__last, now
+        return now + elapsed
+
+    def __check(self, iteration, relative_error, column, monotone, next_end):
+        if self.tol is not None and iteration >= self.min_iterations and relative_error < self.tol:
+            return "tolerance"
+        if self.stagnation is not None and monotone and self.__stagnated(column, relative_error) \
+                and iteration >= self.min_iterations:
+            return "stagnation"
+        if self.deadline is not None and next_end > self.deadline:
+            return "deadline"
+        return None
+
+    def __stagnated(self, column, relative_error):
+        # compara o menor erro de agora com o de window iterações atrás
+        best = self.__best.setdefault(column, [])
+        best.append(min(relative_error, best[-1]) if best else relative_error)
+        if len(best) > self.window + 1:
+            best.pop(0)
+        return len(best) > self.window and best[0] - best[-1] < self.stagnation * best[0]
+
+def _emit_progress(progress, iteration, f, relative_error):
+    # Prévia da solução parcial (progress é opcional). f é o vetor do próprio solver e
+    # pode ser atualizado in-place nas iterações seguintes: quem recebe usa (ou copia)
+    # f durante a chamada e não guarda a referência.
+    if progress is not None:
+        progress(iteration, f, relative_error)
+
+def _initial_guess(f0, n, k=1):
+    # ponto de partida dos kernels float64: zero ou uma cópia de f0 em (n, k)
+    if f0 is None:
+        return np.zeros((n, k))
+    return np.array(f0, dtype=np.float64).reshape(n, k)
+
+def compute_gram(H: np.ndarray) -> np.ndarray:
+    # H^T H em float64, acumulado por blocos de linhas para não converter H inteiro
+    n = H.shape[1]
+    gram = np.zeros((n, n))
+    for start in range(0, H.shape[0], GRAM_BLOCK_ROWS):
+        block = np.asarray(H[start:start + GRAM_BLOCK_ROWS], dtype=np.float64)
+        gram += block.T @ block
+    return gram
+
+def reconstruct_cgnr(H: np.ndarray, g: np.ndarray, max_iterations: int, tol=5e-3, min_iterations=10, lambda_reg: float = 0.0, logger=None, gram=None, stop=None, progress=None, f0=None) -> tuple:
+    # f0: chute inicial (ex.: solução de um sinal parecido); o erro relativo é sempre
+    # ||r|| / ||g||, o mesmo de partir do zero, para a tolerância valer igual
+    if gram is not None:
+        return reconstruct_cgnr_gram(H, g, max_iterations, tol=tol, min_iterations=min_iterations, gram=gram, logger=logger, stop=stop, progress=progress, f0=f0)
+
+    m, n = H.shape
+    f = _initial_guess(f0, n)
+    g = g.reshape(-1, 1)
+    r = g - H @ f
+    z = H.T @ r
+    p = z.copy()
+    initial_residual_norm = np.linalg.norm(g)
+    min_div = 1e-12
+    if stop is None:
+        stop = StopCriteria(max_iterations, tol, min_iterations)
+    number_iterations = 0
+
+    if logger is not None:
+        logger.info(f"CGNR: tol={tol:.3e}")
+
+    for i in range(stop.max_iterations):
+        w = H @ p
+
+        # >>> Correção dos warnings
+        z_dot = (z.T @ z).item()
+        w_dot = (w.T @ w).item() + min_div
+        # <<<
+
+        alpha = z_dot / w_dot
+
+        f_new = f + alpha * p
+        r_new = r - alpha * w
+        z_new = H.T @ r_new
+
+        # >>> Correção dos warnings
+        z_new_dot = (z_new.T @ z_new).item()
+        # <<<
+
+        beta = z_new_dot / (z_dot + min_div)
+        p_new = z_new + beta * p
+
+        current_residual_norm = np.linalg.norm(r_new)
+        relative_error = current_residual_norm / (initial_residual_norm + min_div)
+
+        if logger is not None:
+            logger.info(
+                f"Iteracao {i + 1}: erro relativo = {relative_error:.6e}, residuo = {current_residual_norm:.3e}"
+            )
+
+        f, r, z, p = f_new, r_new, z_new, p_new
+        number_iterations = i + 1
+
+        if stop.done(number_iterations, relative_error):
+            if logger is not None:
+                logger.info(f"Parou ({stop.reason}) com erro relativo {relative_error:.2e}")
+            break
+
+        _emit_progress(progress, number_iterations, f, relative_error)
+
+    final_residual = g - H @ f
+    final_error = np.linalg.norm(final_residual) / (np.linalg.norm(g) + min_div)
+    return f.flatten(), number_iterations, final_error
+
+def reconstruct_cgnr_gram(H: np.ndarray, g: np.ndarray, max_iterations: int, tol=5e-3, min_iterations=10, gram=None, logger=None, stop=None, progress=None, f0=None) -> tuple:
+    # CGNR sobre as equações normais: cada iteração usa só gram = H^T H (n x n).
+    # H é percorrido duas vezes no total (H^T g e o erro final; mais H f0 com chute
+    # inicial), não duas por iteração.
+    # O resíduo r = g - Hf não é formado; sua norma segue a recorrência
+    # ||r - a*Hp||^2 = ||r||^2 - 2a z.p + a^2 p^T gram p, com z = H^T r.
+    if gram is None:
+        gram = compute_gram(H)
+
+    n = gram.shape[0]
+    f = _initial_guess(f0, n)
+    g = g.reshape(-1, 1).astype(np.float64)
+    r = g if f0 is None else g - H @ f
+    z = H.T @ r
+    p = z.copy()
+    residual_sq = (r.T @ r).item()
+    initial_residual_norm = np.linalg.norm(g)
+    min_div = 1e-12
+    if stop is None:
+        stop = StopCriteria(max_iterations, tol, min_iterations)
+    number_iterations = 0
+
+    if logger is not None:
+        logger.info(f"CGNR (gram): tol={tol:.3e}")
+
+    for i in range(stop.max_iterations):
+        gp = gram @ p
+
+        z_dot = (z.T @ z).item()
+        w_dot = (p.T @ gp).item() + min_div
+
+        alpha = z_dot / w_dot
+
+        residual_sq = max(residual_sq - 2 * alpha * (z.T @ p).item() + alpha * alpha * (w_dot - min_div), 0.0)
+
+        f = f + alpha * p
+        z_new = z - alpha * gp
+
+        z_new_dot = (z_new.T @ z_new).item()
+
+        beta = z_new_dot / (z_dot + min_div)
+        p = z_new + beta * p
+        z = z_new
+
+        current_residual_norm = np.sqrt(residual_sq)
+        relative_error = current_residual_norm / (initial_residual_norm + min_div)
+
+        if logger is not None:
+            logger.info(
+                f"Iteracao {i + 1}: erro relativo = {relative_error:.6e}, residuo = {current_residual_norm:.3e}"
+            )
+
+        number_iterations = i + 1
+
+        if stop.done(number_iterations, relative_error):
+            if logger is not None:
+                logger.info(f"Parou ({stop.reason}) com erro relativo {relative_error:.2e}")
+            break
+
+        _emit_progress(progress, number_iterations, f, relative_error)
+
+    final_residual = g - H @ f
+    final_error = np.linalg.norm(final_residual) / (np.linalg.norm(g) + min_div)
+    return f.flatten(), number_iterations, final_error
+
+def reconstruct_cgne(H: np.ndarray, g: np.ndarray, max_iterations: int, tol=1e-6, min_iterations=10, reg_factor: float = 0.0, logger=None, stop=None, progress=None, f0=None) -> tuple[np.ndarray, int, float]:
+    N = H.shape[1]
+    f = _initial_guess(f0, N)
+    g = g.reshape(-1, 1)
+    r = g - H @ f
+    p = H.T @ r
+    initial_residual_norm = np.linalg.norm(g)
+    min_div = 1e-12
+    if stop is None:
+        stop = StopCriteria(max_iterations, tol, min_iterations)
+    final_iterations = 0
+
+    if logger is not None:
+        logger.info(f"CGNE: tol={tol:.3e}")
+
+    for i in range(stop.max_iterations):
+        Hp = H @ p
+
+        # >>> Correções dos warnings
+        alpha_num = (r.T @ r).item()
+        alpha_den = (Hp.T @ Hp).item() + min_div
+        # <<<
+
+        if alpha_den < min_div:
+            stop.reason = "breakdown"
+            break
+
+        alpha = alpha_num / alpha_den
+        f_new = f + alpha * p
+        r_new = r - alpha * (H @ p)
+
+        # >>> Correções dos warnings
+        beta_num = (r_new.T @ r_new).item()
+        beta_den = (r.T @ r).item() + min_div
+        # <<<
+
+        beta = beta_num / beta_den
+        p_new = H.T @ r_new + beta * p
+
+        current_residual_norm = np.linalg.norm(r_new)
+        relative_error = current_residual_norm / (initial_residual_norm + min_div)
+
+        if logger is not None:
+            logger.info(f"Iteracao {i + 1}: erro relativo = {relative_error:.6e}")
+
+        f, r, p = f_new, r_new, p_new
+        final_iterations = i + 1
+
+        if stop.done(final_iterations, relative_error, monotone=False):
+            if logger is not None:
+                logger.info(f"Parou ({stop.reason}) com erro relativo {relative_error:.2e}")
+            break
+
+        _emit_progress(progress, final_iterations, f, relative_error)
+
+    final_error = np.linalg.norm(g - H @ f) / (np.linalg.norm(g) + min_div)
+    return f.flatten(), final_iterations, final_error
+
+def reconstruct_cgnr_block(H: np.ndarray, G: np.ndarray, max_iterations: int, tol=5e-3, min_iterations=10, logger=None, gram=None, stop=None, F0=None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # CGNR para vários sinais do mesmo modelo: cada coluna de G é um sinal.
+    # Os produtos viram matriz-matriz (H é lido uma vez para todas as colunas)
+    # e cada coluna para sozinha quando converge. F0: chutes iniciais (colunas zero = sem chute).
+    if gram is not None:
+        return reconstruct_cgnr_block_gram(H, G, max_iterations, tol=tol, min_iterations=min_iterations, gram=gram, logger=logger, stop=stop, F0=F0)
+
+    m, n = H.shape
+    G = G.reshape(m, -1)
+    k = G.shape[1]
+    F = _initial_guess(F0, n, k)
+    R = G - H @ F
+    Z = H.T @ R
+    P = Z.copy()
+    initial_residual_norm = np.linalg.norm(G, axis=0)
+    z_dot = np.sum(Z * Z, axis=0)
+    min_div = 1e-12
+    if stop is None:
+        stop = StopCriteria(max_iterations, tol, min_iterations)
+    number_iterations = np.zeros(k, dtype=int)
+    active = np.arange(k)
+
+    if logger is not None:
+        logger.info(f"CGNR bloco ({k} sinais): tol={tol:.3e}")
+
+    for i in range(stop.max_iterations):
+        if active.size == 0:
+            break
+
+        P_a = P[:, active]
+        W = H @ P_a
+
+        alpha = z_dot[active] / (np.sum(W * W, axis=0) + min_div)
+
+        F[:, active] += alpha * P_a
+        R_a = R[:, active] - alpha * W
+        R[:, active] = R_a
+        Z_a = H.T @ R_a
+
+        z_new_dot = np.sum(Z_a * Z_a, axis=0)
+        beta = z_new_dot / (z_dot[active] + min_div)
+        P[:, active] = Z_a + beta * P_a
+        z_dot[active] = z_new_dot
+
+        relative_error = np.linalg.norm(R_a, axis=0) / (initial_residual_norm[active] + min_div)
+        number_iterations[active] = i + 1
+
+        if logger is not None:
+            logger.info(f"Iteracao {i + 1}: {active.size} ativos, maior erro relativo = {relative_error.max():.6e}")
+
+        active = active[~stop.done_block(i + 1, active, relative_error)]
+
+    final_error = np.linalg.norm(G - H @ F, axis=0) / (np.linalg.norm(G, axis=0) + min_div)
+    return F, number_iterations, final_error
+
+def reconstruct_cgnr_block_gram(H: np.ndarray, G: np.ndarray, max_iterations: int, tol=5e-3, min_iterations=10, gram=None, logger=None, stop=None, F0=None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # mesma recorrência de reconstruct_cgnr_gram, uma coluna por sinal
+    if gram is None:
+        gram = compute_gram(H)
+
+    m = H.shape[0]
+    n = gram.shape[0]
+    G = G.reshape(m, -1)
+    k = G.shape[1]
+    F = _initial_guess(F0, n, k)
+    G = G.astype(np.float64)
+    R = G if F0 is None else G - H @ F
+    Z = H.T @ R
+    P = Z.copy()
+    residual_sq = np.sum(R * R, axis=0)
+    initial_residual_norm = np.linalg.norm(G, axis=0)
+    z_dot = np.sum(Z * Z, axis=0)
+    min_div = 1e-12
+    if stop is None:
+        stop = StopCriteria(max_iterations, tol, min_iterations)
+    number_iterations = np.zeros(k, dtype=int)
+    active = np.arange(k)
+
+    if logger is not None:
+        logger.info(f"CGNR bloco (gram, {k} sinais): tol={tol:.3e}")
+
+    for i in range(stop.max_iterations):
+        if active.size == 0:
+            break
+
+        P_a = P[:, active]
+        Z_a = Z[:, active]
+        GP = gram @ P_a
+
+        w_dot = np.sum(P_a * GP, axis=0)
+        alpha = z_dot[active] / (w_dot + min_div)
+
+        residual_sq[active] = np.maximum(residual_sq[active] - 2 * alpha * np.sum(Z_a * P_a, axis=0) + alpha * alpha * w_dot, 0.0)
+
+        F[:, active] += alpha * P_a
+        Z_a = Z_a - alpha * GP
+        Z[:, active] = Z_a
+
+        z_new_dot = np.sum(Z_a * Z_a, axis=0)
+        beta = z_new_dot / (z_dot[active] + min_div)
+        P[:, active] = Z_a + beta * P_a
+        z_dot[active] = z_new_dot
+
+        relative_error = np.sqrt(residual_sq[active]) / (initial_residual_norm[active] + min_div)
+        number_iterations[active] = i + 1
+
+        if logger is not None:
+            logger.info(f"Iteracao {i + 1}: {active.size} ativos, maior erro relativo = {relative_error.max():.6e}")
+
+        active = active[~stop.done_block(i + 1, active, relative_error)]
+
+    final_error = np.linalg.norm(G - H @ F, axis=0) / (np.linalg.norm(G, axis=0) + min_div)
+    return F, number_iterations, final_error
+
+def reconstruct_cgne_block(H: np.ndarray, G: np.ndarray, max_iterations: int, tol=1e-6, min_iterations=10, logger=None, stop=None, F0=None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    m, n = H.shape
+    G = G.reshape(m, -1)
+    k = G.shape[1]
+    F = _initial_guess(F0, n, k)
+    R = G - H @ F
+    P = H.T @ R
+    initial_residual_norm = np.linalg.norm(G, axis=0)
+    r_dot = np.sum(R * R, axis=0)
+    min_div = 1e-12
+    if stop is None:
+        stop = StopCriteria(max_iterations, tol, min_iterations)
+    final_iterations = np.zeros(k, dtype=int)
+    active = np.arange(k)
+
+    if logger is not None:
+        logger.info(f"CGNE bloco ({k} sinais): tol={tol:.3e}")
+
+    for i in range(stop.max_iterations):
+        if active.size == 0:
+            break
+
+        P_a = P[:, active]
+        HP = H @ P_a
+
+        alpha_den = np.sum(HP * HP, axis=0) + min_div
+        ok = alpha_den >= min_div
+        if not ok.all():
+            for column in active[~ok].tolist():
+                stop.reasons[column] = "breakdown"
+            active, P_a, HP, alpha_den = active[ok], P_a[:, ok], HP[:, ok], alpha_den[ok]
+            if active.size == 0:
+                break
+
+        alpha = r_dot[active] / alpha_den
+        F[:, active] += alpha * P_a
+        R_a = R[:, active] - alpha * HP
+        R[:, active] = R_a
+
+        r_new_dot = np.sum(R_a * R_a, axis=0)
+        beta = r_new_dot / (r_dot[active] + min_div)
+        P[:, active] = H.T @ R_a + beta * P_a
+        r_dot[active] = r_new_dot
+
+        relative_error = np.linalg.norm(R_a, axis=0) / (initial_residual_norm[active] + min_div)
+        final_iterations[active] = i + 1
+
+        if logger is not None:
+            logger.info(f"Iteracao {i + 1}: {active.size} ativos, maior erro relativo = {relative_error.max():.6e}")
+
+        active = active[~stop.done_block(i + 1, active, relative_error, monotone=False)]
+
+    final_error = np.linalg.norm(G - H @ F, axis=0) / (np.linalg.norm(G, axis=0) + min_div)
+    return F, final_iterations, final_error
+
+PRECOND_BLOCK = 64   # colunas por bloco diagonal no precondicionador block-Jacobi
+
+def compute_preconditioner(H: np.ndarray, block: int = 0) -> dict:
+    # Precondicionador por modelo, calculado uma vez (H percorrido por blocos de linhas):
+    #   scale  = 1 / ||h_j||, escala das colunas (Jacobi de H^T H);
+    #   blocks = com block > 0, L^-1 do Cholesky de cada bloco diagonal block x block de
+    #            H^T H (block-Jacobi: o Cholesky incompleto que só guarda a diagonal em blocos).
+    m, n = H.shape
+    col_sq = np.zeros(n)
+    nblocks = -(-n // block) if block > 0 else 0
+    diag = np.zeros((nblocks, block, block))
+    for start in range(0, m, GRAM_BLOCK_ROWS):
+        rows = np.asarray(H[start:start + GRAM_BLOCK_ROWS], dtype=np.float64)
+        col_sq += np.einsum('ij,ij->j', rows, rows)
+        for b in range(nblocks):
+            cols = rows[:, b * block:(b + 1) * block]
+            diag[b, :cols.shape[1], :cols.shape[1]] += cols.T @ cols
+
+    # coluna nula não é escalada (e o bloco dela vira identidade)
+    scale = 1.0 / np.sqrt(np.where(col_sq > 0, col_sq, 1.0))
+    precond = {'scale': scale}
+    if nblocks:
+        blocks = np.empty_like(diag)
+        eye = np.eye(block)
+        for b in range(nblocks):
+            d = diag[b]
+            # a escala deixa a diagonal em 1; o termo pequeno cobre colunas dependentes no bloco
+            s_b = np.ones(block)
+            s_b[:min(block, n - b * block)] = scale[b * block:(b + 1) * block]
+            d = d * np.outer(s_b, s_b)
+            d[np.diag_indices(block)] = np.where(np.diag(d) > 0, np.diag(d), 1.0) + 1e-6
+            blocks[b] = np.linalg.solve(np.linalg.cholesky(d), eye) * s_b
+        precond['blocks'] = blocks
+    return precond
+
+def _apply_preconditioner(scale, blocks, z):
+    # s = M^-1 z, com M ~ H^T H
+    if blocks is None:
+        return z * (scale ** 2).reshape(-1, 1)
+
+    nblocks, block, _ = blocks.shape
+    n = z.shape[0]
+    padded = np.zeros((nblocks * block, 1))
+    padded[:n] = z
+    y = np.einsum('kij,kj->ki', blocks, padded.reshape(nblocks, block))   # L^-1 z por bloco
+    s = np.einsum('kji,kj->ki', blocks, y)                                  # L^-T y
+    return s.reshape(-1, 1)[:n]
+
+def reconstruct_pcgnr(H: np.ndarray, g: np.ndarray, max_iterations: int, tol=5e-3, min_iterations=10, scale=None, blocks=None, logger=None, stop=None, progress=None, f0=None) -> tuple:
+    # CGNR precondicionado (PCG nas equações normais com M ~ H^T H): a direção é M^-1 z.
+    # Colunas de H com normas muito diferentes deixam H^T H mal condicionado; a escala as iguala.
+    # scale/blocks vêm de compute_preconditioner (sem eles, Jacobi calculado aqui).
+    if scale is None:
+        scale = compute_preconditioner(H)['scale']
+
+    m, n = H.shape
+    f = _initial_guess(f0, n)
+    g = g.reshape(-1, 1).astype(np.float64)
+    r = g.copy() if f0 is None else g - H @ f
+    z = H.T @ r
+    s = _apply_preconditioner(scale, blocks, z)
+    p = s.copy()
+    zs = (z.T @ s).item()
+    initial_residual_norm = np.linalg.norm(g)
+    min_div = 1e-12
+    if stop is None:
+        stop = StopCriteria(max_iterations, tol, min_iterations)
+    number_iterations = 0
+
+    if logger is not None:
+        logger.info(f"PCGNR ({'Jacobi' if blocks is None else 'block-Jacobi'}): tol={tol:.3e}")
+
+    for i in range(stop.max_iterations):
+        w = H @ p
+        alpha = zs / ((w.T @ w).item() + min_div)
+
+        f = f + alpha * p
+        r = r - alpha * w
+        z = H.T @ r
+        s = _apply_preconditioner(scale, blocks, z)
+
+        zs_new = (z.T @ s).item()
+        beta = zs_new / (zs + min_div)
+        p = s + beta * p
+        zs = zs_new
+
+        current_residual_norm = np.linalg.norm(r)
+        relative_error = current_residual_norm / (initial_residual_norm + min_div)
+
+        if logger is not None:
+            logger.info(
+                f"Iteracao {i + 1}: erro relativo = {relative_error:.6e}, residuo = {current_residual_norm:.3e}"
+            )
+
+        number_iterations = i + 1
+
+        if stop.done(number_iterations, relative_error):
+            if logger is not None:
+                logger.info(f"Parou ({stop.reason}) com erro relativo {relative_error:.2e}")
+            break
+
+        _emit_progress(progress, number_iterations, f, relative_error)
+
+    final_residual = g - H @ f
+    final_error = np.linalg.norm(final_residual) / (np.linalg.norm(g) + min_div)
+    return f.flatten(), number_iterations, final_error
+
+PCGNE_DIVERGENCE = 100.0   # o pcgne para quando o resíduo passa desse múltiplo do menor já visto
+                          # (o resíduo do Craig não é monótono: sobe até ~5x em sistemas consistentes)
+
+def reconstruct_pcgne(H: np.ndarray, g: np.ndarray, max_iterations: int, tol=1e-6, min_iterations=10, scale=None, blocks=None, logger=None, stop=None, progress=None, f0=None) -> tuple:
+    # CGNE (Craig) sobre H D, D = diag(scale), e f = D x. O sistema do CGNE é H H^T (m x m),
+    # então só a escala das colunas se aplica; blocks é aceito e ignorado.
+    # alpha = r.r / p.p, como no método de Craig.
+    # Só serve para H consistente (g na imagem de H) ou subdeterminado (m <= n): num sistema
+    # alto e inconsistente o resíduo cresce sem limite. Por isso devolve o iterado de menor
+    # resíduo e para com "divergence" quando o resíduo passa de PCGNE_DIVERGENCE vezes ele.
+    if scale is None:
+        scale = compute_preconditioner(H)['scale']
+    d = scale.reshape(-1, 1)
+
+    m, n = H.shape
+    x = _initial_guess(f0, n) / d
+    g = g.reshape(-1, 1).astype(np.float64)
+    r = g.copy() if f0 is None else g - H @ (d * x)
+    p = d * (H.T @ r)
+    initial_residual_norm = np.linalg.norm(g)
+    r_dot = (r.T @ r).item()
+    min_div = 1e-12
+    if stop is None:
+        stop = StopCriteria(max_iterations, tol, min_iterations)
+    final_iterations = 0
+    best_x, best_error = x, np.sqrt(r_dot) / (initial_residual_norm + min_div)
+
+    if logger is not None:
+        logger.info(f"PCGNE (Jacobi): tol={tol:.3e}")
+
+    for i in range(stop.max_iterations):
+        alpha_den = (p.T @ p).item() + min_div
+
+        if alpha_den < min_div:
+            stop.reason = "breakdown"
+            break
+
+        alpha = r_dot / alpha_den
+        x = x + alpha * p
+        r = r - alpha * (H @ (d * p))
+
+        r_new_dot = (r.T @ r).item()
+        beta = r_new_dot / (r_dot + min_div)
+        p = d * (H.T @ r) + beta * p
+        r_dot = r_new_dot
+
+        current_residual_norm = np.sqrt(r_dot)
+        relative_error = current_residual_norm / (initial_residual_norm + min_div)
+
+        if logger is not None:
+            logger.info(f"Iteracao {i + 1}: erro relativo = {relative_error:.6e}")
+
+        final_iterations = i + 1
+
+        # x é um array novo a cada iteração: guardar a referência basta
+        if relative_error < best_error:
+            best_x, best_error = x, relative_error
+        elif relative_error > PCGNE_DIVERGENCE * best_error:
+            stop.reason = "divergence"
+            if logger is not None:
+                logger.info(f"Parou (divergence) com erro relativo {relative_error:.2e}, devolve o de {best_error:.2e}")
+            break
+
+        if stop.done(final_iterations, relative_error, monotone=False):
+            if logger is not None:
+                logger.info(f"Parou ({stop.reason}) com erro relativo {relative_error:.2e}")
+            break
+
+        if progress is not None:   # d * x só é montado quando alguém quer a prévia
+            _emit_progress(progress, final_iterations, d * x, relative_error)
+
+    f = d * best_x
+    final_residual = g - H @ f
+    final_error = np.linalg.norm(final_residual) / (np.linalg.norm(g) + min_div)
+    return f.flatten(), final_iterations, final_error
+
+TSVD_RANK = 256   # posto guardado por modelo; cada pedido pode usar menos
+
+def tsvd_rank(shape, rank=0):
+    # posto que o reconstruct_tsvd usa de fato com os fatores do compute_tsvd:
+    # o pedido (0 = todos) limitado aos min(TSVD_RANK, m, n) fatores guardados
+    stored = min(TSVD_RANK, *shape)
+    return min(rank, stored) if rank else stored
+
+def compute_tsvd(H: np.ndarray, rank: int = TSVD_RANK, oversample: int = 10, power_iterations: int = 2, seed: int = 0) -> dict:
+    # SVD truncada aleatorizada (Halko et al.): esboço Y = H Omega, iterações de potência
+    # para separar os valores singulares, SVD pequena de Q^T H. H é lido 2 * (power_iterations + 1) vezes.
+    # Fatores: Ut = U_k^T (k x m) e Vs = V_k diag(1/s) (n x k), em float32 como H.
+    m, n = H.shape
+    k = min(rank, m, n)
+    width = min(k + oversample, m, n)
+    rng = np.random.default_rng(seed)
+
+    Q, _ = np.linalg.qr(np.asarray(H @ rng.standard_normal((n, width)).astype(H.dtype), dtype=np.float64))
+    for _ in range(power_iterations):
+        Z, _ = np.linalg.qr(np.asarray(H.T @ Q.astype(H.dtype), dtype=np.float64))
+        Q, _ = np.linalg.qr(np.asarray(H @ Z.astype(H.dtype), dtype=np.float64))
+
+    B = np.asarray(H.T @ Q.astype(H.dtype), dtype=np.float64).T   # Q^T H (width x n)
+    Ub, s, Vt = np.linalg.svd(B, full_matrices=False)
+    s = s[:k]
+    # valores singulares nulos não entram na inversa
+    inv_s = np.divide(1.0, s, out=np.zeros_like(s), where=s > s[0] * 1e-12) if k else s
+
+    return {'Ut': (Q @ Ub[:, :k]).T.astype(np.float32),
+            'Vs': (Vt[:k].T * inv_s).astype(np.float32),
+            's': s}
+
+def reconstruct_tsvd(H: np.ndarray, g: np.ndarray, max_iterations: int, tol=None, min_iterations=0, Ut=None, Vs=None, s=None, rank=None, logger=None, stop=None, progress=None) -> tuple:
+    # f = V_r diag(1/s_r) U_r^T g com os r maiores valores singulares: dois produtos
+    # pequenos (r x m e n x r) em vez de iterar sobre H. Sem fatores, calcula aqui (caro).
+    # Devolve r no lugar das iterações; o erro relativo é o da projeção de g fora de
+    # span(U_r), ||g - U_r U_r^T g|| / ||g||, que não precisa ler H.
+    if Ut is None:
+        factors = compute_tsvd(H, rank or TSVD_RANK)
+        Ut, Vs = factors['Ut'], factors['Vs']
+
+    r = Ut.shape[0] if not rank else min(rank, Ut.shape[0])
+    g = np.asarray(g, dtype=np.float64).reshape(-1)
+    coefficients = Ut[:r] @ g
+    f = Vs[:, :r] @ coefficients
+
+    g_norm_sq = float(g @ g)
+    residual_sq = max(g_norm_sq - float(coefficients @ coefficients), 0.0)
+    final_error = np.sqrt(residual_sq) / (np.sqrt(g_norm_sq) + 1e-12)
+
+    if stop is not None:
+        stop.reason = "rank"
+    if logger is not None:
+        logger.info(f"TSVD: posto {r}, erro relativo {final_error:.3e}")
+    return f, r, final_error
+
+def _matmul(A, x, out):
+    # produto com saída num buffer; operadores que não são ndarray (QuantizedMatrix) têm matmul próprio
+    if isinstance(A, np.ndarray):
+        return np.matmul(A, x, out=out)
+    return A.matmul(x, out=out)
+
+def _low_precision_buffers(H):
+    # Vetores float64 da recorrência e cópias no dtype de H só para entrar nos produtos por H
+    m, n = H.shape
+    return {
+        'f': np.empty(n), 'p': np.empty(n), 'z': np.empty(n), 'r': np.empty(m), 'w': np.empty(m),
+        'x_low': np.empty(n, dtype=H.dtype), 'z_low': np.empty(n, dtype=H.dtype),
+        'r_low': np.empty(m, dtype=H.dtype), 'w_low': np.empty(m, dtype=H.dtype),
+    }
+
+def _apply_low(A, x, x_low, out_low, out):
+    # out = A @ x com o produto no dtype de A e o resultado de volta em float64
+    np.copyto(x_low, x, casting='same_kind')
+    _matmul(A, x_low, out=out_low)
+    np.copyto(out, out_low)
+    return out
+
+def _initial_residual_f32(H, g, f0, ws):
+    # f = f0 (ou zero) e r = g - H f, em float64
+    f, r = ws['f'], ws['r']
+    if f0 is None:
+        f.fill(0)
+        r[:] = g
+    else:
+        f[:] = np.reshape(f0, -1)
+        _apply_low(H, f, ws['x_low'], ws['w_low'], r)
+        np.subtract(g, r, out=r)
+
+def reconstruct_cgnr_f32(H: np.ndarray, g: np.ndarray, max_iterations: int, tol=5e-3, min_iterations=10, logger=None, stop=None, progress=None, f0=None) -> tuple:
+    # Mesmo CGNR, mas os produtos por H ficam no dtype de H (sem promover H para
+    # float64). A recorrência do resíduo e os produtos escalares seguem em float64:
+    # em float32 eles se perdem em poucas iterações quando H é mal condicionado.
+    # Nada é alocado dentro do laço.
+    ws = _low_precision_buffers(H)
+    f, p, z, r, w = ws['f'], ws['p'], ws['z'], ws['r'], ws['w']
+    Ht = H.T
+    g = np.asarray(g, dtype=np.float64).reshape(-1)
+
+    _initial_residual_f32(H, g, f0, ws)
+    _apply_low(Ht, r, ws['r_low'], ws['z_low'], z)
+    p[:] = z
+    initial_residual_norm = float(np.linalg.norm(g))
+    z_dot = float(np.dot(z, z))
+    min_div = 1e-12
+    if stop is None:
+        stop = StopCriteria(max_iterations, tol, min_iterations)
+    number_iterations = 0
+
+    if logger is not None:
+        logger.info(f"CGNR f32: tol={tol:.3e}")
+
+    for i in range(stop.max_iterations):
+        _apply_low(H, p, ws['x_low'], ws['w_low'], w)
+
+        alpha = z_dot / (float(np.dot(w, w)) + min_div)
+
+        # f += alpha * p  (z serve de rascunho antes de ser recalculado)
+        np.multiply(p, alpha, out=z)
+        f += z
+        # r -= alpha * w
+        w *= alpha
+        r -= w
+        _apply_low(Ht, r, ws['r_low'], ws['z_low'], z)
+
+        z_new_dot = float(np.dot(z, z))
+        beta = z_new_dot / (z_dot + min_div)
+        p *= beta
+        p += z
+        z_dot = z_new_dot
+
+        current_residual_norm = float(np.sqrt(np.dot(r, r)))
+        relative_error = current_residual_norm / (initial_residual_norm + min_div)
+
+        if logger is not None:
+            logger.info(
+                f"Iteracao {i + 1}: erro relativo = {relative_error:.6e}, residuo = {current_residual_norm:.3e}"
+            )
+
+        number_iterations = i + 1
+
+        if stop.done(number_iterations, relative_error):
+            if logger is not None:
+                logger.info(f"Parou ({stop.reason}) com erro relativo {relative_error:.2e}")
+            break
+
+        _emit_progress(progress, number_iterations, f, relative_error)
+
+    _apply_low(H, f, ws['x_low'], ws['w_low'], w)
+    np.subtract(g, w, out=w)
+    final_error = float(np.linalg.norm(w)) / (initial_residual_norm + min_div)
+    return f, number_iterations, final_error
+
+def reconstruct_cgne_f32(H: np.ndarray, g: np.ndarray, max_iterations: int, tol=1e-6, min_iterations=10, logger=None, stop=None, progress=None, f0=None) -> tuple:
+    # CGNE com os produtos por H no dtype de H e o resto em float64, um único H @ p por iteração
+    ws = _low_precision_buffers(H)
+    f, p, t, r, hp = ws['f'], ws['p'], ws['z'], ws['r'], ws['w']
+    Ht = H.T
+    g = np.asarray(g, dtype=np.float64).reshape(-1)
+
+    _initial_residual_f32(H, g, f0, ws)
+    _apply_low(Ht, r, ws['r_low'], ws['z_low'], p)
+    r_dot = float(np.dot(r, r))
+    initial_residual_norm = float(np.linalg.norm(g))
+    min_div = 1e-12
+    if stop is None:
+        stop = StopCriteria(max_iterations, tol, min_iterations)
+    final_iterations = 0
+
+    if logger is not None:
+        logger.info(f"CGNE f32: tol={tol:.3e}")
+
+    for i in range(stop.max_iterations):
+        _apply_low(H, p, ws['x_low'], ws['w_low'], hp)
+
+        alpha_den = float(np.dot(hp, hp)) + min_div
+        if alpha_den < min_div:
+            stop.reason = "breakdown"
+            break
+
+        alpha = r_dot / alpha_den
+        np.multiply(p, alpha, out=t)
+        f += t
+        hp *= alpha
+        r -= hp
+
+        r_new_dot = float(np.dot(r, r))
+        beta = r_new_dot / (r_dot + min_div)
+        _apply_low(Ht, r, ws['r_low'], ws['z_low'], t)
+        p *= beta
+        p += t
+        r_dot = r_new_dot
+
+        current_residual_norm = np.sqrt(r_dot)
+        relative_error = current_residual_norm / (initial_residual_norm + min_div)
+
+        if logger is not None:
+            logger.info(f"Iteracao {i + 1}: erro relativo = {relative_error:.6e}")
+
+        final_iterations = i + 1
+
+        if stop.done(final_iterations, relative_error, monotone=False):
+            if logger is not None:
+                logger.info(f"Parou ({stop.reason}) com erro relativo {relative_error:.2e}")
+            break
+
+        _emit_progress(progress, final_iterations, f, relative_error)
+
+    _apply_low(H, f, ws['x_low'], ws['w_low'], hp)
+    np.subtract(g, hp, out=hp)
+    final_error = float(np.linalg.norm(hp)) / (initial_residual_norm + min_div)
+    return f, final_iterations, final_error
+
+ALGORITHM = {
+    'cgne': reconstruct_cgne,
+    'cgnr': reconstruct_cgnr,
+    'cgne-f32': reconstruct_cgne_f32,
+    'cgnr-f32': reconstruct_cgnr_f32,
+    'pcgne': reconstruct_pcgne,
+    'pcgnr': reconstruct_pcgnr,
+    'tsvd': reconstruct_tsvd
+}
+
+# Variantes em bloco (vários sinais de uma vez) de cada algoritmo do ALGORITHM
+BLOCK_ALGORITHM = {
+    'cgne': reconstruct_cgne_block,
+    'cgnr': reconstruct_cgnr_block
+}
+
+PREVIEW_SIDE = 32   # lado máximo das prévias enviadas durante a reconstrução
+
+def encode_preview(f: np.ndarray, lado: int, max_side: int = PREVIEW_SIDE) -> bytes:
+    # prévia barata: imagem reduzida e com 16 tons de cinza (PNG bem menor que o final),
+    # montada direto de f, com um único PNG codificado
+    imagem = _grayscale_image(f, lado)
+    if lado > max_side:
+        imagem = imagem.resize((max_side, max_side), Image.BILINEAR)
+    imagem = imagem.quantize(16)
+
+    img_bytes = io.BytesIO()
+    imagem.save(img_bytes, format='PNG')
+    return img_bytes.getvalue()
+
+def encode_image(f: np.ndarray, lado: int) -> bytes:
+    imagem = _grayscale_image(f, lado)
+
+    #converte para bytes (PNG)
+    img_bytes = io.BytesIO()
+    imagem.save(img_bytes, format='PNG')
+    return img_bytes.getvalue()
+
+def _grayscale_image(f: np.ndarray, lado: int) -> Image.Image:
+    f = f.flatten()
+    f_min, f_max = f.min(), f.max()
+
+    #se forem iguais converte tudo para cinza
+    if f_max != f_min:
+        f_norm = (f - f_min) / (f_max - f_min) * 255
+    else:
+        f_norm = np.full_like(f, 128)
+
+    #converte o vetor para imagem quadrada
+    imagem_array = f_norm[:lado*lado].reshape((lado, lado), order='F')
+    imagem_array = np.clip(imagem_array, 0, 255)
+    return Image.fromarray(imagem_array.astype('uint8'))
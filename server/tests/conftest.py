@@ -0,0 +1,5 @@
+import os
+import sys
+
+# os módulos do servidor são importados pelo nome, como quando ele roda de server/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,55 @@
+import asyncio
+import queue
+import socket
+import threading
+
+from async_server import handle_connection
+from protocol import FRAME, MSG_REQUEST, MSG_RESULT, encode_frame
+
+
+def start_server(requests):
+    # servidor asyncio numa thread, numa porta livre
+    ready = threading.Event()
+    state = {}
+
+    async def main():
+        server = await asyncio.start_server(lambda r, w: handle_connection(r, w, requests, 4), "127.0.0.1", 0)
+        state["port"] = server.sockets[0].getsockname()[1]
+        state["loop"] = asyncio.get_running_loop()
+        ready.set()
+        async with server:
+            await server.serve_forever()
+
+    threading.Thread(target=asyncio.run, args=(main(),), daemon=True).start()
+    ready.wait(5)
+    return state
+
+
+def read_frame(f):
+    _, kind, request_id, header_len, body_len = FRAME.unpack(f.read(FRAME.size))
+    f.read(header_len)
+    return kind, request_id, f.read(body_len)
+
+
+def test_worker_espera_o_cliente_que_nao_le():
+    requests = queue.Queue()
+    state = start_server(requests)
+    client = socket.create_connection(("127.0.0.1", state["port"]))
+    client.sendall(b'3_|u|{"versions": [1]}\n')
+    f = client.makefile("rb")
+    f.readline()
+    client.sendall(b"".join(encode_frame(MSG_REQUEST, 1, {"idx": 0})))
+    conn = requests.get(timeout=5)["client"]
+
+    image = b"x" * (64 * 1024**2)   # maior que os buffers do kernel
+    worker = threading.Thread(target=conn.send_result, args=({"idx": 0}, image, 1))
+    worker.start()
+    worker.join(1)
+    # o cliente não leu: o worker segue esperando o drain
+    assert worker.is_alive()
+
+    kind, request_id, body = read_frame(f)
+    worker.join(5)
+    assert not worker.is_alive()
+    assert (kind, request_id, len(body)) == (MSG_RESULT, 1, len(image))
+    client.close()
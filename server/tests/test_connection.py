@@ -0,0 +1,60 @@
+import json
+
+from connection import _Connection, sendmsg_all
+from protocol import FRAME, MSG_ERROR, MSG_RESULT
+
+
+class Recorder(_Connection):
+    # conexão sem socket: guarda os quadros enviados
+    def __init__(self, window):
+        super().__init__()
+        self.sent = []
+        self.negotiate({"protocol": 1}, window)
+        self.sent.clear()
+
+    def send_buffers(self, buffers):
+        self.sent.append(b"".join(buffers))
+
+    def frames(self):
+        out = []
+        for data in self.sent:
+            _, kind, request_id, header_len, _ = FRAME.unpack_from(data)
+            out.append((kind, request_id, json.loads(data[FRAME.size:FRAME.size + header_len])))
+        return out
+
+
+def test_id_duplicado_e_recusado_sem_afetar_o_original():
+    conn = Recorder(4)
+    assert conn.admit(7)
+    assert not conn.admit(7)
+    kind, request_id, header = conn.frames()[-1]
+    assert (kind, request_id, header["rejected"]) == (MSG_ERROR, 7, "duplicate")
+
+    # o original continua em aberto e recebe a resposta; depois o id pode voltar
+    conn.send_result({"idx": 0}, b"png", 7)
+    assert conn.frames()[-1][:2] == (MSG_RESULT, 7)
+    assert conn.admit(7)
+
+
+def test_janela_cheia():
+    conn = Recorder(2)
+    assert conn.admit(1) and conn.admit(2)
+    assert not conn.admit(3)
+    assert conn.frames()[-1][2]["rejected"] == "window"
+    conn.send_error({"error": "x"}, 1)
+    assert conn.admit(3)
+
+
+class WindowsSocket:
+    # socket sem sendmsg, como no Windows
+    def __init__(self):
+        self.data = b""
+
+    def sendall(self, data):
+        self.data += data
+
+
+def test_sem_sendmsg_envia_com_sendall():
+    sock = WindowsSocket()
+    sendmsg_all(sock, [b"ab", memoryview(b"cd"), b""])
+    assert sock.data == b"abcd"
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from solvers import ALGORITHM, StopCriteria
+
+
+def system(offset):
+    # H float32 com uma componente comum grande (mal condicionado para offset alto)
+    rng = np.random.default_rng(0)
+    H = (rng.random((1500, 200)) + offset).astype(np.float32)
+    g = (H @ rng.random(200)).astype(np.float32)
+    return H, g
+
+
+def residual(H, g, f):
+    return np.linalg.norm(g - H.astype(np.float64) @ f) / np.linalg.norm(g)
+
+
+@pytest.mark.parametrize("offset", [0, 20, 1000])
+def test_cgne_f32_acompanha_o_float64(offset):
+    H, g = system(offset)
+    f64 = ALGORITHM['cgne'](H, g, 20, stop=StopCriteria(20))[0]
+    f32 = ALGORITHM['cgne-f32'](H, g, 20, stop=StopCriteria(20))[0]
+    assert np.all(np.isfinite(f32))
+    assert np.linalg.norm(f32 - f64) / np.linalg.norm(f64) < 1e-5
+
+
+@pytest.mark.parametrize("offset", [0, 20, 100])
+def test_cgnr_f32_chega_ao_mesmo_residuo(offset):
+    H, g = system(offset)
+    f64 = ALGORITHM['cgnr'](H, g, 20, stop=StopCriteria(20))[0]
+    f32 = ALGORITHM['cgnr-f32'](H, g, 20, stop=StopCriteria(20))[0]
+    assert residual(H, g, f32) < max(3 * residual(H, g, f64), 1e-6)
+    assert np.linalg.norm(f32 - f64) / np.linalg.norm(f64) < 1e-3
+
+
+def test_chamadas_seguidas_nao_compartilham_a_solucao():
+    H, g = system(0)
+    first = ALGORITHM['cgnr-f32'](H, g, 5, stop=StopCriteria(5))[0]
+    kept = first.copy()
+    ALGORITHM['cgnr-f32'](H, 2 * g, 5, stop=StopCriteria(5))
+    assert np.array_equal(first, kept)
@@ -0,0 +1,16 @@
+from server import group_batch
+
+
+def item(username, algorithm="cgnr", stream=False):
+    return {"payload": {"username": username, "model": "m", "algorithm": algorithm,
+                        "signal": "g", "stream": stream}}
+
+
+def test_lote_so_junta_pedidos_do_mesmo_usuario():
+    a1, b1, a2 = item("a"), item("b"), item("a")
+    assert group_batch([a1, b1, a2]) == [[a1, a2], [b1]]
+
+
+def test_pedidos_com_previas_seguem_sozinhos():
+    a1, a2 = item("a", stream=True), item("a", stream=True)
+    assert group_batch([a1, a2]) == [[a1], [a2]]
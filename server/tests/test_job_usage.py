@@ -0,0 +1,26 @@
+from threading import Thread
+from time import perf_counter, sleep
+
+from resource_sampler import measure_job
+
+
+def spin(seconds):
+    end = perf_counter() + seconds
+    while perf_counter() < end:
+        pass
+
+
+def test_por_thread_nao_conta_a_cpu_dos_outros_jobs():
+    other = Thread(target=spin, args=(0.4,))
+    other.start()
+    result, usage = measure_job(lambda: sleep(0.2) or "ok", per_thread=True)
+    other.join()
+    assert result == "ok"
+    assert usage.wall >= 0.2
+    assert usage.cpu < 0.05
+
+
+def test_processo_conta_a_cpu_do_kernel():
+    _, usage = measure_job(lambda: spin(0.1))
+    assert usage.cpu > 0.05
+    assert usage.rss >= 0
@@ -0,0 +1,78 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+
+from model_registry import ModelRegistry
+from solver_pool import SharedModelStore
+
+
+def loader(path):
+    H = np.ones((10, 10))   # 800 bytes
+    return H, SimpleNamespace(checksum=path, side=3, shape=H.shape)
+
+
+def model_file(tmp_path, name):
+    path = tmp_path / name
+    path.write_text("x")
+    return str(path)
+
+
+def registry(max_bytes, evicted):
+    return ModelRegistry(max_bytes, loader=loader, resolver=lambda path: path, on_evict=evicted.append)
+
+
+def test_on_evict_recebe_o_modelo_descartado_pelo_orcamento(tmp_path):
+    evicted = []
+    models = registry(1000, evicted)
+    a = models.get(model_file(tmp_path, "a"))
+    models.get(model_file(tmp_path, "b"))
+    assert evicted == [a]
+    assert models.stats()["evictions"] == 1
+
+
+def test_on_evict_recebe_a_versao_antiga_do_arquivo(tmp_path):
+    evicted = []
+    models = registry(10**6, evicted)
+    path = model_file(tmp_path, "a")
+    old = models.get(path)
+    os.utime(path, ns=(0, old.mtime + 10**9))
+    new = models.get(path)
+    assert new is not old
+    assert evicted == [old]
+
+
+def segment_names():
+    return set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else None
+
+
+def test_release_remove_os_segmentos_depois_da_ultima_tarefa():
+    store = SharedModelStore()
+    entry = SimpleNamespace(path="/m", mtime=1, H=np.arange(12.0).reshape(3, 4))
+    name = store.publish(entry)["H"][0]
+    store.release(entry.path, entry.mtime)   # ainda em uso: fica
+    if segment_names() is not None:
+        assert name in segment_names()
+    assert name not in store.released()
+
+    store.done(entry)
+    assert name in store.released()
+    if segment_names() is not None:
+        assert name not in segment_names()
+
+    # uma nova publicação do mesmo modelo cria segmentos novos
+    again = store.publish(entry)["H"][0]
+    assert again != name
+    store.done(entry)
+    store.close()
+
+
+def test_release_ignora_outra_versao_do_arquivo():
+    store = SharedModelStore()
+    entry = SimpleNamespace(path="/m", mtime=2, H=np.ones((2, 2)))
+    name = store.publish(entry)["H"][0]
+    store.done(entry)
+    store.release(entry.path, 1)
+    assert name not in store.released()
+    store.close()
+    assert name in store.released()
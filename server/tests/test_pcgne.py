@@ -0,0 +1,37 @@
+import numpy as np
+
+from solvers import StopCriteria, reconstruct_pcgne
+
+
+def tall_system(noise):
+    rng = np.random.default_rng(1)
+    H = rng.random((300, 40))
+    g = H @ rng.random(40) + noise * rng.standard_normal(300)
+    return H, g
+
+
+def test_sistema_consistente_converge():
+    H, g = tall_system(0.0)
+    stop = StopCriteria(200, tol=1e-8)
+    f, iters, error = reconstruct_pcgne(H, g, 200, stop=stop)
+    assert stop.reason == "tolerance"
+    assert error < 1e-7
+
+
+def test_sistema_inconsistente_para_por_divergencia_com_o_melhor_iterado():
+    H, g = tall_system(1.0)
+    stop = StopCriteria(200, tol=1e-8)
+    errors = []
+    f, iters, error = reconstruct_pcgne(H, g, 200, stop=stop,
+                                        progress=lambda it, f, e: errors.append(e))
+    assert stop.reason == "divergence"
+    assert iters < 200
+    # devolve o iterado de menor resíduo, não o último
+    assert error <= min(errors) * (1 + 1e-9)
+
+
+def test_residuo_subindo_nao_vira_estagnacao():
+    H, g = tall_system(1.0)
+    stop = StopCriteria(200, tol=1e-8, min_iterations=3, stagnation=0.005)
+    f, iters, error = reconstruct_pcgne(H, g, 200, stop=stop)
+    assert stop.reason == "divergence"
@@ -0,0 +1,32 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from solvers import PREVIEW_SIDE, StopCriteria, encode_image, encode_preview, reconstruct_cgnr
+
+
+def test_previa_reduzida_e_com_16_tons():
+    f = np.random.default_rng(0).random(60 * 60)
+    preview = Image.open(io.BytesIO(encode_preview(f, 60)))
+    assert preview.size == (PREVIEW_SIDE, PREVIEW_SIDE)
+    assert len(preview.getcolors()) <= 16
+    assert len(encode_preview(f, 60)) < len(encode_image(f, 60))
+
+
+def test_previa_de_modelo_pequeno_mantem_o_lado():
+    f = np.arange(25.0)
+    assert Image.open(io.BytesIO(encode_preview(f, 5))).size == (5, 5)
+
+
+def test_progress_a_cada_iteracao():
+    rng = np.random.default_rng(0)
+    H = rng.random((50, 10))
+    g = H @ rng.random(10)
+    seen = []
+    _, iters, _ = reconstruct_cgnr(H, g, 5, stop=StopCriteria(5),
+                                   progress=lambda it, f, e: seen.append((it, f.copy(), e)))
+    # sem critério atingido, o laço acaba pelo teto e cada iteração gera uma prévia
+    assert [it for it, _, _ in seen] == list(range(1, iters + 1))
+    errors = [e for _, _, e in seen]
+    assert errors == sorted(errors, reverse=True)
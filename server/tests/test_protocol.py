@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from protocol import (FRAME, MSG_EXIT, MSG_REQUEST, MSG_RESULT, PROTOCOL_VERSION, MessageBuffer, encode_frame,
+                      encode_request)
+
+
+def binary_buffer():
+    buffer = MessageBuffer()
+    assert buffer.feed(b'3_|u|{"versions": [1]}\n')[0].kind == "HELLO"
+    assert buffer.binary
+    return buffer
+
+
+def test_texto_em_pedacos_e_varias_mensagens_juntas():
+    data = encode_request("u", {"algorithm": "cgnr", "idx": 0}) + encode_request("u", {"algorithm": "cgne", "idx": 1})
+    buffer = MessageBuffer()
+    assert buffer.feed(data[:10]) == []
+    messages = buffer.feed(data[10:])
+    assert [m.payload["algorithm"] for m in messages] == ["cgnr", "cgne"]
+    assert all(m.kind == "2_" and m.username == "u" for m in messages)
+
+
+def test_texto_que_nao_e_objeto_e_descartado():
+    buffer = MessageBuffer()
+    messages = buffer.feed(b'2_|u|[1, 2]\n' + encode_request("u", {"idx": 3}))
+    assert [m.payload for m in messages] == [{"idx": 3}]
+
+
+def test_hello_sem_versao_suportada_continua_em_texto():
+    buffer = MessageBuffer()
+    hello = buffer.feed(b'3_|u|{"versions": [99]}\n')[0]
+    assert hello.payload == {"protocol": None}
+    assert not buffer.binary
+
+
+def test_quadro_binario_com_corpo_e_id():
+    buffer = binary_buffer()
+    frame = b"".join(encode_frame(MSG_REQUEST, 7, {"username": "u", "idx": 1}, b"\x00\x01\x02\x03"))
+    assert buffer.feed(frame[:FRAME.size + 2]) == []
+    message, = buffer.feed(frame[FRAME.size + 2:])
+    assert (message.kind, message.request_id, message.body) == ("2_", 7, b"\x00\x01\x02\x03")
+    assert message.payload == {"username": "u", "idx": 1}
+
+
+def test_exit_descarta_o_resto():
+    buffer = binary_buffer()
+    data = b"".join(encode_frame(MSG_EXIT, 0, {"username": "u"}) + encode_frame(MSG_REQUEST, 1, {}))
+    assert [m.kind for m in buffer.feed(data)] == ["EXIT"]
+
+
+def test_tipo_desconhecido_e_ignorado():
+    buffer = binary_buffer()
+    data = b"".join(encode_frame(MSG_RESULT, 1, {}) + encode_frame(MSG_REQUEST, 2, {"idx": 2}))
+    assert [m.request_id for m in buffer.feed(data)] == [2]
+
+
+def test_header_que_nao_e_objeto_e_rejeitado():
+    buffer = binary_buffer()
+    header = json.dumps([1, 2]).encode()
+    with pytest.raises(ValueError):
+        buffer.feed(FRAME.pack(PROTOCOL_VERSION, MSG_REQUEST, 1, len(header), 0) + header)
+
+
+def test_versao_errada_e_rejeitada():
+    buffer = binary_buffer()
+    with pytest.raises(ValueError):
+        buffer.feed(FRAME.pack(PROTOCOL_VERSION + 1, MSG_REQUEST, 1, 0, 0))
@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+
+from result_cache import ResultCache
+
+
+def key(i):
+    return ResultCache.make_key(1, np.array([float(i)]), "cgnr", 1e-4, 50)
+
+
+def age(cache, k, seconds):
+    # recua o mtime do header: a entrada passa a ter sido usada há `seconds`
+    path = os.path.join(cache.directory, k[:2], k + ".json")
+    mtime = os.path.getmtime(path) - seconds
+    os.utime(path, (mtime, mtime))
+
+
+def test_disco_sobrevive_a_um_cache_novo(tmp_path):
+    ResultCache(str(tmp_path)).put(key(0), {"iters": 3}, b"png")
+    cache = ResultCache(str(tmp_path))
+    assert cache.get(key(0)) == ({"iters": 3}, b"png")
+    assert cache.stats()["disk_hits"] == 1
+    assert cache.get(key(1)) is None
+
+
+def test_limite_do_disco_apaga_os_usados_ha_mais_tempo(tmp_path):
+    png = b"x" * 1000
+    cache = ResultCache(str(tmp_path), max_items=1, max_disk_bytes=3500)
+    for i in range(3):
+        cache.put(key(i), {"i": i}, png)
+        age(cache, key(i), 100 - i)
+    # a entrada 0 é a mais antiga, mas um acerto a renova
+    assert ResultCache(str(tmp_path)).get(key(0)) is not None
+
+    cache.put(key(3), {"i": 3}, png)
+    fresh = ResultCache(str(tmp_path))
+    assert fresh.get(key(1)) is None
+    assert fresh.get(key(0)) is not None
+    assert fresh.get(key(3)) is not None
+    assert cache.stats()["pruned"] >= 1
+    assert cache.stats()["disk_bytes"] <= 3500 * ResultCache.PRUNE_TARGET
+
+
+def test_contagem_inicial_do_disco(tmp_path):
+    ResultCache(str(tmp_path)).put(key(0), {}, b"x" * 100)
+    assert ResultCache(str(tmp_path)).stats()["disk_bytes"] == 102
@@ -0,0 +1,118 @@
+import pytest
+
+from scheduler import AdmissionScheduler, earliest_deadline_first, shortest_expected_first
+
+
+def cost(time=1.0, cpu=60.0, mem=1.0):
+    # cpu=60 de um limite de 100: só um job por vez, sem depender de max_running (que também é o cap)
+    return {"cpu": cpu, "mem": mem, "time": time}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make(max_running=8, usage=(0.0, 0.0), **kwargs):
+    started = []
+    scheduler = AdmissionScheduler(lambda job, ticket: started.append((job, ticket)), lambda: usage, 100.0, 100.0,
+                                   max_running, clock=kwargs.pop("clock", Clock()), **kwargs)
+    return scheduler, started
+
+
+def run_all(scheduler, started):
+    # um job por vez: admite, termina, admite o próximo
+    order = []
+    while scheduler.poll() or started:
+        job, ticket = started.pop(0)
+        order.append(job)
+        scheduler.finish(ticket)
+    return order
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"weights": {"a": 0}}, {"weights": {"a": -1}}, {"caps": {"a": 0}}, {"quantum": 0}, {"max_running": 0},
+])
+def test_parametros_que_travariam_a_fila_sao_rejeitados(kwargs):
+    with pytest.raises(ValueError):
+        make(**kwargs)
+
+
+def test_usuarios_alternam_mesmo_com_chegada_em_rajada():
+    scheduler, started = make()
+    for i in range(3):
+        scheduler.submit(f"a{i}", cost(), user="a")
+    for i in range(3):
+        scheduler.submit(f"b{i}", cost(), user="b")
+    assert run_all(scheduler, started) == ["a0", "b0", "a1", "b1", "a2", "b2"]
+
+
+def test_peso_dobra_a_parte_do_usuario():
+    scheduler, started = make(weights={"a": 2})
+    for i in range(4):
+        scheduler.submit(f"a{i}", cost(), user="a")
+    for i in range(2):
+        scheduler.submit(f"b{i}", cost(), user="b")
+    assert run_all(scheduler, started) == ["a0", "a1", "b0", "a2", "a3", "b1"]
+
+
+def test_jobs_pesados_nao_atrasam_os_leves_de_outro_usuario():
+    scheduler, started = make()
+    for i in range(2):
+        scheduler.submit(f"pesado{i}", cost(time=4.0), user="a")
+    for i in range(4):
+        scheduler.submit(f"leve{i}", cost(time=0.25), user="b")
+    order = run_all(scheduler, started)
+    assert order.index("leve3") < order.index("pesado0")
+
+
+def test_cap_limita_jobs_simultaneos_do_usuario():
+    scheduler, started = make(max_running=4, caps={"a": 1})
+    for i in range(3):
+        scheduler.submit(f"a{i}", cost(cpu=1.0), user="a")
+    scheduler.submit("b0", cost(cpu=1.0), user="b")
+    scheduler.poll()
+    assert sorted(job for job, _ in started) == ["a0", "b0"]
+
+
+def test_orcamento_de_memoria_segura_o_proximo_job():
+    scheduler, started = make(max_running=4, usage=(0.0, 80.0))
+    scheduler.submit("a0", cost(cpu=1.0, mem=30.0), user="a")
+    scheduler.submit("a1", cost(cpu=1.0, mem=30.0), user="a")
+    # sem nada rodando o primeiro entra sempre; o segundo passaria do limite de memória
+    assert scheduler.poll() == 1
+    scheduler.finish(started.pop()[1])
+    assert scheduler.poll() == 1
+
+
+def test_edf_ordena_pelo_prazo_e_sem_prazo_vai_para_o_fim():
+    scheduler, started = make(policy=earliest_deadline_first)
+    scheduler.submit("sem", cost(), user="a")
+    scheduler.submit("tarde", cost(), user="a", deadline=20.0)
+    scheduler.submit("cedo", cost(), user="a", deadline=10.0)
+    assert run_all(scheduler, started) == ["cedo", "tarde", "sem"]
+
+
+def test_sef_envelhecimento_deixa_o_antigo_passar():
+    clock = Clock()
+    scheduler, started = make(policy=shortest_expected_first, clock=clock)
+    scheduler.submit("longo", cost(time=2.0), user="a")
+    clock.now = 1.0
+    scheduler.submit("curto", cost(time=1.0), user="a")
+    clock.now = 10.0
+    scheduler.submit("tardio", cost(time=0.5), user="a")
+    # chave = tempo + 0,5 x chegada: longo 2,0, curto 1,5, tardio 5,5
+    assert run_all(scheduler, started) == ["curto", "longo", "tardio"]
+
+
+def test_estatisticas_de_espera():
+    clock = Clock()
+    scheduler, started = make(clock=clock)
+    scheduler.submit("a0", cost(), user="a")
+    clock.now = 2.0
+    scheduler.poll()
+    users = scheduler.stats()["users"]
+    assert users["a"]["admitted"] == 1 and users["a"]["wait_max"] == 2.0
@@ -0,0 +1,77 @@
+from time import sleep, time
+
+import numpy as np
+
+from solvers import StopCriteria
+
+
+def test_tolerancia_so_depois_do_minimo_de_iteracoes():
+    stop = StopCriteria(50, tol=1e-3, min_iterations=3)
+    assert not stop.done(1, 1e-5)
+    assert not stop.done(2, 1e-6)
+    assert stop.done(3, 1e-7)
+    assert stop.reason == "tolerance"
+
+
+def test_estagnacao():
+    stop = StopCriteria(50, tol=1e-9, stagnation=0.01, window=3)
+    assert not stop.done(1, 1.0)
+    assert not stop.done(2, 0.5)
+    assert not stop.done(3, 0.499)
+    assert not stop.done(4, 0.498)
+    # menos de 1% de melhora em 3 iterações (0,5 -> 0,497)
+    assert stop.done(5, 0.497)
+    assert stop.reason == "stagnation"
+
+
+def test_plato_curto_do_cg_nao_para():
+    # platô de três iterações em 6e-3 antes de o CG voltar a cair
+    errors = [0.5, 0.1, 0.03, 0.01, 0.007, 0.0061, 0.0060, 0.00599, 0.00598, 0.004, 0.002, 0.001]
+    stop = StopCriteria(50, tol=1e-4, min_iterations=3, stagnation=0.005)
+    assert not any(stop.done(i, e) for i, e in enumerate(errors, 1))
+
+
+def test_estagnacao_olha_o_melhor_erro_e_nao_o_ultimo():
+    # descer de um pico (2,0 -> 1,5) não é melhora: o melhor erro segue em 0,5
+    stop = StopCriteria(50, min_iterations=4, stagnation=0.005, window=1)
+    assert not any(stop.done(i, e) for i, e in enumerate([1.0, 0.5, 2.0], 1))
+    assert stop.done(4, 1.5)
+    assert stop.reason == "stagnation"
+
+
+def test_residuo_nao_monotono_nao_estagna():
+    stop = StopCriteria(50, stagnation=0.005, window=2)
+    assert not any(stop.done(i, e, monotone=False) for i, e in enumerate([1.0, 1.2, 1.1, 1.1, 0.9], 1))
+
+
+def test_sem_criterio_atingido_o_motivo_e_o_teto():
+    stop = StopCriteria(5, tol=1e-9)
+    assert not any(stop.done(i, 1.0 / i) for i in range(1, 6))
+    assert stop.reason == "max_iterations"
+
+
+def test_prazo_pela_duracao_da_iteracao_anterior():
+    stop = StopCriteria(50, deadline=time() + 0.15)
+    stop.start()
+    sleep(0.1)
+    # a próxima iteração (~0,1 s) terminaria depois do prazo
+    assert stop.done(1, 1.0)
+    assert stop.reason == "deadline"
+
+
+def test_start_descarta_o_tempo_de_pre_calculo():
+    stop = StopCriteria(50, deadline=time() + 0.15)
+    sleep(0.1)   # ex.: gram ou precondicionador calculados antes do kernel
+    stop.start()
+    assert not stop.done(1, 1.0)
+
+
+def test_bloco_motivo_por_coluna():
+    stop = StopCriteria(50, tol=1e-3, stagnation=0.01, window=1)
+    columns = np.arange(3)
+    assert stop.done_block(1, columns, np.array([1.0, 1.0, 1e-4])).tolist() == [False, False, True]
+    assert stop.reason_of(2) == "tolerance"
+    stopped = stop.done_block(2, columns[:2], np.array([0.5, 0.999]))
+    assert stopped.tolist() == [False, True]
+    assert stop.reason_of(1) == "stagnation"
+    assert stop.reason_of(0) == "max_iterations"
@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+
+from solvers import TSVD_RANK, compute_tsvd, reconstruct_tsvd, tsvd_rank
+
+
+def test_posto_limitado_aos_fatores_guardados():
+    assert tsvd_rank((100, 25)) == 25
+    assert tsvd_rank((100, 25), 300) == 25
+    assert tsvd_rank((100, 25), 10) == 10
+    assert tsvd_rank((10**4, 10**4)) == TSVD_RANK
+
+
+@pytest.mark.parametrize("rank", [0, 3, 25, 300])
+def test_posto_normalizado_e_o_que_o_kernel_usa(rank):
+    H = np.random.default_rng(0).random((60, 25)).astype(np.float32)
+    factors = compute_tsvd(H)
+    g = H @ np.ones(25, dtype=np.float32)
+    _, used, _ = reconstruct_tsvd(H, g, 0, rank=rank or None, **factors)
+    assert used == tsvd_rank(H.shape, rank)
@@ -0,0 +1,38 @@
+import numpy as np
+
+from warm_start import WarmStartStore, warm_start_family
+
+
+def test_familias():
+    assert warm_start_family('CGNR') == warm_start_family('cgnr-f32') == warm_start_family('pcgnr') == 'cgnr'
+    assert warm_start_family('cgne') is None
+    assert warm_start_family('pcgne') is None
+    assert warm_start_family('tsvd') is None
+
+
+def test_chute_escalado_do_sinal_parecido():
+    store = WarmStartStore()
+    g = np.linspace(1, 2, 1000)
+    f = np.arange(10, dtype=np.float64)
+    store.record('m', 'cgnr', g, f)
+    guess = store.guess('m', 'cgnr', 3 * g)
+    assert np.allclose(guess, 3 * f, rtol=1e-5)
+    assert store.stats()["hits"] == 1
+
+
+def test_chute_nao_cruza_modelo_nem_familia():
+    store = WarmStartStore()
+    g = np.linspace(1, 2, 1000)
+    store.record('m', 'cgnr', g, np.ones(10))
+    assert store.guess('m', 'outra', g) is None
+    assert store.guess('outro', 'cgnr', g) is None
+
+
+def test_iteracoes_poupadas_pela_media_das_partidas_do_zero():
+    store = WarmStartStore()
+    assert store.iterations_saved('m', 'cgnr', 'cgnr', 1e-4, 3) == 0
+    store.record_cold('m', 'cgnr', 'cgnr', 1e-4, 10)
+    store.record_cold('m', 'cgnr', 'cgnr', 1e-4, 14)
+    assert store.iterations_saved('m', 'cgnr', 'cgnr', 1e-4, 3) == 9
+    assert store.iterations_saved('m', 'cgnr', 'cgnr', 1e-3, 3) == 0
+    assert store.iterations_saved('m', 'cgnr', 'cgnr', 1e-4, 20) == 0
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Relatório de validação do H quantizado (--quantize do servidor): erro da
+reconstrução com int8/float16 comparado ao caminho float32.
+
+Uso:
+    python validar_quantizacao.py models/model-30x30.csv                 # sinais ../client/signals/signal-30x30-*.csv
+    python validar_quantizacao.py models/model-60x60.hmdl -a cgnr cgne -i 10
+    python validar_quantizacao.py --escala 0.25                          # sintético
+
+Para cada modelo e modo informa a memória de H e, por algoritmo (médias dos
+sinais, mesmo número de iterações nos dois caminhos):
+  - resíduo ||g - Hf|| / ||g|| medido sempre com o H float32;
+  - distância relativa ||f_q - f|| / ||f|| à reconstrução float32;
+  - maior diferença entre as imagens finais (tons de cinza, 0-255);
+  - tempo por reconstrução.
+"""
+
+import argparse
+import io
+import sys
+from time import perf_counter
+
+import numpy as np
+from PIL import Image
+
+from bench_precond import sinais_do_modelo
+from model_format import load_model
+from quantized import QUANT_MODES, QuantizedMatrix
+from solvers import ALGORITHM, StopCriteria, encode_image
+
+SINTETICOS = {
+    '30x30': (27904, 900),
+    '60x60': (50816, 3600),
+}
+
+
+def carregar(nome, escala, rng):
+    if nome in SINTETICOS:
+        linhas, colunas = SINTETICOS[nome]
+        linhas, colunas = max(int(linhas * escala), 1), max(int(colunas * escala), 1)
+        return f"sintético {nome} ({linhas}x{colunas})", rng.random((linhas, colunas), dtype=np.float32), \
+            int(np.sqrt(colunas))
+
+    H, info = load_model(nome)
+    return f"{nome} {info.shape}", H, info.side
+
+
+def pixels(f, lado):
+    return np.asarray(Image.open(io.BytesIO(encode_image(f, lado))), dtype=np.int16)
+
+
+def reconstruir(H, g, algoritmo, iteracoes):
+    # sem tolerância: os dois caminhos fazem as mesmas iterações
+    inicio = perf_counter()
+    f, _, _ = ALGORITHM[algoritmo](H, g, iteracoes, stop=StopCriteria(iteracoes))
+    return np.asarray(f, dtype=np.float64).reshape(-1), perf_counter() - inicio
+
+
+def validar(nome, H, lado, sinais, args):
+    print(f"\n== {nome}: {len(sinais)} sinal(is), {args.iteracoes} iterações")
+    referencia = {}
+    for algoritmo in args.algoritmos:
+        referencia[algoritmo] = [reconstruir(H, g, algoritmo, args.iteracoes) for g in sinais]
+
+    def residuo(g, f):
+        return np.linalg.norm(g - H @ f.astype(np.float32)) / np.linalg.norm(g)
+
+    print(f"{'modo':>8} {'algoritmo':>10} {'H (MB)':>8} {'resíduo':>10} {'dist. f32':>10} {'máx. px':>8} {'tempo (s)':>10}")
+    for algoritmo in args.algoritmos:
+        resultados = referencia[algoritmo]
+        print(f"{'float32':>8} {algoritmo:>10} {H.nbytes / 1024**2:>8.1f} "
+              f"{np.mean([residuo(g, f) for g, (f, _) in zip(sinais, resultados)]):>10.3e} "
+              f"{'-':>10} {'-':>8} {np.mean([t for _, t in resultados]):>10.3f}")
+
+    for modo in args.modos:
+        Q = QuantizedMatrix.quantize(H, modo)
+        for algoritmo in args.algoritmos:
+            residuos, distancias, pixels_max, tempos = [], [], [], []
+            for g, (f_ref, _) in zip(sinais, referencia[algoritmo]):
+                f, tempo = reconstruir(Q, g, algoritmo, args.iteracoes)
+                residuos.append(residuo(g, f))
+                distancias.append(np.linalg.norm(f - f_ref) / (np.linalg.norm(f_ref) + 1e-12))
+                pixels_max.append(np.abs(pixels(f, lado) - pixels(f_ref, lado)).max())
+                tempos.append(tempo)
+
+            print(f"{modo:>8} {algoritmo:>10} {Q.nbytes / 1024**2:>8.1f} {np.mean(residuos):>10.3e} "
+                  f"{np.mean(distancias):>10.3e} {max(pixels_max):>8} {np.mean(tempos):>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validação do H quantizado contra o float32")
+    parser.add_argument("modelos", nargs="*", default=list(SINTETICOS),
+                        help="arquivos de modelo (.csv/.hmdl) ou 30x30/60x60 para sintéticos")
+    parser.add_argument("--sinais", nargs="+", help="arquivos de sinal (padrão: os do projeto para o tamanho do modelo)")
+    parser.add_argument("-a", "--algoritmos", nargs="+", choices=sorted(ALGORITHM), default=["cgnr", "cgne", "cgnr-f32"])
+    parser.add_argument("-m", "--modos", nargs="+", choices=QUANT_MODES, default=list(QUANT_MODES))
+    parser.add_argument("-i", "--iteracoes", type=int, default=10)
+    parser.add_argument("--escala", type=float, default=1.0, help="fator de tamanho dos modelos sintéticos")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for modelo in args.modelos:
+        nome, H, lado = carregar(modelo, args.escala, rng)
+        validar(nome, H, lado, sinais_do_modelo(modelo, args.sinais, H, rng), args)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
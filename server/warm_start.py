@@ -0,0 +1,113 @@
+from collections import OrderedDict, deque
+from threading import Lock
+import numpy as np
+
+WARM_START_ITEMS = 16          # soluções recentes guardadas por modelo
+WARM_START_MODELS = 8          # modelos com soluções guardadas (o menos usado sai)
+WARM_START_BINS = 256          # tamanho da impressão digital do sinal
+WARM_START_SIMILARITY = 0.98   # cosseno mínimo entre impressões para usar o chute
+
+# Família de cada algoritmo que aceita chute: soluções só são trocadas dentro da
+# mesma família. CGNE/Craig (cgne, cgne-f32, pcgne) não entra: partindo de f0 ele
+# converge para f0 mais a correção de norma mínima, e não para a solução que a
+# partida do zero daria, então o chute muda o resultado em vez de só acelerá-lo.
+WARM_START_FAMILY = {'cgnr': 'cgnr', 'cgnr-f32': 'cgnr', 'pcgnr': 'cgnr'}
+
+
+def warm_start_family(algorithm):
+    # família do algoritmo, ou None se ele não usa chute inicial
+    return WARM_START_FAMILY.get(algorithm.lower())
+
+
+class WarmStartStore:
+    """Soluções recentes de cada modelo, usadas como chute inicial (f0) dos solvers.
+
+    Cada sinal é resumido em WARM_START_BINS somas de trechos consecutivos.
+    O chute para um sinal novo é a solução do sinal guardado de impressão mais
+    parecida (cosseno), escalada pelo fator que melhor aproxima uma impressão
+    da outra: o sistema é linear, então g' ~ a g vira f0 = a f.
+
+    As soluções ficam separadas por modelo e família de algoritmo (warm_start_family):
+    a solução de um CGNE não serve de chute para um CGNR.
+
+    Também guarda, por algoritmo/tolerância, a média de iterações das
+    reconstruções que partiram do zero: é a referência das iterações poupadas.
+    """
+
+    def __init__(self, max_items=WARM_START_ITEMS, max_models=WARM_START_MODELS,
+                 min_similarity=WARM_START_SIMILARITY):
+        self.max_items = max_items
+        self.max_models = max_models
+        self.min_similarity = min_similarity
+        self.__models = OrderedDict()   # (checksum do modelo, família) -> {"solutions": deque, "cold": {}}
+        self.__lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def fingerprint(g):
+        g = np.asarray(g, dtype=np.float64).reshape(-1)
+        edges = np.unique(np.linspace(0, len(g), WARM_START_BINS, endpoint=False).astype(int))
+        return np.add.reduceat(g, edges) if len(g) else g
+
+    def guess(self, checksum, family, g):
+        # chute para g (ou None): solução do sinal mais parecido, na escala de g
+        fp = self.fingerprint(g)
+        norm = np.linalg.norm(fp)
+        best, best_similarity = None, self.min_similarity
+        with self.__lock:
+            model = self.__models.get((checksum, family))
+            solutions = list(model["solutions"]) if model is not None else []
+
+        for stored_fp, stored_norm, f in solutions:
+            if len(stored_fp) != len(fp) or not norm or not stored_norm:
+                continue
+            similarity = float(fp @ stored_fp) / (norm * stored_norm)
+            if similarity >= best_similarity:
+                best, best_similarity = (stored_fp, stored_norm, f), similarity
+
+        with self.__lock:
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        stored_fp, stored_norm, f = best
+        return f * (float(fp @ stored_fp) / stored_norm**2)
+
+    def record(self, checksum, family, g, f):
+        fp = self.fingerprint(g)
+        with self.__lock:
+            model = self.__model((checksum, family))
+            model["solutions"].append((fp, np.linalg.norm(fp), np.asarray(f, dtype=np.float32).reshape(-1)))
+
+    def record_cold(self, checksum, family, algorithm, tol, iters):
+        # reconstrução que partiu do zero (e não foi cortada por prazo): entra na média de referência
+        with self.__lock:
+            cold = self.__model((checksum, family))["cold"]
+            count, mean = cold.get((algorithm, tol), (0, 0.0))
+            cold[(algorithm, tol)] = (count + 1, mean + (iters - mean) / (count + 1))
+
+    def iterations_saved(self, checksum, family, algorithm, tol, iters):
+        # média das partidas do zero menos as iterações feitas (0 sem referência)
+        with self.__lock:
+            model = self.__models.get((checksum, family))
+            reference = model["cold"].get((algorithm, tol)) if model is not None else None
+        if reference is None:
+            return 0
+        return max(int(round(reference[1])) - int(iters), 0)
+
+    def stats(self):
+        with self.__lock:
+            return {"models": len(self.__models), "hits": self.hits, "misses": self.misses}
+
+    def __model(self, key):
+        # chamado com o lock: cria ou marca o modelo como usado, descartando o mais antigo
+        model = self.__models.get(key)
+        if model is None:
+            model = self.__models[key] = {"solutions": deque(maxlen=self.max_items), "cold": {}}
+            while len(self.__models) > self.max_models:
+                self.__models.popitem(last=False)
+        self.__models.move_to_end(key)
+        return model